@@ -0,0 +1,230 @@
+"""This file and its contents are licensed under the Apache License 2.0. Please see the included NOTICE for copyright information and LICENSE for a copy of the license.
+"""
+import logging
+import os
+import sys
+import threading
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+from rq.job import JobStatus
+
+logger = logging.getLogger(__name__)
+
+_current = threading.local()
+
+
+class LocalQueueFull(Exception):
+    """In-process queue already has its maximum number of jobs waiting or running"""
+
+
+class LocalJob:
+    """Job of an in-process queue, it mirrors the parts of rq.job.Job used by Label Studio.
+
+    `on_failure` is called like RQ does: `on_failure(job, connection, type, value, traceback)`,
+    connection is None.
+    """
+
+    def __init__(self, func, args, kwargs, origin, on_failure=None, meta=None):
+        self.id = str(uuid.uuid4())
+        self.func = func
+        self.func_name = f'{func.__module__}.{func.__qualname__}'
+        self.args = args
+        self.kwargs = kwargs
+        self.origin = origin
+        self.on_failure = on_failure
+        self.meta = meta or {}
+        self.result = None
+        self.exc_info = None
+        self.enqueued_at = timezone.now()
+        self.started_at = None
+        self.ended_at = None
+        self._status = JobStatus.QUEUED
+        self._future = None
+        self._timer = None
+
+    def get_status(self, refresh=True):
+        return self._status
+
+    @property
+    def is_queued(self):
+        return self._status == JobStatus.QUEUED
+
+    @property
+    def is_scheduled(self):
+        return self._status == JobStatus.SCHEDULED
+
+    @property
+    def is_started(self):
+        return self._status == JobStatus.STARTED
+
+    @property
+    def is_finished(self):
+        return self._status == JobStatus.FINISHED
+
+    @property
+    def is_failed(self):
+        return self._status == JobStatus.FAILED
+
+    @property
+    def is_canceled(self):
+        return self._status == JobStatus.CANCELED
+
+    def save_meta(self):
+        # meta lives in memory, nothing to persist
+        pass
+
+    def wait(self, timeout=None):
+        """Block until the job has been performed or cancelled"""
+        if self._timer is not None:
+            self._timer.join(timeout)
+        if self._future is not None:
+            wait([self._future], timeout)
+
+    def cancel(self):
+        """Cancel the job unless it has started already, running jobs can't be stopped like in RQ"""
+        cancelled = False
+        if self._timer is not None:
+            self._timer.cancel()
+            cancelled = self.is_scheduled
+        if self._future is not None:
+            cancelled = self._future.cancel()
+        if cancelled:
+            self._status = JobStatus.CANCELED
+            self.ended_at = timezone.now()
+        return cancelled
+
+    def fail(self, exc_info):
+        """Mark the job failed with `exc_info` and call its on_failure"""
+        self.exc_info = ''.join(traceback.format_exception(*exc_info))
+        self._status = JobStatus.FAILED
+        self.ended_at = timezone.now()
+        if self.on_failure:
+            try:
+                self.on_failure(self, None, *exc_info)
+            except Exception:
+                logger.error(f'on_failure of in-process job {self.id} failed', exc_info=True)
+
+    def perform(self):
+        _current.job = self
+        self._status = JobStatus.STARTED
+        self.started_at = timezone.now()
+        try:
+            self.result = self.func(*self.args, **self.kwargs)
+        except Exception:
+            exc_info = sys.exc_info()
+            logger.error(f'In-process job {self.func_name} {self.id} failed', exc_info=exc_info)
+            self.fail(exc_info)
+        else:
+            self._status = JobStatus.FINISHED
+        finally:
+            self.ended_at = timezone.now()
+            _current.job = None
+            # every worker thread has its own database connections
+            connections.close_all()
+
+
+class LocalQueue:
+    """Named queue running jobs in a bounded pool of threads of the current process.
+
+    At most `max_jobs` jobs wait or run at once, 0 means no limit. Further jobs aren't run:
+    they fail right away with LocalQueueFull and their on_failure is called, like a job that crashed.
+    """
+
+    def __init__(self, name, workers, max_jobs):
+        self.name = name
+        self.max_jobs = max_jobs
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'{name}-jobs')
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def enqueue(self, func, *args, on_failure=None, meta=None, **kwargs):
+        job = LocalJob(func, args, kwargs, self.name, on_failure=on_failure, meta=meta)
+        _register(job)
+        self._submit(job)
+        return job
+
+    def enqueue_in(self, delay, func, *args, on_failure=None, meta=None, **kwargs):
+        """Enqueue the job after `delay` timedelta"""
+        job = LocalJob(func, args, kwargs, self.name, on_failure=on_failure, meta=meta)
+        job._status = JobStatus.SCHEDULED
+        job._timer = threading.Timer(delay.total_seconds(), self._submit_scheduled, args=(job,))
+        job._timer.daemon = True
+        _register(job)
+        job._timer.start()
+        return job
+
+    def _submit(self, job):
+        with self._lock:
+            full = self.max_jobs and self._active >= self.max_jobs
+            if not full:
+                self._active += 1
+        if full:
+            logger.error(f'In-process queue {self.name} is full, job {job.func_name} {job.id} is rejected')
+            exc = LocalQueueFull(f'In-process queue {self.name} already has {self.max_jobs} jobs')
+            job.fail((LocalQueueFull, exc, None))
+            return
+
+        job._status = JobStatus.QUEUED
+        job._future = self.executor.submit(job.perform)
+        job._future.add_done_callback(self._done)
+
+    def _submit_scheduled(self, job):
+        try:
+            self._submit(job)
+        finally:
+            # on_failure of a rejected job queried the database from the timer thread
+            connections.close_all()
+
+    def _done(self, future):
+        with self._lock:
+            self._active -= 1
+
+
+_queues = {}
+_queues_pid = None
+_jobs = OrderedDict()
+_lock = threading.Lock()
+
+
+def _register(job):
+    with _lock:
+        _jobs[job.id] = job
+        while len(_jobs) > settings.LOCAL_JOB_QUEUE_HISTORY:
+            _jobs.popitem(last=False)
+
+
+def get_local_queue(name='default', max_jobs=None):
+    """Return the in-process queue `name` of the current process, a forked worker gets its own queues.
+
+    `max_jobs` overrides LOCAL_JOB_QUEUE_MAX_JOBS when the queue is created, 0 never rejects jobs.
+    """
+    global _queues_pid
+
+    with _lock:
+        if _queues_pid != os.getpid():
+            _queues.clear()
+            _jobs.clear()
+            _queues_pid = os.getpid()
+        if name not in _queues:
+            _queues[name] = LocalQueue(
+                name,
+                workers=settings.LOCAL_JOB_QUEUE_WORKERS.get(name, 1),
+                max_jobs=settings.LOCAL_JOB_QUEUE_MAX_JOBS if max_jobs is None else max_jobs,
+            )
+        return _queues[name]
+
+
+def fetch_local_job(job_id):
+    """Return a recent in-process job by id or None"""
+    return _jobs.get(job_id)
+
+
+def get_current_local_job():
+    """Return the in-process job running in the current thread, like rq.get_current_job"""
+    return getattr(_current, 'job', None)
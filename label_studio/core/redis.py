@@ -2,11 +2,16 @@
 """
 import logging
 import sys
+import threading
+import time
 from datetime import timedelta
 from functools import partial
 
 import django_rq
 import redis
+from core.local_queue import LocalJob, get_local_queue
+from django.conf import settings
+from django.db import connection
 from django_rq import get_connection
 from rq.command import send_stop_job_command
 from rq.exceptions import InvalidJobOperation
@@ -14,6 +19,9 @@ from rq.registry import StartedJobRegistry
 
 logger = logging.getLogger(__name__)
 
+# errors marking Redis down, other Redis errors are raised to callers
+REDIS_CONNECTION_ERRORS = (redis.exceptions.ConnectionError, redis.exceptions.TimeoutError)
+
 try:
     _redis = get_connection()
     _redis.ping()
@@ -23,62 +31,143 @@ except:  # noqa: E722
     _redis = None
 
 
+class RedisHealth:
+    """Track whether Redis is reachable without pinging it before every command.
+
+    Redis is considered up until a command fails with a connection error. It's then marked down and
+    probed with a PING when the retry delay passes, the delay doubles after every failed probe.
+    """
+
+    def __init__(self, min_delay, max_delay):
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.delay = min_delay
+        self.is_up = True
+        self.retry_at = 0
+        self._lock = threading.Lock()
+
+    def available(self):
+        if self.is_up:
+            return True
+        with self._lock:
+            if self.is_up or time.monotonic() < self.retry_at:
+                return self.is_up
+            # only one caller probes, the others keep seeing Redis down meanwhile
+            self.retry_at = time.monotonic() + self.delay
+        return self.probe()
+
+    def probe(self):
+        try:
+            _redis.ping()
+        except redis.exceptions.RedisError as exc:
+            self.mark_down(exc)
+            return False
+        self.mark_up()
+        return True
+
+    def mark_up(self):
+        if not self.is_up:
+            logger.info('Redis is reachable again')
+        self.is_up = True
+        self.delay = self.min_delay
+
+    def mark_down(self, exc):
+        logger.error(f'Redis is unavailable, next check in {self.delay} seconds: {exc}', exc_info=True)
+        with self._lock:
+            self.is_up = False
+            self.retry_at = time.monotonic() + self.delay
+            self.delay = min(self.delay * 2, self.max_delay)
+
+
+_health = RedisHealth(settings.REDIS_HEALTH_MIN_RETRY_DELAY, settings.REDIS_HEALTH_MAX_RETRY_DELAY)
+
+
 def redis_healthcheck():
+    """Ping Redis right away, prefer redis_connected() which doesn't cost a round-trip"""
     if not _redis:
         return False
-    try:
-        _redis.ping()
-    except redis.exceptions.ConnectionError as exc:
-        logger.error(f'Redis healthcheck failed with ConnectionError: {exc}', exc_info=True)
-        return False
-    except redis.exceptions.TimeoutError as exc:
-        logger.error(f'Redis healthcheck failed with TimeoutError: {exc}', exc_info=True)
-        return False
-    except redis.exceptions.RedisError as exc:
-        logger.error(f'Redis healthcheck failed: {exc}', exc_info=True)
-        return False
-    else:
+    if _health.probe():
         logger.debug('Redis client is alive!')
         return True
+    return False
 
 
 def redis_connected():
-    return redis_healthcheck()
+    return bool(_redis) and _health.available()
 
 
-def redis_get(key):
-    if not redis_healthcheck():
+def _redis_call(command, *args, **kwargs):
+    """Run a Redis command, return None if Redis is down or the connection fails"""
+    if not redis_connected():
+        return
+    try:
+        return command(*args, **kwargs)
+    except REDIS_CONNECTION_ERRORS as exc:
+        _health.mark_down(exc)
         return
-    return _redis.get(key)
+
+
+def redis_get(key):
+    return _redis_call(lambda: _redis.get(key))
 
 
 def redis_hget(key1, key2):
-    if not redis_healthcheck():
-        return
-    return _redis.hget(key1, key2)
+    return _redis_call(lambda: _redis.hget(key1, key2))
 
 
 def redis_set(key, value, ttl=None):
-    if not redis_healthcheck():
-        return
-    return _redis.set(key, value, ex=ttl)
+    return _redis_call(lambda: _redis.set(key, value, ex=ttl))
 
 
 def redis_hset(key1, key2, value):
-    if not redis_healthcheck():
-        return
-    return _redis.hset(key1, key2, value)
+    return _redis_call(lambda: _redis.hset(key1, key2, value))
 
 
 def redis_delete(key):
-    if not redis_healthcheck():
+    return _redis_call(lambda: _redis.delete(key))
+
+
+def redis_get_many(keys):
+    """Get many keys in one round-trip, return {key: value} of the keys found"""
+    keys = list(keys)
+    if not keys:
+        return {}
+    values = _redis_call(lambda: _redis.mget(keys)) or []
+    return {key: value for key, value in zip(keys, values) if value is not None}
+
+
+def redis_set_many(mapping, ttl=None):
+    """Set many keys in one pipelined round-trip"""
+    if not mapping:
         return
-    return _redis.delete(key)
+
+    def set_many():
+        pipeline = _redis.pipeline(transaction=False)
+        for key, value in mapping.items():
+            pipeline.set(key, value, ex=ttl)
+        return pipeline.execute()
+
+    return _redis_call(set_many)
+
+
+def enqueue_rq_job(job, *args, queue_name='default', job_timeout=None, in_seconds=0, **kwargs):
+    """Enqueue job on RQ, return None and mark Redis down if the connection fails"""
+    logger.info(f'Start async job {job.__name__} on queue {queue_name}.')
+    queue = django_rq.get_queue(queue_name)
+    enqueue_method = queue.enqueue
+    if in_seconds > 0:
+        enqueue_method = partial(queue.enqueue_in, timedelta(seconds=in_seconds))
+    try:
+        return enqueue_method(job, *args, **kwargs, job_timeout=job_timeout)
+    except REDIS_CONNECTION_ERRORS as exc:
+        _health.mark_down(exc)
 
 
 def start_job_async_or_sync(job, *args, in_seconds=0, **kwargs):
     """
-    Start job async with redis or sync if redis is not connected
+    Start job async with redis, on an in-process queue if LOCAL_JOB_QUEUE_ENABLED is set,
+    or sync if redis is not connected.
+    `on_failure` is called like RQ does on every path: `on_failure(job, connection, type, value, traceback)`
     :param job: Job function
     :param args: Function arguments
     :param in_seconds: Job will be delayed for in_seconds
@@ -87,6 +176,8 @@ def start_job_async_or_sync(job, *args, in_seconds=0, **kwargs):
     """
 
     redis = redis_connected() and kwargs.get('redis', True)
+    # a worker thread wouldn't see data of an open transaction (e.g. a migration), such jobs run inline
+    local = kwargs.get('redis', True) and settings.LOCAL_JOB_QUEUE_ENABLED and not connection.in_atomic_block
     queue_name = kwargs.get('queue_name', 'default')
     if 'queue_name' in kwargs:
         del kwargs['queue_name']
@@ -97,13 +188,20 @@ def start_job_async_or_sync(job, *args, in_seconds=0, **kwargs):
         job_timeout = kwargs['job_timeout']
         del kwargs['job_timeout']
     if redis:
-        logger.info(f'Start async job {job.__name__} on queue {queue_name}.')
-        queue = django_rq.get_queue(queue_name)
+        rq_job = enqueue_rq_job(
+            job, *args, queue_name=queue_name, job_timeout=job_timeout, in_seconds=in_seconds, **kwargs
+        )
+        # otherwise Redis went away since the last command, start the job as if it was known to be down
+        if rq_job is not None:
+            return rq_job
+
+    if local:
+        logger.info(f'Start in-process job {job.__name__} on queue {queue_name}.')
+        queue = get_local_queue(queue_name)
         enqueue_method = queue.enqueue
         if in_seconds > 0:
             enqueue_method = partial(queue.enqueue_in, timedelta(seconds=in_seconds))
-        job = enqueue_method(job, *args, **kwargs, job_timeout=job_timeout)
-        return job
+        return enqueue_method(job, *args, **kwargs)
     else:
         on_failure = kwargs.pop('on_failure', None)
         try:
@@ -111,7 +209,8 @@ def start_job_async_or_sync(job, *args, in_seconds=0, **kwargs):
         except Exception:
             exc_info = sys.exc_info()
             if on_failure:
-                on_failure(job, *exc_info)
+                # pass a job like the other paths do, callbacks read the arguments from job.args
+                on_failure(LocalJob(job, args, kwargs, queue_name), None, *exc_info)
             raise
 
 
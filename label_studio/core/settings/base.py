@@ -363,6 +363,17 @@ RQ_QUEUES = {
         "DEFAULT_TIMEOUT": 180,
     },
 }
+# seconds before Redis marked down after a connection error is probed again, doubled after every failed probe
+REDIS_HEALTH_MIN_RETRY_DELAY = float(get_env("REDIS_HEALTH_MIN_RETRY_DELAY", 1))
+REDIS_HEALTH_MAX_RETRY_DELAY = float(get_env("REDIS_HEALTH_MAX_RETRY_DELAY", 30))
+# without Redis, run background jobs on in-process thread pools instead of inline in the request,
+# jobs only go there when Redis isn't reachable
+LOCAL_JOB_QUEUE_ENABLED = get_bool_env("LOCAL_JOB_QUEUE_ENABLED", True)
+LOCAL_JOB_QUEUE_WORKERS = {"critical": 1, "high": 2, "default": 2, "low": 1}
+# jobs waiting or running per in-process queue, further jobs are rejected and fail
+LOCAL_JOB_QUEUE_MAX_JOBS = int(get_env("LOCAL_JOB_QUEUE_MAX_JOBS", 100))
+# finished in-process jobs kept for status lookups
+LOCAL_JOB_QUEUE_HISTORY = int(get_env("LOCAL_JOB_QUEUE_HISTORY", 1000))
 
 # specify the list of the extensions that are allowed to be presented in auto generated OpenAPI schema
 # for example, by specifying in swagger_auto_schema(..., x_fern_sdk_group_name='projects') we can group endpoints
@@ -503,6 +514,51 @@ SUPPORTED_EXTENSIONS = set(
 
 MODEL_ROOT = os.path.join(BASE_DATA_DIR, "models")
 os.makedirs(MODEL_ROOT, exist_ok=True)
+# tasks read per query while writing training datasets
+NN_MODEL_DATASET_BATCH_SIZE = int(get_env("NN_MODEL_DATASET_BATCH_SIZE", 1000))
+# per-project YOLO label cache, kept out of the publicly served MODEL_ROOT
+NN_MODEL_DATASET_CACHE_DIR = get_env(
+    "NN_MODEL_DATASET_CACHE_DIR", os.path.join(BASE_DATA_DIR, "yolo_datasets")
+)
+# background conversion of uploaded TF.js models
+NN_MODEL_UPLOAD_DIR = os.path.join(BASE_DATA_DIR, "nn_model_uploads")
+NN_MODEL_CONVERSION_QUEUE = get_env("NN_MODEL_CONVERSION_QUEUE", "low")
+NN_MODEL_CONVERSION_JOB_TIMEOUT = int(get_env("NN_MODEL_CONVERSION_JOB_TIMEOUT", 3600))
+# in-process queue of conversions when Redis is unavailable
+NN_MODEL_CONVERSION_LOCAL_QUEUE = "nn_model_conversion"
+# content hashes of served model files, kept out of the publicly served MODEL_ROOT
+NN_MODEL_FILE_HASH_DIR = os.path.join(BASE_DATA_DIR, "nn_model_hashes")
+# touched when base models are installed, running processes reload their model catalog
+NN_MODEL_CATALOG_STAMP = os.path.join(BASE_DATA_DIR, "nn_model_catalog.stamp")
+# parallel base model downloads in installmodels
+NN_MODEL_DOWNLOAD_WORKERS = int(get_env("NN_MODEL_DOWNLOAD_WORKERS", 4))
+# content-addressed cache of ONNX -> blob conversions
+NN_MODEL_BLOB_CACHE_DIR = get_env(
+    "NN_MODEL_BLOB_CACHE_DIR", os.path.join(BASE_DATA_DIR, "blob_cache")
+)
+# least recently used blobs are removed above this many bytes (0 keeps all of them)
+NN_MODEL_BLOB_CACHE_MAX_SIZE = int(
+    get_env("NN_MODEL_BLOB_CACHE_MAX_SIZE", 2 * 1024 * 1024 * 1024)
+)
+# background model training
+NN_MODEL_TRAINING_QUEUE = get_env("NN_MODEL_TRAINING_QUEUE", "low")
+NN_MODEL_TRAINING_JOB_TIMEOUT = int(
+    get_env("NN_MODEL_TRAINING_JOB_TIMEOUT", timedelta(days=1).total_seconds())
+)
+NN_MODEL_MAX_CONCURRENT_TRAININGS = int(get_env("NN_MODEL_MAX_CONCURRENT_TRAININGS", 1))
+# in-process queue of trainings when Redis is unavailable, one thread per allowed training
+NN_MODEL_TRAINING_LOCAL_QUEUE = "nn_model_training"
+LOCAL_JOB_QUEUE_WORKERS[NN_MODEL_TRAINING_LOCAL_QUEUE] = NN_MODEL_MAX_CONCURRENT_TRAININGS
+NN_MODEL_TRAINING_POLL_INTERVAL = float(get_env("NN_MODEL_TRAINING_POLL_INTERVAL", 1))
+# waiting trainings are re-enqueued after this many seconds instead of holding a worker
+NN_MODEL_TRAINING_RETRY_DELAY = int(get_env("NN_MODEL_TRAINING_RETRY_DELAY", 10))
+# running trainings bump updated_at every interval, jobs silent for the timeout are failed
+NN_MODEL_TRAINING_HEARTBEAT_INTERVAL = int(
+    get_env("NN_MODEL_TRAINING_HEARTBEAT_INTERVAL", 60)
+)
+NN_MODEL_TRAINING_HEARTBEAT_TIMEOUT = int(
+    get_env("NN_MODEL_TRAINING_HEARTBEAT_TIMEOUT", 600)
+)
 
 # directory for files created during unit tests
 TEST_DATA_ROOT = os.path.join(BASE_DATA_DIR, "test_data")
@@ -525,6 +581,11 @@ DATA_UPLOAD_MAX_MEMORY_SIZE = int(
 DATA_UPLOAD_MAX_NUMBER_FILES = int(get_env("DATA_UPLOAD_MAX_NUMBER_FILES", 100))
 TASKS_MAX_NUMBER = 1000000
 TASKS_MAX_FILE_SIZE = DATA_UPLOAD_MAX_MEMORY_SIZE
+# rows parsed at once when reading CSV/TSV uploads
+TASKS_READ_CHUNK_SIZE = int(get_env("TASKS_READ_CHUNK_SIZE", 10000))
+# async imports of uploaded files and URLs commit tasks in chunks of this many, each in its own transaction;
+# smaller imports stay all-or-nothing, 0 imports everything at once
+IMPORT_STREAMING_CHUNK_SIZE = int(get_env("IMPORT_STREAMING_CHUNK_SIZE", 10000))
 
 TASK_LOCK_TTL = int(get_env("TASK_LOCK_TTL", default=86400))
 
@@ -533,6 +594,8 @@ LABEL_STREAM_HISTORY_LIMIT = int(get_env("LABEL_STREAM_HISTORY_LIMIT", default=1
 RANDOM_NEXT_TASK_SAMPLE_SIZE = int(get_env("RANDOM_NEXT_TASK_SAMPLE_SIZE", 50))
 
 TASK_API_PAGE_SIZE_MAX = int(get_env("TASK_API_PAGE_SIZE_MAX", 0)) or None
+# seconds to keep Data Manager totals for cursor paginated task lists
+TASK_API_TOTALS_CACHE_TIMEOUT = int(get_env("TASK_API_TOTALS_CACHE_TIMEOUT", 60))
 
 # Email backend
 FROM_EMAIL = get_env("FROM_EMAIL", "Label Studio <hello@labelstud.io>")
@@ -604,6 +667,18 @@ DATA_MANAGER_CUSTOM_FILTER_EXPRESSIONS = (
     "data_manager.functions.custom_filter_expressions"
 )
 DATA_MANAGER_PREPROCESS_FILTER = "data_manager.functions.preprocess_filter"
+# number of compiled Data Manager filter plans kept in memory per process
+DATA_MANAGER_FILTER_PLAN_CACHE_SIZE = int(get_env("DATA_MANAGER_FILTER_PLAN_CACHE_SIZE", 256))
+# read annotators, completed_at, avg_lead_time and predictions_score from the task_aggregate table,
+# run `update_task_aggregates` management command to backfill it before enabling
+DATA_MANAGER_TASK_AGGREGATES = get_bool_env("DATA_MANAGER_TASK_AGGREGATES", False)
+# predictions retrieved automatically on Data Manager page loads
+DATA_MANAGER_PREDICTIONS_QUEUE = get_env("DATA_MANAGER_PREDICTIONS_QUEUE", "low")
+DATA_MANAGER_PREDICTIONS_JOB_TIMEOUT = int(get_env("DATA_MANAGER_PREDICTIONS_JOB_TIMEOUT", 3600))
+DATA_MANAGER_PREDICTIONS_QUEUE_TIMEOUT = int(get_env("DATA_MANAGER_PREDICTIONS_QUEUE_TIMEOUT", 600))
+# columns and project state payloads are cached until the label config or project summary changes,
+# the timeout bounds staleness of members, model versions and counters updated without signals
+DATA_MANAGER_PAYLOAD_CACHE_TIMEOUT = int(get_env("DATA_MANAGER_PAYLOAD_CACHE_TIMEOUT", 300))
 USER_LOGIN_FORM = "users.forms.LoginForm"
 PROJECT_MIXIN = "projects.mixins.ProjectMixin"
 TASK_MIXIN = "tasks.mixins.TaskMixin"
@@ -646,6 +721,17 @@ COLLECT_VERSIONS = collect_versions_dummy
 
 WEBHOOK_TIMEOUT = float(get_env("WEBHOOK_TIMEOUT", 1.0))
 WEBHOOK_BATCH_SIZE = int(get_env("WEBHOOK_BATCH_SIZE", 100))
+# seconds to coalesce requests of webhooks with batch_payloads enabled
+# into {"action": ..., "batch": [...]} payloads, 0 sends each one right away
+WEBHOOK_BATCH_WINDOW = float(get_env("WEBHOOK_BATCH_WINDOW", 0))
+WEBHOOK_MAX_WORKERS = int(get_env("WEBHOOK_MAX_WORKERS", 4))
+# keep-alive connections per webhook endpoint, also caps concurrent requests to it
+WEBHOOK_POOL_SIZE = int(get_env("WEBHOOK_POOL_SIZE", 10))
+WEBHOOK_RETRIES = int(get_env("WEBHOOK_RETRIES", 2))
+WEBHOOK_RETRY_BACKOFF = float(get_env("WEBHOOK_RETRY_BACKOFF", 0.5))
+# active webhooks are cached per organization, project and action until a webhook
+# changes; without a shared CACHES backend other processes see it after this timeout
+WEBHOOK_CACHE_TIMEOUT = int(get_env("WEBHOOK_CACHE_TIMEOUT", 300))
 WEBHOOK_SERIALIZERS = {
     "project": "webhooks.serializers_for_hooks.ProjectWebhookSerializer",
     "task": "webhooks.serializers_for_hooks.TaskWebhookSerializer",
@@ -702,6 +788,11 @@ STORAGE_IN_PROGRESS_TIMER = float(get_env("STORAGE_IN_PROGRESS_TIMER", 5.0))
 STORAGE_EXPORT_CHUNK_SIZE = int(get_env("STORAGE_EXPORT_CHUNK_SIZE", 100))
 
 USE_NGINX_FOR_EXPORT_DOWNLOADS = get_bool_env("USE_NGINX_FOR_EXPORT_DOWNLOADS", False)
+USE_NGINX_FOR_MODEL_DOWNLOADS = get_bool_env("USE_NGINX_FOR_MODEL_DOWNLOADS", False)
+# internal NGINX location aliasing MODEL_ROOT, see deploy/default.conf
+NGINX_MODEL_DOWNLOAD_LOCATION = get_env(
+    "NGINX_MODEL_DOWNLOAD_LOCATION", "/internal/models/"
+)
 
 if get_env("MINIO_STORAGE_ENDPOINT") and not get_bool_env("MINIO_SKIP", False):
     CLOUD_FILE_STORAGE_ENABLED = True
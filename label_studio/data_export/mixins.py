@@ -7,8 +7,7 @@ import shutil
 from datetime import datetime
 from functools import reduce
 
-import django_rq
-from core.redis import redis_connected
+from core.redis import start_job_async_or_sync
 from core.utils.common import batch
 from core.utils.io import (
     SerializableGenerator,
@@ -285,23 +284,17 @@ class ExportMixin:
         self.status = self.Status.IN_PROGRESS
         self.save(update_fields=['status'])
 
-        if redis_connected():
-            queue = django_rq.get_queue('default')
-            queue.enqueue(
-                export_background,
-                self.id,
-                task_filter_options,
-                annotation_filter_options,
-                serialization_options,
-                on_failure=set_export_background_failure,
-                job_timeout='3h',  # 3 hours
-            )
-        else:
-            self.export_to_file(
-                task_filter_options=task_filter_options,
-                annotation_filter_options=annotation_filter_options,
-                serialization_options=serialization_options,
-            )
+        start_job_async_or_sync(
+            export_background,
+            self.id,
+            task_filter_options,
+            annotation_filter_options,
+            serialization_options,
+            on_failure=set_export_background_failure,
+            job_timeout='3h',  # 3 hours
+        )
+        # without Redis the export may have run inline on its own copy of this export
+        self.refresh_from_db()
 
     def convert_file(self, to_format):
         with get_temp_dir() as tmp_dir:
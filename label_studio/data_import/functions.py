@@ -1,3 +1,4 @@
+import itertools
 import logging
 import time
 import traceback
@@ -7,13 +8,14 @@ from core.utils.common import load_func
 from django.conf import settings
 from django.db import transaction
 from projects.models import ProjectImport, ProjectReimport
+from rest_framework.exceptions import ValidationError
 from users.models import User
 from webhooks.models import WebhookAction
 from webhooks.utils import emit_webhooks_for_instance
 
-from .models import FileUpload
+from .models import FileUpload, UploadedTasks
 from .serializers import ImportApiSerializer
-from .uploader import load_tasks_for_async_import
+from .uploader import create_file_uploads_for_async_import, load_tasks_for_async_import
 
 logger = logging.getLogger(__name__)
 
@@ -37,6 +39,13 @@ def async_import_background(
 
     start = time.time()
     project = project_import.project
+    # uploaded files and URLs are streamed, inline tasks are in memory already
+    if settings.IMPORT_STREAMING_CHUNK_SIZE and project_import.commit_to_project:
+        if not project_import.file_upload_ids and project_import.url:
+            project_import.file_upload_ids = create_file_uploads_for_async_import(project_import, user)
+        if project_import.file_upload_ids:
+            return async_import_streaming(project_import, user, start)
+
     tasks = None
     # upload files from request, and parse all tasks
     # TODO: Stop passing request to load_tasks function, make all validation before
@@ -98,6 +107,73 @@ def async_import_background(
     project_import.save()
 
 
+def async_import_streaming(project_import, user, start):
+    """Import uploaded files into the project in chunks of IMPORT_STREAMING_CHUNK_SIZE tasks
+
+    Every chunk is validated and committed in its own transaction and `project_import` counters are saved
+    after each of them, so memory stays bounded by the chunk size and progress is visible while the import
+    runs. Chunks committed before a failure are kept.
+    """
+    project = project_import.project
+    uploaded_tasks = UploadedTasks(project, project_import.file_upload_ids)
+    chunk_size = settings.IMPORT_STREAMING_CHUNK_SIZE
+    task_ids = []
+    tasks_iter = iter(uploaded_tasks)
+
+    while chunk := list(itertools.islice(tasks_iter, chunk_size)):
+        if project_import.task_count + len(chunk) > settings.TASKS_MAX_NUMBER:
+            raise ValidationError(
+                f'Maximum task number is {settings.TASKS_MAX_NUMBER}, '
+                f'current task number is {project_import.task_count + len(chunk)}'
+            )
+        if project_import.preannotated_from_fields:
+            chunk = reformat_predictions(chunk, project_import.preannotated_from_fields)
+
+        with transaction.atomic():
+            serializer = ImportApiSerializer(data=chunk, many=True, context={'project': project})
+            serializer.is_valid(raise_exception=True)
+            tasks = serializer.save(project_id=project.id)
+            project.summary.update_data_columns(tasks)
+        emit_webhooks_for_instance(user.active_organization, project, WebhookAction.TASKS_CREATED, tasks)
+
+        recalculate_stats_counts = {
+            'task_count': len(tasks),
+            'annotation_count': len(serializer.db_annotations),
+            'prediction_count': len(serializer.db_predictions),
+        }
+        # overlap is rearranged once after the last chunk
+        project.update_tasks_counters_and_task_states(
+            tasks_queryset=tasks,
+            maximum_annotations_changed=False,
+            overlap_cohort_percentage_changed=False,
+            tasks_number_changed=False,
+            recalculate_stats_counts=recalculate_stats_counts,
+        )
+
+        project_import.task_count += recalculate_stats_counts['task_count']
+        project_import.annotation_count += recalculate_stats_counts['annotation_count']
+        project_import.prediction_count += recalculate_stats_counts['prediction_count']
+        project_import.duration = time.time() - start
+        project_import.save(update_fields=['task_count', 'annotation_count', 'prediction_count', 'duration'])
+        if project_import.return_task_ids:
+            task_ids.extend(task.id for task in tasks)
+        logger.info(f'Imported {project_import.task_count} tasks (streaming import {project_import.id})')
+
+    if not project_import.task_count:
+        raise ValidationError('load_tasks: No tasks added')
+
+    project.update_tasks_states(
+        maximum_annotations_changed=False, overlap_cohort_percentage_changed=False, tasks_number_changed=True
+    )
+
+    project_import.duration = time.time() - start
+    project_import.found_formats = dict(uploaded_tasks.found_formats)
+    project_import.data_columns = list(uploaded_tasks.data_keys)
+    project_import.task_ids = task_ids
+    project_import.status = ProjectImport.Status.COMPLETED
+    project_import.save()
+
+
 def set_import_background_failure(job, connection, type, value, _):
     import_id = job.args[0]
     ProjectImport.objects.filter(id=import_id).update(
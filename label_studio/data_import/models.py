@@ -1,9 +1,12 @@
 """This file and its contents are licensed under the Apache License 2.0. Please see the included NOTICE for copyright information and LICENSE for a copy of the license.
 """
+import codecs
+import itertools
 import logging
 import os
 import uuid
 from collections import Counter
+from json import JSONDecodeError, JSONDecoder
 
 import pandas as pd
 
@@ -19,6 +22,11 @@ from rest_framework.exceptions import ValidationError
 
 logger = logging.getLogger(__name__)
 
+JSON_WHITESPACE = ' \t\n\r'
+JSON_NUMBER_TAIL = '0123456789.eE+-'
+# the spellings pandas parses as booleans
+CSV_BOOL_VALUES = {'True': True, 'TRUE': True, 'true': True, 'False': False, 'FALSE': False, 'false': False}
+
 
 def upload_name_generator(instance, filename):
     project = str(instance.project_id)
@@ -69,40 +77,40 @@ class FileUpload(models.Model):
             setattr(self, '_file_body', body)
         return body
 
+    def iter_text_chunks(self):
+        return codecs.iterdecode(self.file.chunks(), 'utf-8')
+
     def read_tasks_list_from_csv(self, sep=','):
         logger.debug('Read tasks list from CSV file {}'.format(self.filepath))
-        tasks = pd.read_csv(self.file.open(), sep=sep).fillna('').to_dict('records')
-        tasks = [{'data': task} for task in tasks]
-        return tasks
+        # pandas would infer dtypes per chunk, the ones it infers for the first chunk are applied to all chunks
+        first_chunk = pd.read_csv(self.file.open(), sep=sep, nrows=settings.TASKS_READ_CHUNK_SIZE)
+        column_types = {column: get_csv_column_type(first_chunk[column]) for column in first_chunk.columns}
+
+        with pd.read_csv(
+            self.file.open(), sep=sep, dtype=object, chunksize=settings.TASKS_READ_CHUNK_SIZE
+        ) as reader:
+            for chunk in reader:
+                for column, column_type in column_types.items():
+                    chunk[column] = cast_csv_column(chunk[column], column_type)
+                for task in chunk.fillna('').to_dict('records'):
+                    yield {'data': task}
 
     def read_tasks_list_from_tsv(self):
         return self.read_tasks_list_from_csv('\t')
 
     def read_tasks_list_from_txt(self):
         logger.debug('Read tasks list from text file {}'.format(self.filepath))
-        lines = self.content.splitlines()
-        tasks = [{'data': {settings.DATA_UNDEFINED_NAME: line}} for line in lines]
-        return tasks
+        for line in iter_lines(self.iter_text_chunks()):
+            yield {'data': {settings.DATA_UNDEFINED_NAME: line}}
 
     def read_tasks_list_from_json(self):
         logger.debug('Read tasks list from JSON file {}'.format(self.filepath))
-
-        raw_data = self.content
-        # Python 3.5 compatibility fix https://docs.python.org/3/whatsnew/3.6.html#json
-        try:
-            tasks = json.loads(raw_data)
-        except TypeError:
-            tasks = json.loads(raw_data.decode('utf8'))
-        if isinstance(tasks, dict):
-            tasks = [tasks]
-        tasks_formatted = []
-        for i, task in enumerate(tasks):
+        for task in iter_json_items(self.iter_text_chunks()):
             if not task.get('data'):
                 task = {'data': task}
             if not isinstance(task['data'], dict):
                 raise ValidationError('Task item should be dict')
-            tasks_formatted.append(task)
-        return tasks_formatted
+            yield task
 
     def read_task_from_hypertext_body(self):
         logger.debug('Read 1 task from hypertext file {}'.format(self.filepath))
@@ -123,6 +131,7 @@ class FileUpload(models.Model):
         return self.format in ('.csv', '.tsv', '.txt')
 
     def read_tasks(self, file_as_tasks_list=True):
+        """Yield tasks from the file, tasks lists are read incrementally"""
         file_format = self.format
         try:
             # file as tasks list
@@ -148,50 +157,173 @@ class FileUpload(models.Model):
             else:
                 tasks = self.read_task_from_uploaded_file()
 
+            # readers are lazy, so parsing errors surface while iterating
+            yield from tasks
+
         except Exception as exc:
             raise ValidationError('Failed to parse input file ' + self.filepath + ': ' + str(exc))
-        return tasks
 
     @classmethod
     def load_tasks_from_uploaded_files(
         cls, project, file_upload_ids=None, formats=None, files_as_tasks_list=True, trim_size=None
     ):
+        uploaded_tasks = UploadedTasks(project, file_upload_ids, formats, files_as_tasks_list)
         tasks = []
-        fileformats = []
-        common_data_fields = set()
+        for task in uploaded_tasks:
+            tasks.append(task)
+            if trim_size is not None and len(tasks) > trim_size:
+                break
+
+        return tasks, dict(uploaded_tasks.found_formats), uploaded_tasks.data_keys
+
+
+class UploadedTasks:
+    """Iterate over tasks of uploaded files one file at a time
+
+    Formats of the files read so far are counted in `found_formats`, and data keys common to all of them
+    are collected in `data_keys` as the iteration goes.
+    """
 
-        # scan all files
-        file_uploads = FileUpload.objects.filter(project=project)
-        if file_upload_ids:
-            file_uploads = file_uploads.filter(id__in=file_upload_ids)
+    def __init__(self, project, file_upload_ids=None, formats=None, files_as_tasks_list=True):
+        self.project = project
+        self.file_upload_ids = file_upload_ids
+        self.formats = formats
+        self.files_as_tasks_list = files_as_tasks_list
+        self.found_formats = Counter()
+        self.data_keys = set()
+
+    def __iter__(self):
+        file_uploads = FileUpload.objects.filter(project=self.project)
+        if self.file_upload_ids:
+            file_uploads = file_uploads.filter(id__in=self.file_upload_ids)
         for file_upload in file_uploads:
             file_format = file_upload.format
-            if formats and file_format not in formats:
+            if self.formats and file_format not in self.formats:
                 continue
-            new_tasks = file_upload.read_tasks(files_as_tasks_list)
-            for task in new_tasks:
-                task['file_upload_id'] = file_upload.id
+            tasks = iter(file_upload.read_tasks(self.files_as_tasks_list))
+            first_task = next(tasks, None)
 
-            new_data_fields = set(iter(new_tasks[0]['data'].keys())) if len(new_tasks) > 0 else set()
-            if not common_data_fields:
-                common_data_fields = new_data_fields
-            elif not common_data_fields.intersection(new_data_fields):
+            new_data_keys = set(first_task['data'].keys()) if first_task is not None else set()
+            if not self.data_keys:
+                self.data_keys = new_data_keys
+            elif not self.data_keys.intersection(new_data_keys):
                 raise ValidationError(
-                    _old_vs_new_data_keys_inconsistency_message(
-                        new_data_fields, common_data_fields, file_upload.file.name
-                    )
+                    _old_vs_new_data_keys_inconsistency_message(new_data_keys, self.data_keys, file_upload.file.name)
                 )
             else:
-                common_data_fields &= new_data_fields
-
-            tasks += new_tasks
-            fileformats.append(file_format)
+                self.data_keys &= new_data_keys
+            self.found_formats[file_format] += 1
 
-            if trim_size is not None:
-                if len(tasks) > trim_size:
-                    break
-
-        return tasks, dict(Counter(fileformats)), common_data_fields
+            if first_task is None:
+                continue
+            for task in itertools.chain([first_task], tasks):
+                task['file_upload_id'] = file_upload.id
+                yield task
+
+
+def iter_lines(chunks):
+    """Yield lines of text split into chunks, like `''.join(chunks).splitlines()` does"""
+    rest = ''
+    for chunk in chunks:
+        lines = (rest + chunk).splitlines(keepends=True)
+        # the last line may continue in the next chunk
+        rest = lines.pop() if lines else ''
+        for line in lines:
+            yield line.splitlines()[0]
+    if rest:
+        yield rest.splitlines()[0]
+
+
+def iter_json_items(chunks):
+    """Yield items of a JSON array from text chunks without decoding the whole document
+
+    A JSON object at the top level is yielded as the only item.
+    """
+    decoder = JSONDecoder()
+    chunks = iter(chunks)
+    buffer, pos, eof = '', 0, False
+
+    def read_more():
+        nonlocal buffer, pos, eof
+        chunk = next(chunks, None)
+        eof = chunk is None
+        buffer, pos = buffer[pos:] + (chunk or ''), 0
+        return not eof
+
+    def peek():
+        """Skip whitespace and return the next character, empty at the end of the document"""
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in JSON_WHITESPACE:
+                pos += 1
+            if pos < len(buffer) or not read_more():
+                return buffer[pos : pos + 1]
+
+    if peek() != '[':
+        # a single task is parsed at once
+        yield json.loads(buffer[pos:] + ''.join(chunks))
+        return
+    pos += 1
+    if peek() == ']':
+        return
+
+    while True:
+        peek()
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+        except JSONDecodeError:
+            if not read_more():
+                raise
+            continue
+        # a number cut by the chunk boundary is decoded partially, e.g. `12.` of `12.5`
+        if (end == len(buffer) or buffer[end] in JSON_NUMBER_TAIL) and read_more():
+            continue
+        yield item
+
+        pos = end
+        char = peek()
+        if char == ']':
+            return
+        if char != ',':
+            raise JSONDecodeError("Expecting ',' delimiter", buffer, pos)
+        pos += 1
+
+
+def get_csv_column_type(column):
+    """Type of a column of the first CSV chunk as pandas inferred it: bool, int, float or object"""
+    if column.dtype.kind in 'bif':
+        return {'b': 'bool', 'i': 'int', 'f': 'float'}[column.dtype.kind] if column.notna().any() else 'object'
+    # booleans with blanks come as an object column
+    values = column.dropna()
+    if len(values) and values.map(lambda value: isinstance(value, bool)).all():
+        return 'bool'
+    return 'object'
+
+
+def cast_csv_column(column, column_type):
+    """Cast a CSV chunk column read as text to the type of the first chunk, keep the text if it doesn't fit"""
+    if column_type == 'object':
+        return column
+
+    if column_type == 'bool':
+        values = column.map(CSV_BOOL_VALUES)
+        if values.isna().equals(column.isna()):
+            return values.astype(object)
+    else:
+        try:
+            values = pd.to_numeric(column)
+        except (ValueError, TypeError):
+            pass
+        else:
+            if column_type == 'float':
+                return values.astype(float)
+            # blanks turn integers into floats, keep them integers like in the first chunk
+            if values.dtype.kind == 'f' and (values.dropna() % 1 == 0).all():
+                return values.astype('Int64').astype(object)
+            return values
+
+    logger.warning(f'CSV column {column.name} has values that are not {column_type} like its first rows, keeping text')
+    return column
 
 
 def _old_vs_new_data_keys_inconsistency_message(new_data_keys, old_data_keys, current_file):
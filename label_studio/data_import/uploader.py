@@ -124,23 +124,26 @@ def str_to_json(data):
         return None
 
 
+def create_file_upload_from_url(project, user, url):
+    """Download file using URL and save it as a file upload"""
+    filename = url.rsplit("/", 1)[-1]
+
+    response = ssrf_safe_get(
+        url,
+        verify=project.organization.should_verify_ssl_certs(),
+        stream=True,
+        headers={"Accept-Encoding": None},
+    )
+    file_content = response.content
+    check_tasks_max_file_size(int(response.headers["content-length"]))
+    return create_file_upload(user, project, SimpleUploadedFile(filename, file_content))
+
+
 def tasks_from_url(file_upload_ids, project, user, url, could_be_tasks_list):
     """Download file using URL and read tasks from it"""
     # process URL with tasks
     try:
-        filename = url.rsplit("/", 1)[-1]
-
-        response = ssrf_safe_get(
-            url,
-            verify=project.organization.should_verify_ssl_certs(),
-            stream=True,
-            headers={"Accept-Encoding": None},
-        )
-        file_content = response.content
-        check_tasks_max_file_size(int(response.headers["content-length"]))
-        file_upload = create_file_upload(
-            user, project, SimpleUploadedFile(filename, file_content)
-        )
+        file_upload = create_file_upload_from_url(project, user, url)
         if file_upload.format_could_be_tasks_list:
             could_be_tasks_list = True
         file_upload_ids.append(file_upload.id)
@@ -155,6 +158,30 @@ def tasks_from_url(file_upload_ids, project, user, url, could_be_tasks_list):
     return data_keys, found_formats, tasks, file_upload_ids, could_be_tasks_list
 
 
+def create_file_uploads_for_async_import(project_import, user):
+    """Save tasks of an import URL as a file upload to read them like uploaded files"""
+    url = project_import.url
+    # the URL may hold json with task or tasks as string
+    if str_to_json(url):
+        file_upload = create_file_upload(
+            user,
+            project_import.project,
+            SimpleUploadedFile("inplace.json", url.encode()),
+        )
+        return [file_upload.id]
+
+    try:
+        file_upload = create_file_upload_from_url(project_import.project, user, url)
+    except ValidationError as e:
+        raise e
+    except Exception as e:
+        raise ValidationError(str(e))
+    if file_upload.format_could_be_tasks_list:
+        project_import.could_be_tasks_list = True
+        project_import.save(update_fields=["could_be_tasks_list"])
+    return [file_upload.id]
+
+
 @timeit
 def create_file_uploads(user, project, FILES):
     could_be_tasks_list = False
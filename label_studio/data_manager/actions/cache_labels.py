@@ -2,15 +2,24 @@
 """
 
 import logging
+from collections import Counter
 
 from core.permissions import AllPermissions
 from core.redis import start_job_async_or_sync
+from data_manager.functions import iter_task_id_chunks, report_job_progress
+from django.conf import settings
 from tasks.models import Annotation, Prediction, Task
 
 logger = logging.getLogger(__name__)
 all_permissions = AllPermissions()
 
 
+def format_labels(counter, with_counters):
+    if with_counters:
+        return ', '.join(sorted(f'{label}: {count}' for label, count in counter.items()))
+    return ', '.join(sorted(counter))
+
+
 def cache_labels_job(project, queryset, **kwargs):
     request_data = kwargs['request_data']
     source = request_data.get('source', 'annotations').lower()
@@ -18,6 +27,7 @@ def cache_labels_job(project, queryset, **kwargs):
     source_class = Annotation if source == 'annotations' else Prediction
     control_tag = request_data.get('custom_control_tag') or request_data.get('control_tag')
     with_counters = request_data.get('with_counters', 'Yes').lower() == 'yes'
+    batch_size = kwargs.get('batch_size') or settings.BATCH_SIZE
 
     if source == 'annotations':
         column_name = 'cache'
@@ -31,35 +41,36 @@ def cache_labels_job(project, queryset, **kwargs):
     else:
         column_name = f'{column_name}_{control_tag}'
 
-    tasks = list(queryset.only('data'))
-    logger.info(f'Cache labels for {len(tasks)} tasks and control tag {control_tag}')
-
-    for task in tasks:
-        task_labels = []
-        annotations = source_class.objects.filter(task=task).only('result')
-        for annotation in annotations:
-            labels = extract_labels(annotation, control_tag)
-            task_labels.extend(labels)
-
-        # cache labels in separate data column
-        # with counters
-        if with_counters:
-            task.data[column_name] = ', '.join(
-                sorted([f'{label}: {task_labels.count(label)}' for label in set(task_labels)])
-            )
-        # no counters
-        else:
-            task.data[column_name] = ', '.join(sorted(list(set(task_labels))))
-
-    Task.objects.bulk_update(tasks, fields=['data'], batch_size=1000)
-    first_task = Task.objects.get(id=queryset.first().id)
-    project.summary.update_data_columns([first_task])
-    return {'response_code': 200, 'detail': f'Updated {len(tasks)} tasks'}
-
-
-def extract_labels(annotation, control_tag):
+    total = queryset.count()
+    logger.info(f'Cache labels for {total} tasks and control tag {control_tag}')
+
+    # stream task ids and process them in chunks: one query for tasks and one for results per chunk
+    processed = 0
+    first_task = None
+    for chunk in iter_task_id_chunks(queryset, batch_size):
+        tasks = list(Task.objects.filter(id__in=chunk).only('id', 'data'))
+        counters = {task.id: Counter() for task in tasks}
+        for task_id, result in source_class.objects.filter(task_id__in=chunk).values_list('task_id', 'result'):
+            counters[task_id].update(extract_labels(result, control_tag))
+
+        # cache labels in separate data column with or without counters
+        for task in tasks:
+            task.data[column_name] = format_labels(counters[task.id], with_counters)
+
+        Task.objects.bulk_update(tasks, fields=['data'], batch_size=batch_size)
+        if first_task is None and tasks:
+            first_task = tasks[0]
+        processed += len(tasks)
+        report_job_progress('Cache labels', processed, total)
+
+    if first_task is not None:
+        project.summary.update_data_columns([first_task])
+    return {'response_code': 200, 'detail': f'Updated {processed} tasks'}
+
+
+def extract_labels(result, control_tag):
     labels = []
-    for region in annotation.result:
+    for region in result or []:
         # find regions with specific control tag name or just all regions if control tag is None
         if (control_tag is None or region['from_name'] == control_tag) and 'value' in region:
             # scan value for a field with list of strings,
@@ -6,10 +6,12 @@ import random
 
 import ujson as json
 from core.permissions import AllPermissions
+from core.redis import start_job_async_or_sync
 from core.utils.db import fast_first
-from data_manager.functions import DataManagerException
+from data_manager.functions import DataManagerException, report_job_progress
 from django.conf import settings
-from tasks.models import Annotation, Task
+from django.utils import timezone
+from tasks.models import Annotation, Task, update_task_aggregates
 from tasks.serializers import TaskSerializerBulk
 
 logger = logging.getLogger(__name__)
@@ -78,6 +80,40 @@ def rename_labels(project, queryset, **kwargs):
         raise Exception('Wrong old label name, it is not from labeling config: ' + old_label_name)
     label_type = labels[control_tag]['type'].lower()
 
+    start_job_async_or_sync(
+        rename_labels_job,
+        project,
+        control_tag,
+        label_type,
+        old_label_name,
+        new_label_name,
+        organization_id=project.organization_id,
+        job_timeout=60 * 60 * 5,  # max allowed duration is 5 hours
+    )
+    return {'response_code': 200}
+
+
+def rename_labels_in_result(result, control_tag, label_type, old_label_name, new_label_name):
+    """Rename label in place, return the number of renamed labels"""
+    label_count = 0
+    for sub in result or []:
+        if sub.get('from_name', None) == control_tag and old_label_name in sub.get('value', {}).get(label_type, []):
+            new_labels = []
+            for label in sub['value'][label_type]:
+                if label == old_label_name:
+                    new_labels.append(new_label_name)
+                    label_count += 1
+                else:
+                    new_labels.append(label)
+
+            sub['value'][label_type] = new_labels
+    return label_count
+
+
+def rename_labels_job(project, control_tag, label_type, old_label_name, new_label_name, **kwargs):
+    """Rename labels in annotation chunks with bulk updates, no annotation signals are sent"""
+    batch_size = kwargs.get('batch_size') or settings.BATCH_SIZE
+
     annotations = Annotation.objects.filter(project=project)
     if settings.DJANGO_DB == settings.DJANGO_DB_SQLITE:
         annotations = annotations.filter(result__icontains=control_tag).filter(result__icontains=old_label_name)
@@ -85,36 +121,35 @@ def rename_labels(project, queryset, **kwargs):
         annotations = annotations.filter(result__contains=[{'from_name': control_tag}]).filter(
             result__contains=[{'value': {label_type: [old_label_name]}}]
         )
+    annotations = annotations.order_by('id').only('id', 'task_id', 'result', 'updated_at')
+    total = annotations.count()
 
     label_count = 0
     annotation_count = 0
-    for annotation in annotations:
-        changed = False
-        for sub in annotation.result:
-            if sub.get('from_name', None) == control_tag and old_label_name in sub.get('value', {}).get(
-                label_type, []
-            ):
-
-                new_labels = []
-                for label in sub['value'][label_type]:
-                    if label == old_label_name:
-                        new_labels.append(new_label_name)
-                        label_count += 1
-                        changed = True
-                    else:
-                        new_labels.append(label)
-
-                sub['value'][label_type] = new_labels
-
-        if changed:
-            annotation.save(update_fields=['result'])
-            annotation_count += 1
-
-    # update summaries
-    project.summary.reset()
-    project.summary.update_data_columns(project.tasks.all())
-    annotations = Annotation.objects.filter(project=project)
-    project.summary.update_created_annotations_and_labels(annotations)
+    processed = 0
+    last_id = 0
+    while chunk := list(annotations.filter(id__gt=last_id)[:batch_size]):
+        changed = []
+        # bulk_update doesn't bump auto_now fields, change detection relies on updated_at
+        now = timezone.now()
+        for annotation in chunk:
+            count = rename_labels_in_result(annotation.result, control_tag, label_type, old_label_name, new_label_name)
+            if count:
+                label_count += count
+                annotation.updated_at = now
+                changed.append(annotation)
+
+        Annotation.objects.bulk_update(changed, fields=['result', 'updated_at'], batch_size=batch_size)
+        if settings.DATA_MANAGER_TASK_AGGREGATES:
+            # the materialized results text holds the old label names
+            update_task_aggregates({annotation.task_id for annotation in changed})
+        annotation_count += len(changed)
+        processed += len(chunk)
+        last_id = chunk[-1].id
+        report_job_progress('Rename labels', processed, total)
+
+    # move label counters instead of recounting all annotations
+    project.summary.rename_created_label(control_tag, old_label_name, new_label_name, label_count)
 
     return {
         'response_code': 200,
@@ -3,6 +3,9 @@
 import logging
 
 from core.permissions import AllPermissions
+from core.redis import start_job_async_or_sync
+from data_manager.functions import iter_task_id_chunks, report_job_progress
+from django.conf import settings
 from django.utils.timezone import now
 from tasks.models import Annotation, Prediction, Task
 from tasks.serializers import TaskSerializerBulk
@@ -15,49 +18,75 @@ logger = logging.getLogger(__name__)
 
 def predictions_to_annotations(project, queryset, **kwargs):
     request = kwargs['request']
-    user = request.user
-    model_version = request.data.get('model_version')
-    queryset = queryset.filter(predictions__isnull=False)
-    predictions = Prediction.objects.filter(task__in=queryset, child_annotations__isnull=True)
-
-    # model version filter
-    if model_version is not None:
-        if isinstance(model_version, list):
-            predictions = predictions.filter(model_version__in=model_version).distinct()
-        else:
-            predictions = predictions.filter(model_version=model_version)
-
-    predictions_values = list(predictions.values_list('result', 'model_version', 'task_id', 'id'))
-
-    # prepare annotations
-    annotations = []
-    tasks_ids = []
-    for result, model_version, task_id, prediction_id in predictions_values:
-        tasks_ids.append(task_id)
-        body = {
-            'result': result,
-            'completed_by_id': user.pk,
-            'task_id': task_id,
-            'parent_prediction_id': prediction_id,
-            'project': project,
-        }
-        body = TaskSerializerBulk.add_annotation_fields(body, user, 'prediction')
-        annotations.append(body)
-
-    count = len(annotations)
-    logger.debug(f'{count} predictions will be converter to annotations')
-    db_annotations = [Annotation(**annotation) for annotation in annotations]
-    db_annotations = Annotation.objects.bulk_create(db_annotations)
-    Task.objects.filter(id__in=tasks_ids).update(updated_at=now(), updated_by=request.user)
-
-    if db_annotations:
-        TaskSerializerBulk.post_process_annotations(user, db_annotations, 'prediction')
-        # Execute webhook for created annotations
-        emit_webhooks_for_instance(
-            user.active_organization, project, WebhookAction.ANNOTATIONS_CREATED, db_annotations
-        )
-        # Update counters for tasks and is_labeled. It should be a single operation as counters affect bulk is_labeled update
-        project.update_tasks_counters_and_is_labeled(Task.objects.filter(id__in=tasks_ids))
+    start_job_async_or_sync(
+        predictions_to_annotations_job,
+        project,
+        queryset,
+        request.user,
+        request.data.get('model_version'),
+        organization_id=project.organization_id,
+        job_timeout=60 * 60 * 5,  # max allowed duration is 5 hours
+    )
+    return {'response_code': 200}
+
+
+def predictions_to_annotations_job(project, queryset, user, model_version=None, **kwargs):
+    """Convert predictions to annotations in chunks of tasks
+
+    Every chunk is created, post-processed, counted and sent to webhooks on its own,
+    so memory doesn't depend on the number of selected predictions.
+    """
+    batch_size = kwargs.get('batch_size') or settings.BATCH_SIZE
+    total = queryset.count()
+    processed = 0
+    count = 0
+
+    for tasks_ids in iter_task_id_chunks(queryset, batch_size):
+        predictions = Prediction.objects.filter(task_id__in=tasks_ids, child_annotations__isnull=True)
+
+        # model version filter
+        if model_version is not None:
+            if isinstance(model_version, list):
+                predictions = predictions.filter(model_version__in=model_version).distinct()
+            else:
+                predictions = predictions.filter(model_version=model_version)
+
+        # prepare annotations
+        db_annotations = []
+        annotated_tasks_ids = set()
+        for result, task_id, prediction_id in predictions.order_by('id').values_list('result', 'task_id', 'id'):
+            annotated_tasks_ids.add(task_id)
+            body = {
+                'result': result,
+                'completed_by_id': user.pk,
+                'task_id': task_id,
+                'parent_prediction_id': prediction_id,
+                'project': project,
+            }
+            body = TaskSerializerBulk.add_annotation_fields(body, user, 'prediction')
+            db_annotations.append(Annotation(**body))
+
+        processed += len(tasks_ids)
+        if db_annotations:
+            logger.debug(f'{len(db_annotations)} predictions will be converted to annotations')
+            db_annotations = Annotation.objects.bulk_create(db_annotations, batch_size=settings.BATCH_SIZE)
+            Task.objects.filter(id__in=annotated_tasks_ids).update(updated_at=now(), updated_by=user)
+            TaskSerializerBulk.post_process_annotations(user, db_annotations, 'prediction')
+
+            # Execute webhooks for created annotations in batches
+            for i in range(0, len(db_annotations), settings.WEBHOOK_BATCH_SIZE):
+                emit_webhooks_for_instance(
+                    user.active_organization,
+                    project,
+                    WebhookAction.ANNOTATIONS_CREATED,
+                    db_annotations[i : i + settings.WEBHOOK_BATCH_SIZE],
+                )
+            # Update counters for tasks and is_labeled. It should be a single operation as counters affect bulk is_labeled update
+            project.update_tasks_counters_and_is_labeled(Task.objects.filter(id__in=annotated_tasks_ids))
+            count += len(db_annotations)
+
+        report_job_progress('Predictions to annotations', processed, total)
+
     return {'response_code': 200, 'detail': f'Created {count} annotations'}
 
 
@@ -1,6 +1,7 @@
 """This file and its contents are licensed under the Apache License 2.0. Please see the included NOTICE for copyright information and LICENSE for a copy of the license.
 """
 
+import hashlib
 import logging
 from collections import defaultdict
 
@@ -8,7 +9,9 @@ import ujson as json
 from core.label_config import replace_task_data_undefined_with_config_field
 from core.permissions import AllPermissions
 from core.redis import start_job_async_or_sync
+from core.utils.common import batch
 from data_manager.actions.basic import delete_tasks
+from django.conf import settings
 from io_storages.azure_blob.models import AzureBlobImportStorageLink
 from io_storages.gcs.models import GCSImportStorageLink
 from io_storages.localfiles.models import LocalFilesImportStorageLink
@@ -181,8 +184,23 @@ def restore_storage_links_for_duplicated_tasks(duplicates) -> None:
     logger.info(f'Restored {total_restored_links} storage links for duplicated tasks')
 
 
+def canonical_task_data(data, project, first_key=None):
+    """Normalize task data and serialize it with sorted keys, so equal data gives equal strings"""
+    replace_task_data_undefined_with_config_field(data, project, first_key=first_key)
+    return json.dumps(data, sort_keys=True, ensure_ascii=False)
+
+
+def get_task_data_hash(canonical_data):
+    """Stable 64-bit hash of canonical task data, collisions are resolved by comparing the data itself"""
+    return int.from_bytes(hashlib.blake2b(canonical_data.encode(), digest_size=8).digest(), 'big')
+
+
 def find_duplicated_tasks_by_data(project, queryset):
-    """Find duplicated tasks by `task.data` and return them as a dict"""
+    """Find duplicated tasks by `task.data` and return them as a dict
+
+    Tasks are streamed twice: the first pass keeps only a hash and an id per distinct data,
+    the second one loads full rows for the tasks whose hash repeats.
+    """
 
     # get io_storage_* links for tasks, we need to copy them
     storages = []
@@ -190,14 +208,30 @@ def find_duplicated_tasks_by_data(project, queryset):
         if field.startswith('io_storages_'):
             storages += [field]
 
+    first_key = next(iter(project.data_types), None)
+
+    # first pass: find candidate ids by data hash
+    first_ids = {}
+    candidate_ids = set()
+    tasks = queryset.order_by('id').values_list('id', 'data').iterator(chunk_size=settings.BATCH_SIZE)
+    for task_id, data in tasks:
+        data_hash = get_task_data_hash(canonical_task_data(data, project, first_key))
+        first_id = first_ids.setdefault(data_hash, task_id)
+        if first_id != task_id:
+            candidate_ids.update((first_id, task_id))
+    logger.info(f'Hashed {len(first_ids)} distinct task data, {len(candidate_ids)} tasks may be duplicated')
+    del first_ids
+
+    # second pass: group candidates by the data itself
     groups = defaultdict(list)
-    tasks = list(queryset.values('data', 'id', 'total_annotations', 'cancelled_annotations', *storages))
-    logger.info(f'Retrieved {len(tasks)} tasks from queryset')
-
-    for task in list(tasks):
-        replace_task_data_undefined_with_config_field(task['data'], project)
-        task['data'] = json.dumps(task['data'])
-        groups[task['data']].append(task)
+    for ids in batch(sorted(candidate_ids), settings.BATCH_SIZE):
+        for task in (
+            Task.objects.filter(id__in=ids)
+            .order_by('id')
+            .values('data', 'id', 'total_annotations', 'cancelled_annotations', *storages)
+        ):
+            task['data'] = canonical_task_data(task['data'], project, first_key)
+            groups[task['data']].append(task)
 
     # make groups of duplicated ids for info print
     duplicates = {d: groups[d] for d in groups if len(groups[d]) > 1}
@@ -1,5 +1,8 @@
 """This file and its contents are licensed under the Apache License 2.0. Please see the included NOTICE for copyright information and LICENSE for a copy of the license.
 """
+import base64
+import hashlib
+import json
 import logging
 
 from asgiref.sync import async_to_sync, sync_to_async
@@ -8,7 +11,14 @@ from core.permissions import ViewClassPermission, all_permissions
 from core.utils.common import int_from_request, load_func
 from core.utils.params import bool_from_request
 from data_manager.actions import get_all_actions, perform_action
-from data_manager.functions import evaluate_predictions, get_prepare_params, get_prepared_queryset
+from data_manager.functions import (
+    get_all_columns,
+    get_cached_project_payload,
+    get_prepare_params,
+    get_prepared_queryset,
+    queue_filtered_predictions,
+    queue_predictions,
+)
 from data_manager.managers import get_fields_for_evaluation
 from data_manager.models import View
 from data_manager.prepare_params import filters_schema, ordering_schema, prepare_params_schema
@@ -19,7 +29,10 @@ from data_manager.serializers import (
     ViewSerializer,
 )
 from django.conf import settings
-from django.db.models import Sum
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, F, OrderBy, Q, Sum
 from django.db.models.functions import Coalesce
 from django.utils.decorators import method_decorator
 from django_filters.rest_framework import DjangoFilterBackend
@@ -29,7 +42,8 @@ from projects.models import Project
 from projects.serializers import ProjectSerializer
 from rest_framework import generics, viewsets
 from rest_framework.decorators import action
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from tasks.models import Annotation, Prediction, Task
@@ -253,6 +267,132 @@ class TaskPagination(PageNumberPagination):
         )
 
 
+class TaskCursorPagination(BasePagination):
+    """Keyset pagination for the Data Manager: seeks on (ordering key, id) instead of OFFSET,
+    so every page costs the same however deep it is.
+
+    Pass an empty `cursor` to get the first page, then the returned `next` cursor for the following ones.
+    Totals are counted on the first page and cached per view and filters for TASK_API_TOTALS_CACHE_TIMEOUT
+    seconds; deeper pages return them only from the cache.
+    """
+
+    page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    max_page_size = settings.TASK_API_PAGE_SIZE_MAX
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self):
+        self.next_cursor = None
+        self.totals = None
+
+    def get_page_size(self, request):
+        page_size = int_from_request(request.query_params, self.page_size_query_param, self.page_size)
+        if page_size <= 0:
+            page_size = self.page_size
+        if self.max_page_size:
+            page_size = min(page_size, self.max_page_size)
+        return page_size
+
+    @staticmethod
+    def get_seek_key(queryset):
+        """Ordering key of the prepared queryset: (field name, ascending)"""
+        order_by = queryset.query.order_by
+        if not order_by:
+            return 'id', True
+        first = order_by[0]
+        if isinstance(first, str):
+            return first.lstrip('-'), not first.startswith('-')
+        if isinstance(first, OrderBy) and isinstance(first.expression, F):
+            return first.expression.name, not first.descending
+        raise ValidationError({'ordering': f'Ordering by {first} is not supported with cursor pagination'})
+
+    @staticmethod
+    def seek(queryset, key, ascending, value, last_id):
+        """Filter tasks that go after (value, last_id), nulls are always ordered last"""
+        after = 'gt' if ascending else 'lt'
+        if key == 'id':
+            return queryset.filter(**{f'id__{after}': last_id})
+        if value is None:
+            return queryset.filter(**{f'{key}__isnull': True, f'id__{after}': last_id})
+        return queryset.filter(
+            Q(**{f'{key}__{after}': value})
+            | Q(**{key: value, f'id__{after}': last_id})
+            | Q(**{f'{key}__isnull': True})
+        )
+
+    @staticmethod
+    def get_attname(key):
+        try:
+            return Task._meta.get_field(key).attname
+        except FieldDoesNotExist:
+            # annotated field
+            return key
+
+    def encode_cursor(self, value, last_id):
+        data = json.dumps([value, last_id], cls=DjangoJSONEncoder)
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return value, int(last_id)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def get_totals_cache_key(view):
+        prepare_params = view.prepare_params
+        filters = prepare_params.model_dump_json(include={'filters', 'selectedItems'})
+        view_pk = int_from_request(view.request.GET, 'view', 0)
+        return f'dm-tasks-totals:{prepare_params.project}:{view_pk}:{hashlib.md5(filters.encode()).hexdigest()}'
+
+    @staticmethod
+    def count_totals(queryset):
+        # filters may join annotations or predictions, every task is counted once
+        return Task.objects.filter(id__in=queryset.values('id')).aggregate(
+            total=Count('id'),
+            total_annotations=Coalesce(Sum('total_annotations'), 0),
+            total_predictions=Coalesce(Sum('total_predictions'), 0),
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        cursor = request.query_params.get(self.cursor_query_param) or None
+        page_size = self.get_page_size(request)
+        key, ascending = self.get_seek_key(queryset)
+
+        if key != 'id':
+            queryset = queryset.order_by(*queryset.query.order_by, 'id' if ascending else '-id')
+        if cursor is not None:
+            queryset = self.seek(queryset, key, ascending, *self.decode_cursor(cursor))
+
+        tasks = list(queryset[: page_size + 1])
+        if len(tasks) > page_size:
+            tasks = tasks[:page_size]
+            last = tasks[-1]
+            self.next_cursor = self.encode_cursor(getattr(last, self.get_attname(key)), last.id)
+
+        if view is not None and hasattr(view, 'prepare_params'):
+            cache_key = self.get_totals_cache_key(view)
+            self.totals = cache.get(cache_key)
+            if self.totals is None and cursor is None:
+                self.totals = self.count_totals(queryset)
+                cache.set(cache_key, self.totals, settings.TASK_API_TOTALS_CACHE_TIMEOUT)
+        return tasks
+
+    def get_paginated_response(self, data):
+        totals = self.totals or {}
+        return Response(
+            {
+                'total_annotations': totals.get('total_annotations'),
+                'total_predictions': totals.get('total_predictions'),
+                'total': totals.get('total'),
+                'next': self.next_cursor,
+                'tasks': data,
+            }
+        )
+
+
 class TaskListAPI(generics.ListCreateAPIView):
     task_serializer_class = DataManagerTaskSerializer
     permission_required = ViewClassPermission(
@@ -263,6 +403,7 @@ class TaskListAPI(generics.ListCreateAPIView):
         DELETE=all_permissions.tasks_delete,
     )
     pagination_class = TaskPagination
+    cursor_pagination_class = TaskCursorPagination
 
     @staticmethod
     def get_task_serializer_context(request, project):
@@ -313,6 +454,11 @@ class TaskListAPI(generics.ListCreateAPIView):
         queryset = self.get_task_queryset(request, prepare_params)
         context = self.get_task_serializer_context(self.request, project)
 
+        # keyset pagination is requested by passing a cursor (empty for the first page)
+        if TaskCursorPagination.cursor_query_param in request.GET:
+            self._paginator = self.cursor_pagination_class()
+            self.prepare_params = prepare_params
+
         # paginated tasks
         page = self.paginate_queryset(queryset)
 
@@ -340,15 +486,10 @@ class TaskListAPI(generics.ListCreateAPIView):
             # keep ids ordering
             page = [tasks_by_ids[_id] for _id in ids]
 
-            # retrieve ML predictions if tasks don't have them
+            # retrieve ML predictions in background if tasks don't have them,
+            # the page is rendered from the already prefetched predictions
             if not review and project.evaluate_predictions_automatically:
-                # TODO MM TODO this needs a discussion, because I'd expect
-                # people to retrieve manually instead on DM load, plus it
-                # will slow down initial DM load
-                # if project.retrieve_predictions_automatically is deprecated now and no longer used
-                tasks_for_predictions = Task.objects.filter(id__in=ids, predictions__isnull=True)
-                evaluate_predictions(tasks_for_predictions)
-                [tasks_by_ids[_id].refresh_from_db() for _id in ids]
+                queue_predictions(project, [task.id for task in page if not task.predictions.all()])
 
             if flag_set('fflag_fix_back_leap_24_tasks_api_optimization_05092023_short'):
                 serializer = self.task_serializer_class(
@@ -362,7 +503,7 @@ class TaskListAPI(generics.ListCreateAPIView):
             return self.get_paginated_response(serializer.data)
         # all tasks
         if project.evaluate_predictions_automatically:
-            evaluate_predictions(queryset.filter(predictions__isnull=True))
+            queue_filtered_predictions(project, prepare_params)
         queryset = Task.prepared.annotate_queryset(
             queryset, fields_for_evaluation=fields_for_evaluation, all_fields=all_fields, request=request
         )
@@ -431,7 +572,11 @@ class ProjectColumnsAPI(APIView):
         project = generics.get_object_or_404(Project, pk=pk)
         self.check_object_permissions(request, project)
         GET_ALL_COLUMNS = load_func(settings.DATA_MANAGER_GET_ALL_COLUMNS)
-        data = GET_ALL_COLUMNS(project, request.user)
+        if GET_ALL_COLUMNS is get_all_columns:
+            # the default columns don't depend on the user, custom ones may
+            data = get_cached_project_payload('columns', project, lambda: get_all_columns(project, request.user))
+        else:
+            data = GET_ALL_COLUMNS(project, request.user)
         return Response(data)
 
 
@@ -451,7 +596,12 @@ class ProjectStateAPI(APIView):
         pk = int_from_request(request.GET, 'project', 1)  # replace 1 to None, it's for debug only
         project = generics.get_object_or_404(Project, pk=pk)
         self.check_object_permissions(request, project)
-        data = ProjectSerializer(project).data
+        data = get_cached_project_payload('state', project, lambda: self.get_state(project))
+        return Response(data)
+
+    @staticmethod
+    def get_state(project):
+        data = dict(ProjectSerializer(project).data)
 
         data.update(
             {
@@ -465,7 +615,7 @@ class ProjectStateAPI(APIView):
                 'config_has_control_tags': len(project.get_parsed_config()) > 0,
             }
         )
-        return Response(data)
+        return data
 
 
 @method_decorator(
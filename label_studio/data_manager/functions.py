@@ -1,5 +1,6 @@
 """This file and its contents are licensed under the Apache License 2.0. Please see the included NOTICE for copyright information and LICENSE for a copy of the license.
 """
+import hashlib
 import logging
 from collections import OrderedDict
 from typing import Any, Iterable, Tuple
@@ -7,11 +8,15 @@ from urllib.parse import unquote
 
 import ujson as json
 from core.feature_flags import flag_set
+from core.local_queue import get_current_local_job
+from core.redis import redis_connected, start_job_async_or_sync
 from core.utils.common import int_from_request
 from data_manager.models import View
 from data_manager.prepare_params import PrepareParams
 from django.conf import settings
+from django.core.cache import cache
 from rest_framework.generics import get_object_or_404
+from rq import get_current_job
 from tasks.models import Task
 
 TASKS = 'tasks:'
@@ -271,6 +276,26 @@ def get_all_columns(project, *_):
     return result
 
 
+def get_project_payload_cache_key(name, project):
+    """Cache key of a per-project Data Manager payload
+
+    Both timestamps move on every project save (label config included) and every summary update,
+    so outdated payloads are never read back and just expire.
+    """
+    version = f'{project.updated_at.timestamp()}:{project.summary.updated_at.timestamp()}'
+    return f'dm-{name}:{project.id}:{version}'
+
+
+def get_cached_project_payload(name, project, build):
+    """Return `build()` cached per project until its config or summary changes"""
+    key = get_project_payload_cache_key(name, project)
+    data = cache.get(key)
+    if data is None:
+        data = build()
+        cache.set(key, data, settings.DATA_MANAGER_PAYLOAD_CACHE_TIMEOUT)
+    return data
+
+
 def get_prepare_params(request, project):
     """This function extract prepare_params from
     * view_id if it's inside of request data
@@ -344,6 +369,122 @@ def evaluate_predictions(tasks):
         return backend.predict_tasks(tasks=tasks)
 
 
+def report_job_progress(name, processed, total):
+    """Log progress of a Data Manager action job and expose it in the job meta when running on a worker"""
+    logger.info(f'{name}: {processed}/{total} processed')
+    job = get_current_job() or get_current_local_job()
+    if job is not None:
+        job.meta['progress'] = {'processed': processed, 'total': total}
+        job.save_meta()
+
+
+def iter_task_id_chunks(queryset, size):
+    """Stream unique ids of a tasks queryset in ascending chunks of `size`"""
+    chunk, last_id = [], None
+    for task_id in queryset.order_by('id').values_list('id', flat=True).iterator(chunk_size=size):
+        # joins in filters may repeat the same task
+        if task_id == last_id:
+            continue
+        last_id = task_id
+        chunk.append(task_id)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def retrieve_predictions_job(task_ids):
+    """Background job: evaluate predictions for tasks that still have none"""
+    tasks = Task.objects.filter(id__in=task_ids, predictions__isnull=True).select_related('project')
+    evaluate_predictions(tasks)
+
+
+def retrieve_filtered_predictions_job(project_id, prepare_params):
+    """Background job: evaluate predictions for all tasks of a view that still have none, batch by batch
+
+    :param prepare_params: PrepareParams of the view as JSON, without the request
+    """
+    from projects.models import Project
+
+    prepare_params = PrepareParams.model_validate_json(prepare_params)
+    queryset = Task.prepared.only_filtered(prepare_params=prepare_params).filter(predictions__isnull=True)
+    backend = Project.objects.get(pk=project_id).ml_backend
+    if not backend:
+        return
+    for task_ids in iter_task_id_chunks(queryset, settings.BATCH_SIZE):
+        task_ids = _claim_prediction_tasks(backend, task_ids)
+        if task_ids:
+            retrieve_predictions_job(task_ids)
+
+
+def _claim_prediction_tasks(backend, task_ids):
+    """Mark tasks as queued for the backend model version, return those that weren't queued already"""
+    keys = {f'dm-predictions:{backend.id}:{backend.model_version}:{task_id}': task_id for task_id in task_ids}
+    queued = cache.get_many(keys.keys())
+    keys = {key: task_id for key, task_id in keys.items() if key not in queued}
+    if keys:
+        cache.set_many(dict.fromkeys(keys, True), settings.DATA_MANAGER_PREDICTIONS_QUEUE_TIMEOUT)
+    return list(keys.values())
+
+
+def queue_predictions(project, task_ids):
+    """Queue a batched job retrieving predictions for `task_ids` without blocking the request.
+
+    Tasks are queued once per ML backend model version for DATA_MANAGER_PREDICTIONS_QUEUE_TIMEOUT seconds,
+    so scrolling the Data Manager back and forth doesn't queue them again.
+    :return: queued task ids
+    """
+    if not task_ids:
+        return []
+    backend = project.ml_backend
+    if not backend:
+        return []
+
+    task_ids = _claim_prediction_tasks(backend, task_ids)
+    if task_ids:
+        _start_predictions_job(retrieve_predictions_job, task_ids)
+    return task_ids
+
+
+def queue_filtered_predictions(project, prepare_params):
+    """Queue a job retrieving predictions for all tasks of the view described by `prepare_params`.
+
+    The tasks are listed by the job, not by the request. The same view is queued once per ML backend
+    model version for DATA_MANAGER_PREDICTIONS_QUEUE_TIMEOUT seconds.
+    :return: True if the job was queued
+    """
+    backend = project.ml_backend
+    if not backend:
+        return False
+
+    # filters that depend on the request user can't be evaluated by the job
+    prepare_params = prepare_params.model_dump_json(exclude={'request'})
+    digest = hashlib.md5(prepare_params.encode()).hexdigest()
+    key = f'dm-predictions:{backend.id}:{backend.model_version}:view:{digest}'
+    if not cache.add(key, True, settings.DATA_MANAGER_PREDICTIONS_QUEUE_TIMEOUT):
+        return False
+
+    _start_predictions_job(retrieve_filtered_predictions_job, project.id, prepare_params)
+    return True
+
+
+def _start_predictions_job(job, *args):
+    # page loads must not wait for the ML backend, without Redis the job goes to the in-process queue
+    if redis_connected() or settings.LOCAL_JOB_QUEUE_ENABLED:
+        start_job_async_or_sync(
+            job,
+            *args,
+            queue_name=settings.DATA_MANAGER_PREDICTIONS_QUEUE,
+            job_timeout=settings.DATA_MANAGER_PREDICTIONS_JOB_TIMEOUT,
+        )
+    else:
+        logger.warning(
+            f'Predictions for project tasks are not retrieved automatically: '
+            f'neither Redis nor LOCAL_JOB_QUEUE_ENABLED is available to run {job.__name__}'
+        )
+
+
 def filters_ordering_selected_items_exist(data):
     return data.get('filters') or data.get('ordering') or data.get('selectedItems')
 
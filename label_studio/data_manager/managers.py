@@ -1,7 +1,10 @@
 """This file and its contents are licensed under the Apache License 2.0. Please see the included NOTICE for copyright information and LICENSE for a copy of the license.
 """
+import copy
 import logging
 import re
+import threading
+from collections import OrderedDict
 from datetime import datetime
 from typing import ClassVar
 
@@ -11,6 +14,8 @@ from core.utils.db import fast_first
 from data_manager.prepare_params import ConjunctionEnum
 from django.conf import settings
 from django.contrib.postgres.aggregates import ArrayAgg
+from django.contrib.postgres.fields import ArrayField
+from django.core.exceptions import FieldDoesNotExist, FieldError
 from django.db import models
 from django.db.models import (
     Aggregate,
@@ -20,6 +25,7 @@ from django.db.models import (
     Exists,
     F,
     FloatField,
+    Func,
     OuterRef,
     Q,
     Subquery,
@@ -229,11 +235,12 @@ def add_result_filter(field_name, _filter, filter_expressions, project):
         q = Exists(_class.objects.filter(Q(task=OuterRef('pk')) & Q(result=value)))
         filter_expressions.append(q if _filter.operator == Operator.EQUAL else ~q)
         return 'continue'
-    elif _filter.operator == Operator.CONTAINS:
-        filter_expressions.append(Q(subquery))
-        return 'continue'
-    elif _filter.operator == Operator.NOT_CONTAINS:
-        filter_expressions.append(~Q(subquery))
+    elif _filter.operator in [Operator.CONTAINS, Operator.NOT_CONTAINS]:
+        if field_name == 'annotations_results' and settings.DATA_MANAGER_TASK_AGGREGATES:
+            # the same results text, materialized per task instead of searched per row
+            subquery = Q(aggregate__annotations_results__contains=_filter.value)
+        q = Q(subquery)
+        filter_expressions.append(q if _filter.operator == Operator.CONTAINS else ~q)
         return 'continue'
     elif _filter.operator == Operator.EMPTY:
         if cast_bool_from_str(_filter.value):
@@ -257,13 +264,184 @@ def add_user_filter(enabled, key, _filter, filter_expressions):
         return 'continue'
 
 
-def apply_filters(queryset, filters, project, request):
+# python types of annotated fields, used instead of probing the database
+ANNOTATED_FIELD_TYPES = {
+    'avg_lead_time': 'float',
+    'completed_at': 'datetime',
+    'predictions_score': 'float',
+    'draft_exists': 'bool',
+    'file_upload_field': 'str',
+    'storage_filename': 'str',
+}
+# aggregated fields are lists on PostgreSQL and GROUP_CONCAT strings on SQLite
+AGGREGATED_FIELDS = (
+    'annotators',
+    'annotations_results',
+    'predictions_results',
+    'annotations_ids',
+    'predictions_model_versions',
+)
+MODEL_FIELD_TYPES = {
+    'AutoField': 'int',
+    'BigAutoField': 'int',
+    'BigIntegerField': 'int',
+    'IntegerField': 'int',
+    'PositiveIntegerField': 'int',
+    'SmallIntegerField': 'int',
+    'ForeignKey': 'int',
+    'FloatField': 'float',
+    'BooleanField': 'bool',
+    'CharField': 'str',
+    'TextField': 'str',
+    'DateTimeField': 'datetime',
+    'ArrayField': 'list',
+}
+
+
+def get_filter_value_type(field_name, queryset):
+    """Python type name of a filtered column, inferred from column metadata.
+
+    Data fields are stored as JSON and treated as strings. Other columns
+    unknown to the Data Manager (e.g. custom annotations) take the type of
+    the queryset annotation or of the model field they refer to, the
+    database is never queried.
+    """
+    from tasks.models import Task
+
+    if field_name.startswith('data__'):
+        return 'str'
+    if field_name in AGGREGATED_FIELDS:
+        return 'str' if settings.DJANGO_DB == settings.DJANGO_DB_SQLITE else 'list'
+    if field_name in ANNOTATED_FIELD_TYPES:
+        return ANNOTATED_FIELD_TYPES[field_name]
+
+    if field_name.endswith('__id'):
+        return 'int'
+
+    field = None
+    annotation = queryset.query.annotations.get(field_name)
+    if annotation is not None:
+        try:
+            field = annotation.output_field
+        except FieldError:
+            pass
+    else:
+        field = get_model_field(Task, field_name)
+    if field is None:
+        return 'str'
+
+    return MODEL_FIELD_TYPES.get(field.get_internal_type(), 'str')
+
+
+def get_model_field(model, lookup):
+    """Return the field a `related__field` lookup refers to, None if it doesn't resolve"""
+    field = None
+    for name in lookup.split('__'):
+        if field is not None:
+            model = field.related_model
+            if model is None:
+                return None
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+    return field
+
+
+class FilterPlan:
+    """Compiled form of Data Manager filters: annotations and Q expressions to apply"""
+
+    def __init__(self, annotations=None, expressions=None, conjunction=None, empty=False, cacheable=True):
+        self.annotations = annotations or {}
+        self.expressions = expressions or []
+        self.conjunction = conjunction
+        self.empty = empty
+        self.cacheable = cacheable
+
+    def apply(self, queryset):
+        """WARNING: Stringifying filter expressions will evaluate the (sub)queryset.
+        Do not use a log in the following manner:
+        logger.debug(f'Apply filter: {self.expressions}')
+        Even in DEBUG mode, a subqueryset that has OuterRef will raise an error
+        if evaluated outside a parent queryset.
+        """
+        if self.empty:
+            return queryset.none()
+        if self.annotations:
+            queryset = queryset.annotate(**self.annotations)
+
+        if self.conjunction == ConjunctionEnum.OR:
+            result_filter = Q()
+            for filter_expression in self.expressions:
+                result_filter.add(filter_expression, Q.OR)
+            queryset = queryset.filter(result_filter)
+        else:
+            for filter_expression in self.expressions:
+                queryset = queryset.filter(filter_expression)
+        return queryset
+
+
+_filter_plans = OrderedDict()
+_filter_plans_lock = threading.Lock()
+
+
+def get_filter_plan_key(filters, project, prepare_params=None):
+    # label_config_hash changes with the config, so plans of old configs are never hit;
+    # data.* filters also depend on whether all tasks hold $undefined$ (see preprocess_field_name)
+    common_data_columns = project.summary.common_data_columns or []
+    ordering, selected_items = None, None
+    if prepare_params is not None:
+        ordering = json.dumps(prepare_params.ordering)
+        if prepare_params.selectedItems is not None:
+            selected_items = prepare_params.selectedItems.model_dump_json()
+    return (
+        project.id,
+        project.label_config_hash,
+        settings.DATA_UNDEFINED_NAME in common_data_columns,
+        settings.DJANGO_DB,
+        filters.model_dump_json(),
+        ordering,
+        selected_items,
+    )
+
+
+def get_filter_plan(queryset, filters, project, request, prepare_params=None):
+    key = get_filter_plan_key(filters, project, prepare_params)
+    with _filter_plans_lock:
+        plan = _filter_plans.get(key)
+        if plan is not None:
+            _filter_plans.move_to_end(key)
+    if plan is not None:
+        # Q objects and expressions are mutable, every request gets its own copy
+        return copy.deepcopy(plan)
+
+    # filters are mutated while compiling, keep the request's copy intact
+    plan = compile_filters(queryset, filters.model_copy(deep=True), project, request)
+
+    if plan.cacheable and settings.DATA_MANAGER_FILTER_PLAN_CACHE_SIZE > 0:
+        cached_plan = copy.deepcopy(plan)
+        with _filter_plans_lock:
+            _filter_plans[key] = cached_plan
+            while len(_filter_plans) > settings.DATA_MANAGER_FILTER_PLAN_CACHE_SIZE:
+                _filter_plans.popitem(last=False)
+    return plan
+
+
+def apply_filters(queryset, filters, project, request, prepare_params=None):
     if not filters:
         return queryset
 
+    return get_filter_plan(queryset, filters, project, request, prepare_params).apply(queryset)
+
+
+def compile_filters(queryset, filters, project, request):
     # convert conjunction to orm statement
     filter_expressions = []
+    annotations = {}
+    cacheable = True
     custom_filter_expressions = load_func(settings.DATA_MANAGER_CUSTOM_FILTER_EXPRESSIONS)
+    preprocess_field_name = load_func(settings.PREPROCESS_FIELD_NAME)
+    preprocess_filter = load_func(settings.DATA_MANAGER_PREPROCESS_FILTER)
 
     for _filter in filters.items:
 
@@ -272,16 +450,16 @@ def apply_filters(queryset, filters, project, request):
             continue
 
         # django orm loop expression attached to column name
-        preprocess_field_name = load_func(settings.PREPROCESS_FIELD_NAME)
         field_name, _ = preprocess_field_name(_filter.filter, project)
 
         # filter pre-processing, value type conversion, etc..
-        preprocess_filter = load_func(settings.DATA_MANAGER_PREPROCESS_FILTER)
         _filter = preprocess_filter(_filter, field_name)
 
         # custom expressions for enterprise
         filter_expression = custom_filter_expressions(_filter, field_name, project, request=request)
         if filter_expression:
+            # custom expressions may depend on the request, don't reuse them
+            cacheable = False
             filter_expressions.append(filter_expression)
             continue
 
@@ -299,7 +477,7 @@ def apply_filters(queryset, filters, project, request):
         if field_name in ['annotations_results', 'predictions_results']:
             result = add_result_filter(field_name, _filter, filter_expressions, project)
             if result == 'exit':
-                return queryset.none()
+                return FilterPlan(empty=True)
             elif result == 'continue':
                 continue
 
@@ -339,14 +517,8 @@ def apply_filters(queryset, filters, project, request):
         # annotate with cast to number if need
         if _filter.type == 'Number' and field_name.startswith('data__'):
             json_field = field_name.replace('data__', '')
-            queryset = queryset.annotate(
-                **{
-                    f'filter_{json_field.replace("$undefined$", "undefined")}': Cast(
-                        KeyTextTransform(json_field, 'data'), output_field=FloatField()
-                    )
-                }
-            )
             clean_field_name = f'filter_{json_field.replace("$undefined$", "undefined")}'
+            annotations[clean_field_name] = Cast(KeyTextTransform(json_field, 'data'), output_field=FloatField())
         else:
             clean_field_name = field_name
 
@@ -358,16 +530,13 @@ def apply_filters(queryset, filters, project, request):
             _filter.operator = 'equal' if cast_bool_from_str(_filter.value) else 'not_equal'
             _filter.value = 0
 
-        # get type of annotated field
-        value_type = 'str'
-        if queryset.exists():
-            value_type = type(queryset.values_list(field_name, flat=True)[0]).__name__
-
-        if (value_type == 'list' or value_type == 'tuple') and 'equal' in _filter.operator:
+        # list columns can't be compared with equal
+        if 'equal' in _filter.operator and get_filter_value_type(field_name, queryset) in ('list', 'tuple'):
             raise Exception('Not supported filter type')
 
         # special case: for strings empty is "" or null=True
         if _filter.type in ('String', 'Unknown') and _filter.operator == 'empty':
+            value_type = get_filter_value_type(field_name, queryset)
             value = cast_bool_from_str(_filter.value)
             if value:  # empty = true
                 q = Q(Q(**{field_name: None}) | Q(**{field_name + '__isnull': True}))
@@ -392,7 +561,7 @@ def apply_filters(queryset, filters, project, request):
                 re.compile(pattern=str(_filter.value))
             except Exception as e:
                 logger.info('Incorrect regex for filter: %s: %s', _filter.value, str(e))
-                return queryset.none()
+                return FilterPlan(empty=True)
 
         # append operator
         field_name = f"{clean_field_name}{operators.get(_filter.operator, '')}"
@@ -450,21 +619,7 @@ def apply_filters(queryset, filters, project, request):
             cast_value(_filter)
             filter_expressions.append(Q(**{field_name: _filter.value}))
 
-    """WARNING: Stringifying filter_expressions will evaluate the (sub)queryset.
-        Do not use a log in the following manner:
-        logger.debug(f'Apply filter: {filter_expressions}')
-        Even in DEBUG mode, a subqueryset that has OuterRef will raise an error
-        if evaluated outside a parent queryset.
-    """
-    if filters.conjunction == ConjunctionEnum.OR:
-        result_filter = Q()
-        for filter_expression in filter_expressions:
-            result_filter.add(filter_expression, Q.OR)
-        queryset = queryset.filter(result_filter)
-    else:
-        for filter_expression in filter_expressions:
-            queryset = queryset.filter(filter_expression)
-    return queryset
+    return FilterPlan(annotations, filter_expressions, filters.conjunction, cacheable=cacheable)
 
 
 class TaskQuerySet(models.QuerySet):
@@ -483,7 +638,7 @@ class TaskQuerySet(models.QuerySet):
 
         project = Project.objects.get(pk=prepare_params.project)
         request = prepare_params.request
-        queryset = apply_filters(queryset, prepare_params.filters, project, request)
+        queryset = apply_filters(queryset, prepare_params.filters, project, request, prepare_params)
         queryset = apply_ordering(queryset, prepare_params.ordering, project, request, view_data=prepare_params.data)
 
         if not prepare_params.selectedItems:
@@ -517,6 +672,8 @@ def newest_annotation_subquery() -> Subquery:
 
 
 def base_annotate_completed_at(queryset: TaskQuerySet) -> TaskQuerySet:
+    if settings.DATA_MANAGER_TASK_AGGREGATES:
+        return queryset.annotate(completed_at=Case(When(is_labeled=True, then=F('aggregate__completed_at'))))
     return queryset.annotate(completed_at=Case(When(is_labeled=True, then=newest_annotation_subquery())))
 
 
@@ -592,6 +749,10 @@ def annotate_storage_filename(queryset: TaskQuerySet) -> TaskQuerySet:
 
 
 def annotate_annotations_results(queryset):
+    if settings.DATA_MANAGER_TASK_AGGREGATES:
+        return queryset.annotate(
+            annotations_results=Coalesce(F('aggregate__annotations_results'), Value(''), output_field=TextField())
+        )
     if settings.DJANGO_DB == settings.DJANGO_DB_SQLITE:
         return queryset.annotate(
             annotations_results=Coalesce(
@@ -614,6 +775,15 @@ def annotate_predictions_results(queryset):
 
 
 def annotate_annotators(queryset):
+    if settings.DATA_MANAGER_TASK_AGGREGATES:
+        # same types as the live aggregation below: a comma-separated string on SQLite, an array on PostgreSQL
+        annotators = Coalesce(F('aggregate__annotators'), Value(''), output_field=TextField())
+        if settings.DJANGO_DB != settings.DJANGO_DB_SQLITE:
+            annotators = Cast(
+                Func(annotators, Value(','), function='string_to_array', output_field=ArrayField(TextField())),
+                ArrayField(models.IntegerField()),
+            )
+        return queryset.annotate(annotators=annotators)
     if settings.DJANGO_DB == settings.DJANGO_DB_SQLITE:
         return queryset.annotate(
             annotators=Coalesce(GroupConcat('annotations__completed_by'), Value(''), output_field=models.CharField())
@@ -622,6 +792,12 @@ def annotate_annotators(queryset):
         return queryset.annotate(annotators=ArrayAgg('annotations__completed_by', distinct=True, default=Value([])))
 
 
+def annotate_avg_predictions_score(queryset):
+    if settings.DATA_MANAGER_TASK_AGGREGATES:
+        return queryset.annotate(predictions_score=F('aggregate__predictions_score'))
+    return queryset.annotate(predictions_score=Avg('predictions__score'))
+
+
 def annotate_predictions_score(queryset):
     first_task = queryset.first()
     if not first_task:
@@ -633,7 +809,7 @@ def annotate_predictions_score(queryset):
             first_task.project.ml_backends.filter(project=first_task.project).values_list('model_version', flat=True)
         )
         if len(model_versions) == 0:
-            return queryset.annotate(predictions_score=Avg('predictions__score'))
+            return annotate_avg_predictions_score(queryset)
 
         else:
             return queryset.annotate(
@@ -642,7 +818,7 @@ def annotate_predictions_score(queryset):
     else:
         model_version = first_task.project.model_version
         if model_version is None:
-            return queryset.annotate(predictions_score=Avg('predictions__score'))
+            return annotate_avg_predictions_score(queryset)
         else:
             return queryset.annotate(
                 predictions_score=Avg('predictions__score', filter=Q(predictions__model_version=model_version))
@@ -666,6 +842,8 @@ def annotate_predictions_model_versions(queryset):
 
 
 def annotate_avg_lead_time(queryset):
+    if settings.DATA_MANAGER_TASK_AGGREGATES:
+        return queryset.annotate(avg_lead_time=F('aggregate__avg_lead_time'))
     return queryset.annotate(avg_lead_time=Avg('annotations__lead_time'))
 
 
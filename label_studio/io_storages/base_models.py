@@ -12,7 +12,8 @@ import django_rq
 import rq
 import rq.exceptions
 from core.feature_flags import flag_set
-from core.redis import is_job_in_queue, is_job_on_worker, redis_connected
+from core.local_queue import LocalJob
+from core.redis import is_job_in_queue, is_job_on_worker, redis_connected, start_job_async_or_sync
 from core.utils.common import load_func
 from data_export.serializers import ExportDataSerializer
 from django.conf import settings
@@ -435,32 +436,34 @@ class ImportStorage(Storage):
         self._scan_and_create_links(ImportStorageLink)
 
     def sync(self):
+        meta = {'project': self.project.id, 'storage': self.id}
         if redis_connected():
             queue = django_rq.get_queue('low')
-            meta = {'project': self.project.id, 'storage': self.id}
-            if not is_job_in_queue(queue, 'import_sync_background', meta=meta) and not is_job_on_worker(
+            if is_job_in_queue(queue, 'import_sync_background', meta=meta) or is_job_on_worker(
                 job_id=self.last_sync_job, queue_name='low'
             ):
-                self.info_set_queued()
-                sync_job = queue.enqueue(
-                    import_sync_background,
-                    self.__class__,
-                    self.id,
-                    meta=meta,
-                    project_id=self.project.id,
-                    organization_id=self.project.organization.id,
-                    on_failure=storage_background_failure,
-                    job_timeout=settings.RQ_LONG_JOB_TIMEOUT,
-                )
-                self.info_set_job(sync_job.id)
-                logger.info(f'Storage sync background job {sync_job.id} for storage {self} has been started')
-        else:
-            try:
-                logger.info(f'Start syncing storage {self}')
-                self.info_set_queued()
-                import_sync_background(self.__class__, self.id)
-            except Exception:
-                storage_background_failure(self)
+                return
+
+        self.info_set_queued()
+        try:
+            sync_job = start_job_async_or_sync(
+                import_sync_background,
+                self.__class__,
+                self.id,
+                queue_name='low',
+                meta=meta,
+                project_id=self.project.id,
+                organization_id=self.project.organization.id,
+                on_failure=storage_background_failure,
+                job_timeout=settings.RQ_LONG_JOB_TIMEOUT,
+            )
+        except Exception:
+            # the sync ran inline and on_failure has marked the storage failed
+            logger.error(f'Storage sync for storage {self} failed', exc_info=True)
+            return
+        if isinstance(sync_job, (Job, LocalJob)):
+            self.info_set_job(sync_job.id)
+            logger.info(f'Storage sync background job {sync_job.id} for storage {self} has been started')
 
     class Meta:
         abstract = True
@@ -497,8 +500,8 @@ def export_sync_background(storage_class, storage_id, **kwargs):
 
 
 def storage_background_failure(*args, **kwargs):
-    # job is used in rqworker failure, extract storage id from job arguments
-    if isinstance(args[0], rq.job.Job):
+    # job is used in rqworker, in-process queue or inline failure, extract storage id from job arguments
+    if isinstance(args[0], (rq.job.Job, LocalJob)):
         sync_job = args[0]
         _class = sync_job.args[0]
         storage_id = sync_job.args[1]
@@ -564,27 +567,25 @@ class ExportStorage(Storage, ProjectStorageMixin):
         self.info_set_completed(last_sync_count=annotation_exported, total_annotations=total_annotations)
 
     def sync(self):
-        if redis_connected():
-            queue = django_rq.get_queue('low')
-            self.info_set_queued()
-            sync_job = queue.enqueue(
+        self.info_set_queued()
+        try:
+            sync_job = start_job_async_or_sync(
                 export_sync_background,
                 self.__class__,
                 self.id,
-                job_timeout=settings.RQ_LONG_JOB_TIMEOUT,
+                queue_name='low',
                 project_id=self.project.id,
                 organization_id=self.project.organization.id,
                 on_failure=storage_background_failure,
+                job_timeout=settings.RQ_LONG_JOB_TIMEOUT,
             )
+        except Exception:
+            # the sync ran inline and on_failure has marked the storage failed
+            logger.error(f'Storage sync for storage {self} failed', exc_info=True)
+            return
+        if isinstance(sync_job, (Job, LocalJob)):
             self.info_set_job(sync_job.id)
             logger.info(f'Storage sync background job {sync_job.id} for storage {self} has been queued')
-        else:
-            try:
-                logger.info(f'Start syncing storage {self}')
-                self.info_set_queued()
-                export_sync_background(self.__class__, self.id)
-            except Exception:
-                storage_background_failure(self)
 
     class Meta:
         abstract = True
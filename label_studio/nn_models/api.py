@@ -1,20 +1,29 @@
-from data_export.serializers import ExportDataSerializer
 from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import transaction
+from django.http import HttpResponse
 from django.http.response import StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 import mimetypes
-from nn_models.utils.yolo import prepare_yolo
-from nn_models.utils.base import list_models
+from nn_models.functions import (
+    start_conversion_job,
+    start_training_job,
+    stream_training_events,
+)
+from nn_models.utils.base import get_file_hash, list_models
 from projects.models import Project
 from rest_framework import generics, status
 from rest_framework.response import Response
 from ranged_fileresponse import RangedFileResponse
-from tasks.models import Task
 
 import os
+from urllib.parse import quote
 
-from nn_models.models import NNModel
-from nn_models.serializers import NNModelSerializer
-from nn_models.converter import convert_nn_model
+from nn_models.models import NNModel, TrainingJob
+from nn_models.serializers import NNModelSerializer, TrainingJobSerializer
+from nn_models.uploader import stage_nn_model_upload
 
 
 class NNModelApi(generics.RetrieveUpdateDestroyAPIView):
@@ -44,48 +53,69 @@ class NNModelListApi(generics.ListCreateAPIView):
 
 class NNModelBaseModelListApi(generics.ListAPIView):
     def get(self, request, *args, **kwargs):
-        models = list_models()
+        models = list_models(task=request.query_params.get("task"), installed=True)
 
-        if (task := request.query_params.get("task", None)) is not None:
-            models = list(filter(lambda x: x.get("task", None) == task, models))
-
-        return Response(
-            [model["name"] for model in models if model.get("installed", False)]
-        )
+        return Response([model["name"] for model in models])
 
 
 class NNModelUploadApi(generics.CreateAPIView):
     serializer_class = NNModelSerializer
 
-    def create(self, request, *args, **kwargs):
+    def get(self, request, *args, **kwargs):
         nn_model = generics.get_object_or_404(NNModel, id=self.kwargs.get("pk"))
-        nn_model.model_path = convert_nn_model(
-            request, nn_model.name, nn_model.base_model
-        )
-        nn_model.save()
 
         return Response(NNModelSerializer(nn_model).data)
 
+    def create(self, request, *args, **kwargs):
+        nn_model = generics.get_object_or_404(NNModel, id=self.kwargs.get("pk"))
+        staging_dir = stage_nn_model_upload(request, nn_model)
+        start_conversion_job(nn_model, staging_dir, request.headers.get("X-imgsz"))
+
+        return Response(
+            NNModelSerializer(nn_model).data, status=status.HTTP_202_ACCEPTED
+        )
+
 
 class NNModelFileResponse(generics.RetrieveAPIView):
     permission_classes = []
 
     def get(self, request, *args, **kwargs):
         filename = kwargs["filename"]
-        file = (
-            settings.MODEL_ROOT
-            + ("/" if not settings.MODEL_ROOT.endswith("/") else "")
-            + filename
+        try:
+            file = safe_join(settings.MODEL_ROOT, filename)
+        except SuspiciousFileOperation:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+
+        if not os.path.isfile(file):
+            return Response(status=status.HTTP_404_NOT_FOUND)
+
+        etag = f'"{get_file_hash(file)}"'
+        last_modified = os.stat(file).st_mtime
+        response = get_conditional_response(
+            request, etag=etag, last_modified=int(last_modified)
         )
 
-        if os.path.exists(file):
-            content_type, encoding = mimetypes.guess_type(str(filename))
-            content_type = content_type or "application/octet-stream"
-            return RangedFileResponse(
-                request, open(file, "rb"), content_type=content_type
-            )
-
-        return Response(status=status.HTTP_404_NOT_FOUND)
+        if response is None:
+            # NGINX serves the file with sendfile and keeps uwsgi workers free
+            if settings.USE_NGINX_FOR_MODEL_DOWNLOADS:
+                response = HttpResponse()
+                # below header tells NGINX to serve it, see deploy/default.conf
+                response["X-Accel-Redirect"] = (
+                    settings.NGINX_MODEL_DOWNLOAD_LOCATION.rstrip("/")
+                    + "/"
+                    + quote(filename)
+                )
+            else:
+                content_type, encoding = mimetypes.guess_type(str(filename))
+                content_type = content_type or "application/octet-stream"
+                response = RangedFileResponse(
+                    request, open(file, "rb"), content_type=content_type
+                )
+
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        response["Cache-Control"] = "no-cache"
+        return response
 
 
 class NNModelTrainApi(generics.CreateAPIView):
@@ -94,32 +124,47 @@ class NNModelTrainApi(generics.CreateAPIView):
     def get_queryset(self):
         return Project.objects
 
-    def get_task_queryset(self, queryset):
-        return queryset.select_related("project").prefetch_related(
-            "annotations", "predictions"
-        )
-
     def create(self, request, *args, **kwargs):
         project = self.get_object()
         config = request.data
-        query = Task.objects.filter(project=project).filter(annotations__isnull=False)
-        tasks = ExportDataSerializer(
-            self.get_task_queryset(query), many=True, expand=["drafts"]
-        ).data
         imgsz = config.get("imgsz")
 
         if imgsz is not None:
             imgsz = imgsz.lower().strip().split("x")
             imgsz = int(imgsz[1]), int(imgsz[0])
 
-        stream_cb = prepare_yolo(
-            project,
-            tasks,
-            config["model_name"],
-            config["base_model"],
-            imgsz or (640, 640),
+        training_job = TrainingJob.objects.create(
+            project=project,
+            created_by=request.user,
+            model_name=config["model_name"],
+            base_model=config["base_model"],
+            config={
+                "epochs": int(config.get("epochs") or 50),
+                "imgsz": imgsz or (640, 640),
+            },
         )
+        transaction.on_commit(lambda: start_training_job(training_job))
+
+        response = StreamingHttpResponse(
+            stream_training_events(training_job.id), content_type="text/event-stream"
+        )
+        response["X-Training-Job-Id"] = str(training_job.id)
+        return response
+
+
+class TrainingJobApi(generics.RetrieveAPIView):
+    serializer_class = TrainingJobSerializer
+    queryset = TrainingJob.objects.all()
+
+
+class TrainingJobEventsApi(generics.RetrieveAPIView):
+    queryset = TrainingJob.objects.all()
+
+    def get(self, request, *args, **kwargs):
+        training_job = self.get_object()
+        offset = int(request.query_params.get("offset", 0))
 
         return StreamingHttpResponse(
-            stream_cb(int(config.get("epochs") or 50)), content_type="text/event-stream"
+            stream_training_events(training_job.id, offset),
+            content_type="text/event-stream",
         )
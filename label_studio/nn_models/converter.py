@@ -1,38 +1,29 @@
-import blobconverter as bc
-import tensorflow_hub as hub
-import tensorflowjs as tfjs
-import tf_keras
 import tempfile
-import tf2onnx
 import json
 import os
 
 from django.conf import settings
 from django.utils._os import safe_join
 from nn_models.utils.base import MODEL_DIR
-from rest_framework.exceptions import ValidationError
+from nn_models.utils.blob import onnx_to_blob
 
-from io import BytesIO
 
+def convert_nn_model(staging_dir, model_name, base_model_name, imgsz=None):
+    """Convert staged TF.js model files on top of a base model to a blob.
 
-def convert_nn_model(request, model_name, base_model_name):
-    if not request.FILES:
-        raise ValidationError("No files uploaded")
-    elif "model.json" not in request.FILES or "model.weights.bin" not in request.FILES:
-        raise ValidationError("model.json or model.weights.bin not uploaded")
+    `imgsz` is the optional "WxH" input size of the exported model.
+    """
+    import tensorflow_hub as hub
+    import tensorflowjs as tfjs
+    import tf2onnx
+    import tf_keras
 
-    json_content, weights_content = BytesIO(), BytesIO()
-    for filename, file in request.FILES.items():
-        if filename == "model.json":
-            json_content.write(file.read())
-        elif filename == "model.weights.bin":
-            weights_content.write(file.read())
-
-    json_content.seek(0)
-    weights_content.seek(0)
-    upload_model = tfjs.converters.deserialize_keras_model(
-        json_content, [weights_content]
-    )
+    with open(os.path.join(staging_dir, "model.json"), "rb") as json_content, open(
+        os.path.join(staging_dir, "model.weights.bin"), "rb"
+    ) as weights_content:
+        upload_model = tfjs.converters.deserialize_keras_model(
+            json_content, [weights_content]
+        )
 
     base_model_dir = safe_join(MODEL_DIR, base_model_name)
     base_model = hub.KerasLayer(
@@ -48,7 +39,6 @@ def convert_nn_model(request, model_name, base_model_name):
 
     layers = [base_model, upload_model]
 
-    imgsz = request.headers.get("X-imgsz")
     if imgsz is not None:
         imgsz = imgsz.lower().strip().split("x")
         w, h = int(imgsz[0]), int(imgsz[1])
@@ -70,8 +60,9 @@ def convert_nn_model(request, model_name, base_model_name):
     )
 
     model_path = safe_join(settings.MODEL_ROOT, f"{model_name}.blob")
-    saved_model_path = bc.from_onnx(
+    onnx_to_blob(
         temp_onnx.name,
+        model_path,
         "FP16",
         [
             "--mean_values=[0,0,0]",
@@ -79,6 +70,5 @@ def convert_nn_model(request, model_name, base_model_name):
             f"--input_shape=[1,3,{input_height},{input_width}]",
         ],
     )
-    os.rename(saved_model_path, model_path)
 
     return f"{model_name}.blob"
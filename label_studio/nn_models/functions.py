@@ -0,0 +1,297 @@
+import json
+import logging
+import shutil
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+
+from core.local_queue import get_local_queue
+from core.redis import enqueue_rq_job, redis_connected
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+from nn_models.models import NNModel, TrainingJob
+
+logger = logging.getLogger(__name__)
+
+
+_conversion_lock = threading.Lock()
+
+
+def _run_in_thread(job, *args):
+    try:
+        job(*args)
+    except Exception:
+        logger.error(f"Background job {job.__name__} failed", exc_info=True)
+    finally:
+        # the thread has its own database connections
+        connections.close_all()
+
+
+def _start_job(
+    job, *args, queue_name, local_queue_name, job_timeout, in_seconds=0, on_failure=None
+):
+    """Queue `job` on RQ, on its own in-process queue, or run it in a thread otherwise.
+
+    Unlike start_job_async_or_sync, this never runs the job inline, so the
+    request that started it returns immediately. In-process jobs get queues of
+    their own, so hours of training don't hold up storage syncs, and start
+    once the current transaction commits, so their thread sees its data.
+    """
+    if redis_connected():
+        rq_job = enqueue_rq_job(
+            job,
+            *args,
+            queue_name=queue_name,
+            job_timeout=job_timeout,
+            in_seconds=in_seconds,
+            on_failure=on_failure,
+        )
+        if rq_job is not None:
+            return
+
+    def start():
+        if settings.LOCAL_JOB_QUEUE_ENABLED:
+            queue = get_local_queue(local_queue_name, max_jobs=0)
+            if in_seconds > 0:
+                delay = timedelta(seconds=in_seconds)
+                queue.enqueue_in(delay, job, *args, on_failure=on_failure)
+            else:
+                queue.enqueue(job, *args, on_failure=on_failure)
+        else:
+            thread = threading.Timer(in_seconds, _run_in_thread, args=(job, *args))
+            thread.daemon = True
+            thread.start()
+
+    transaction.on_commit(start)
+
+
+def start_training_job(training_job, waiting=False, in_seconds=0):
+    _start_job(
+        run_training_job,
+        training_job.id,
+        waiting,
+        queue_name=settings.NN_MODEL_TRAINING_QUEUE,
+        local_queue_name=settings.NN_MODEL_TRAINING_LOCAL_QUEUE,
+        job_timeout=settings.NN_MODEL_TRAINING_JOB_TIMEOUT,
+        in_seconds=in_seconds,
+        on_failure=training_job_failure,
+    )
+
+
+def training_job_failure(job, *args):
+    """on_failure hook of training jobs, fails the TrainingJob of a crashed job"""
+    exc_value = args[-2]
+    TrainingJob.objects.filter(
+        id=job.args[0],
+        status__in=[TrainingJob.Status.CREATED, TrainingJob.Status.IN_PROGRESS],
+    ).update(
+        status=TrainingJob.Status.FAILED,
+        error=str(exc_value),
+        finished_at=timezone.now(),
+    )
+
+
+def start_conversion_job(nn_model, staging_dir, imgsz=None):
+    nn_model.conversion_status = NNModel.ConversionStatus.QUEUED
+    nn_model.conversion_error = None
+    nn_model.save(update_fields=["conversion_status", "conversion_error"])
+    _start_job(
+        run_conversion_job,
+        nn_model.id,
+        staging_dir,
+        imgsz,
+        queue_name=settings.NN_MODEL_CONVERSION_QUEUE,
+        local_queue_name=settings.NN_MODEL_CONVERSION_LOCAL_QUEUE,
+        job_timeout=settings.NN_MODEL_CONVERSION_JOB_TIMEOUT,
+    )
+
+
+def run_conversion_job(nn_model_id, staging_dir, imgsz=None):
+    from nn_models.converter import convert_nn_model
+
+    try:
+        nn_model = NNModel.objects.get(id=nn_model_id)
+    except NNModel.DoesNotExist:
+        logger.error(f"NNModel with id {nn_model_id} not found, conversion failed")
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        return
+
+    # conversions are memory hungry, run one at a time per process
+    with _conversion_lock:
+        nn_model.conversion_status = NNModel.ConversionStatus.IN_PROGRESS
+        nn_model.save(update_fields=["conversion_status"])
+        try:
+            nn_model.model_path = convert_nn_model(
+                staging_dir, nn_model.name, nn_model.base_model, imgsz
+            )
+        except Exception as e:
+            logger.error(
+                f"Conversion of NNModel {nn_model_id} failed: {e}", exc_info=True
+            )
+            nn_model.conversion_status = NNModel.ConversionStatus.FAILED
+            nn_model.conversion_error = str(e)
+        else:
+            nn_model.conversion_status = NNModel.ConversionStatus.COMPLETED
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+    nn_model.save()
+
+
+def expire_stale_training_jobs(cutoff):
+    """Fail running jobs whose heartbeat (`updated_at`) is older than `cutoff`.
+
+    Their worker crashed or was restarted, so nothing will finish them.
+    """
+    stale = TrainingJob.objects.filter(
+        status=TrainingJob.Status.IN_PROGRESS, updated_at__lt=cutoff
+    )
+    for training_job in stale:
+        logger.error(f"Training job {training_job.id} lost its worker, failing it")
+        training_job.status = TrainingJob.Status.FAILED
+        training_job.error = "The training worker stopped unexpectedly"
+        training_job.events.append(
+            {"log": f"training failed: {training_job.error}", "status_type": "error"}
+        )
+        training_job.finished_at = timezone.now()
+        training_job.save()
+
+
+def _claim_training_slot(job_id):
+    """Mark the job as started if fewer than the allowed trainings are running.
+
+    All waiting and running jobs are locked, so concurrent claims are
+    serialized and the limit cannot be overshot. Running jobs without a
+    recent heartbeat are failed first, and waiting jobs without one (still
+    queued behind other work, or lost) don't hold up the others.
+    """
+    cutoff = timezone.now() - timedelta(
+        seconds=settings.NN_MODEL_TRAINING_HEARTBEAT_TIMEOUT
+    )
+    with transaction.atomic():
+        jobs = list(
+            TrainingJob.objects.select_for_update()
+            .filter(
+                status__in=[TrainingJob.Status.CREATED, TrainingJob.Status.IN_PROGRESS]
+            )
+            .order_by("id")
+            .values_list("id", "status", "updated_at")
+        )
+        expire_stale_training_jobs(cutoff)
+
+        running = [
+            i
+            for i, status, updated_at in jobs
+            if status == TrainingJob.Status.IN_PROGRESS and updated_at >= cutoff
+        ]
+        waiting = [
+            i
+            for i, status, updated_at in jobs
+            if status == TrainingJob.Status.CREATED
+            and (updated_at >= cutoff or i == job_id)
+        ]
+
+        # first come, first served among waiting jobs
+        free_slots = settings.NN_MODEL_MAX_CONCURRENT_TRAININGS - len(running)
+        if job_id not in waiting[: max(free_slots, 0)]:
+            # heartbeat of a waiting job
+            TrainingJob.objects.filter(id=job_id).update(updated_at=timezone.now())
+            return False
+
+        TrainingJob.objects.filter(id=job_id).update(
+            status=TrainingJob.Status.IN_PROGRESS, started_at=timezone.now()
+        )
+        return True
+
+
+@contextmanager
+def _heartbeat(job_id):
+    """Bump the job's `updated_at` in a thread while the block runs"""
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(settings.NN_MODEL_TRAINING_HEARTBEAT_INTERVAL):
+            TrainingJob.objects.filter(id=job_id).update(updated_at=timezone.now())
+        connections.close_all()
+
+    thread = threading.Thread(target=beat, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def run_training_job(job_id, waiting=False):
+    from nn_models.utils.yolo import train_yolo
+
+    try:
+        training_job = TrainingJob.objects.get(id=job_id)
+    except TrainingJob.DoesNotExist:
+        logger.error(f"TrainingJob with id {job_id} not found, training failed")
+        return
+    if training_job.status != TrainingJob.Status.CREATED:
+        logger.error(f"Training job with id {job_id} already started")
+        return
+
+    if not _claim_training_slot(job_id):
+        if not waiting:
+            training_job.add_event(
+                {"log": "waiting for a free training slot", "status_type": "loading"}
+            )
+        # try again later instead of holding the worker
+        start_training_job(
+            training_job,
+            waiting=True,
+            in_seconds=settings.NN_MODEL_TRAINING_RETRY_DELAY,
+        )
+        return
+
+    training_job.refresh_from_db()
+    config = training_job.config
+    try:
+        with _heartbeat(job_id):
+            nn_model = train_yolo(
+                training_job.project,
+                training_job.model_name,
+                training_job.base_model,
+                tuple(config["imgsz"]),
+                config["epochs"],
+                training_job.add_event,
+            )
+    except Exception as e:
+        logger.error(f"Training job {job_id} failed: {e}", exc_info=True)
+        training_job.status = TrainingJob.Status.FAILED
+        training_job.error = str(e)
+        training_job.traceback = traceback.format_exc()
+        training_job.events.append(
+            {"log": f"training failed: {e}", "status_type": "error"}
+        )
+    else:
+        training_job.status = TrainingJob.Status.COMPLETED
+        training_job.nn_model = nn_model
+    training_job.finished_at = timezone.now()
+    training_job.save()
+
+
+def stream_training_events(job_id, offset=0):
+    """Yield the job's events from `offset` on until the job finishes.
+
+    The events are persisted, so a client can reattach at any time and
+    replay what it missed.
+    """
+    while True:
+        status, events = TrainingJob.objects.values_list("status", "events").get(
+            id=job_id
+        )
+        for event in events[offset:]:
+            yield json.dumps(event)
+        offset = max(offset, len(events))
+
+        if status in TrainingJob.FINISHED_STATUSES:
+            return
+        time.sleep(settings.NN_MODEL_TRAINING_POLL_INTERVAL)
@@ -1,7 +1,7 @@
 from django.core.management import call_command
 from django.core.management.base import BaseCommand
 
-from nn_models.utils.base import list_models, install_model
+from nn_models.utils.base import list_models, install_models
 
 
 class Command(BaseCommand):
@@ -19,6 +19,12 @@ class Command(BaseCommand):
         arg_group.add_argument(
             "--detection", action="store_true", help="Install detection models"
         )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Number of parallel downloads",
+        )
 
     def handle(self, *args, **options):
         models = list_models()
@@ -31,12 +37,17 @@ class Command(BaseCommand):
                     continue
             models = list(filter(lambda x: x["name"] in chosen_models, models))
         elif options.get("detection", False):
-            models = list(filter(lambda x: x["task"] == "detection", models))
+            models = list_models(task="detection")
         elif options.get("classification", False):
-            models = list(filter(lambda x: x["task"] == "classification", models))
+            models = list_models(task="classification")
 
-        for model in models:
-            install_model(model["name"])
-            self.stdout.write(f"Model {model['name']} installed")
+        results = install_models(
+            [model["name"] for model in models], workers=options.get("workers")
+        )
+        for model_name, installed in results.items():
+            if installed:
+                self.stdout.write(f"Model {model_name} installed")
+            else:
+                self.stderr.write(f"Model {model_name} could not be installed")
 
         call_command("collectstatic", "--no-input")
@@ -0,0 +1,126 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("projects", "0028_auto_20241107_1031"),
+        ("nn_models", "0003_nnmodel_model_type"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TrainingJob",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "model_name",
+                    models.CharField(max_length=255, verbose_name="model_name"),
+                ),
+                (
+                    "base_model",
+                    models.CharField(max_length=255, verbose_name="base_model"),
+                ),
+                (
+                    "config",
+                    models.JSONField(
+                        default=dict,
+                        help_text="Training parameters (epochs, imgsz)",
+                        verbose_name="config",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("created", "Created"),
+                            ("in_progress", "In progress"),
+                            ("failed", "Failed"),
+                            ("completed", "Completed"),
+                        ],
+                        default="created",
+                        max_length=64,
+                    ),
+                ),
+                (
+                    "events",
+                    models.JSONField(
+                        default=list,
+                        help_text="Progress messages streamed to clients, including per-epoch metrics",
+                        verbose_name="events",
+                    ),
+                ),
+                ("error", models.TextField(blank=True, null=True)),
+                ("traceback", models.TextField(blank=True, null=True)),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="created at"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="updated at"),
+                ),
+                (
+                    "started_at",
+                    models.DateTimeField(
+                        default=None, null=True, verbose_name="started at"
+                    ),
+                ),
+                (
+                    "finished_at",
+                    models.DateTimeField(
+                        default=None, null=True, verbose_name="finished at"
+                    ),
+                ),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        help_text="User who started the training",
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="training_jobs",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "nn_model",
+                    models.ForeignKey(
+                        blank=True,
+                        help_text="Trained model",
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="training_jobs",
+                        to="nn_models.nnmodel",
+                    ),
+                ),
+                (
+                    "project",
+                    models.ForeignKey(
+                        help_text="Project ID the model is trained on",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="training_jobs",
+                        to="projects.project",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "nn_model_training_job",
+                "indexes": [
+                    models.Index(
+                        fields=["status"], name="nn_model_tr_job_status_idx"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("nn_models", "0004_trainingjob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="nnmodel",
+            name="conversion_status",
+            field=models.CharField(
+                choices=[
+                    ("none", "None"),
+                    ("queued", "Queued"),
+                    ("in_progress", "In progress"),
+                    ("failed", "Failed"),
+                    ("completed", "Completed"),
+                ],
+                default="none",
+                help_text="Status of the conversion of an uploaded model to a blob",
+                max_length=64,
+                verbose_name="conversion_status",
+            ),
+        ),
+        migrations.AddField(
+            model_name="nnmodel",
+            name="conversion_error",
+            field=models.TextField(
+                blank=True, null=True, verbose_name="conversion_error"
+            ),
+        ),
+    ]
@@ -9,6 +9,13 @@ class NNModel(NNModelMixin, models.Model):
         YOLO = "YOLO", _("YOLO")
         MobileNetSSD = "MobileNetSSD", _("MobileNetSSD")
 
+    class ConversionStatus(models.TextChoices):
+        NONE = "none", _("None")
+        QUEUED = "queued", _("Queued")
+        IN_PROGRESS = "in_progress", _("In progress")
+        FAILED = "failed", _("Failed")
+        COMPLETED = "completed", _("Completed")
+
     id = models.AutoField(
         auto_created=True,
         primary_key=True,
@@ -30,6 +37,82 @@ class NNModel(NNModelMixin, models.Model):
     )
     base_model = models.CharField(_("base_model"), max_length=255)
     model_path = models.CharField(_("model_path"), max_length=255)
+    conversion_status = models.CharField(
+        _("conversion_status"),
+        max_length=64,
+        choices=ConversionStatus.choices,
+        default=ConversionStatus.NONE,
+        help_text="Status of the conversion of an uploaded model to a blob",
+    )
+    conversion_error = models.TextField(_("conversion_error"), null=True, blank=True)
 
     class Meta:
         db_table = "nn_model"
+
+
+class TrainingJob(models.Model):
+    class Status(models.TextChoices):
+        CREATED = "created", _("Created")
+        IN_PROGRESS = "in_progress", _("In progress")
+        FAILED = "failed", _("Failed")
+        COMPLETED = "completed", _("Completed")
+
+    FINISHED_STATUSES = (Status.FAILED, Status.COMPLETED)
+
+    project = models.ForeignKey(
+        "projects.Project",
+        related_name="training_jobs",
+        on_delete=models.CASCADE,
+        help_text="Project ID the model is trained on",
+    )
+    created_by = models.ForeignKey(
+        "users.User",
+        related_name="training_jobs",
+        on_delete=models.SET_NULL,
+        null=True,
+        help_text="User who started the training",
+    )
+    model_name = models.CharField(_("model_name"), max_length=255)
+    base_model = models.CharField(_("base_model"), max_length=255)
+    config = models.JSONField(
+        _("config"), default=dict, help_text="Training parameters (epochs, imgsz)"
+    )
+    status = models.CharField(
+        max_length=64, choices=Status.choices, default=Status.CREATED
+    )
+    events = models.JSONField(
+        _("events"),
+        default=list,
+        help_text="Progress messages streamed to clients, including per-epoch metrics",
+    )
+    nn_model = models.ForeignKey(
+        NNModel,
+        related_name="training_jobs",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        help_text="Trained model",
+    )
+    error = models.TextField(null=True, blank=True)
+    traceback = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(_("created at"), auto_now_add=True)
+    updated_at = models.DateTimeField(_("updated at"), auto_now=True)
+    started_at = models.DateTimeField(_("started at"), null=True, default=None)
+    finished_at = models.DateTimeField(_("finished at"), null=True, default=None)
+
+    class Meta:
+        db_table = "nn_model_training_job"
+        indexes = [
+            models.Index(fields=["status"], name="nn_model_tr_job_status_idx")
+        ]
+
+    def has_permission(self, user):
+        return self.project.has_permission(user)
+
+    @property
+    def is_finished(self):
+        return self.status in self.FINISHED_STATUSES
+
+    def add_event(self, event):
+        self.events.append(event)
+        self.save(update_fields=["events", "updated_at"])
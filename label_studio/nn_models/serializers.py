@@ -1,7 +1,6 @@
+from nn_models.models import NNModel, TrainingJob
 from rest_flex_fields import FlexFieldsModelSerializer
 
-from nn_models.models import NNModel
-
 
 class NNModelSerializer(FlexFieldsModelSerializer):
     class Meta:
@@ -12,3 +11,9 @@ class NNModelSerializer(FlexFieldsModelSerializer):
 class BaseModelSerializer(FlexFieldsModelSerializer):
     class Meta:
         fields = "__all__"
+
+
+class TrainingJobSerializer(FlexFieldsModelSerializer):
+    class Meta:
+        model = TrainingJob
+        fields = "__all__"
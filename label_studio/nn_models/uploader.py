@@ -1,8 +1,43 @@
-import blobconverter as bc
-import tensorflow
+import os
+import shutil
 
+from django.conf import settings
+from rest_framework.exceptions import ValidationError
 
-def upload_nn_model(request, nn_model):
-    if request.FILES:
-        for filename, file in request.FILES.items():
-            bc.from_tf()
+UPLOAD_FILENAMES = ("model.json", "model.weights.bin")
+
+
+def get_upload_staging_dir(nn_model_id):
+    return os.path.join(settings.NN_MODEL_UPLOAD_DIR, str(nn_model_id))
+
+
+def _stage_file(file, destination):
+    # large uploads are already on disk, move them instead of copying
+    if hasattr(file, "temporary_file_path"):
+        shutil.move(file.temporary_file_path(), destination)
+        return
+
+    with open(destination, "wb") as f:
+        for chunk in file.chunks():
+            f.write(chunk)
+
+
+def stage_nn_model_upload(request, nn_model):
+    """Move the uploaded TF.js model files to the model's staging dir.
+
+    The files are kept on disk so the conversion job can read them in
+    place after the request has finished.
+    """
+    if not request.FILES:
+        raise ValidationError("No files uploaded")
+    elif any(filename not in request.FILES for filename in UPLOAD_FILENAMES):
+        raise ValidationError("model.json or model.weights.bin not uploaded")
+
+    staging_dir = get_upload_staging_dir(nn_model.id)
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    os.makedirs(staging_dir)
+
+    for filename in UPLOAD_FILENAMES:
+        _stage_file(request.FILES[filename], os.path.join(staging_dir, filename))
+
+    return staging_dir
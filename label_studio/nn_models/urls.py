@@ -10,6 +10,16 @@ _api_urlpatterns = [
     path("base-models", api.NNModelBaseModelListApi.as_view(), name="base-model-list"),
     path("<int:pk>/", api.NNModelApi.as_view(), name="nn-model-detail"),
     path("<int:pk>/upload", api.NNModelUploadApi.as_view(), name="nn-model-upload"),
+    path(
+        "training-jobs/<int:pk>",
+        api.TrainingJobApi.as_view(),
+        name="training-job-detail",
+    ),
+    path(
+        "training-jobs/<int:pk>/events",
+        api.TrainingJobEventsApi.as_view(),
+        name="training-job-events",
+    ),
 ]
 
 _api_projects_urlpatterns = [
@@ -1,13 +1,23 @@
+from concurrent.futures import ThreadPoolExecutor
 from django.conf import settings
 import requests
 
+import hashlib
 import json
+import logging
 import os
+import threading
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
 
 MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../models")
 STATIC_DIR = os.path.join(
     os.path.dirname(os.path.abspath(__file__)), "../static/models"
 )
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_TIMEOUT = (10, 60)
+FILE_HASH_MEMO_SIZE = 1024
 
 
 def load_model_config(model_name):
@@ -42,7 +52,7 @@ def check_model_installed(model_name, config):
     return True
 
 
-def list_models():
+def _load_models():
     models = []
 
     for model in os.listdir(MODEL_DIR):
@@ -52,6 +62,9 @@ def list_models():
             continue
 
         config = load_model_config(model)
+        if config is None:
+            continue
+
         config["name"] = model
         config["installed"] = check_model_installed(model, config)
         models.append(config)
@@ -59,28 +72,194 @@ def list_models():
     return models
 
 
-def install_model(model_name):
-    config = load_model_config(model_name)
+_catalog = {"version": None, "models": []}
+_catalog_lock = threading.Lock()
+
+
+def _get_catalog_version():
+    try:
+        stamp_mtime = os.stat(settings.NN_MODEL_CATALOG_STAMP).st_mtime_ns
+    except FileNotFoundError:
+        stamp_mtime = None
+    return os.stat(MODEL_DIR).st_mtime_ns, stamp_mtime
+
+
+def invalidate_models_cache():
+    """Drop the model catalog of every process.
+
+    Touching the catalog stamp changes its mtime, which all running processes
+    compare against before reusing their cached catalog. The stamp lives in the
+    data dir because MODEL_DIR may be part of a read-only install.
+    """
+    stamp = settings.NN_MODEL_CATALOG_STAMP
+    os.makedirs(os.path.dirname(stamp), exist_ok=True)
+    with open(stamp, "a"):
+        os.utime(stamp)
+    with _catalog_lock:
+        _catalog["version"] = None
+
+
+def list_models(task=None, installed=None):
+    """List base models, optionally filtered by task type and install state.
+
+    The catalog is cached in-process and reloaded only when the mtime of
+    MODEL_DIR or of the catalog stamp changes, so a request costs two stat
+    calls.
+    """
+    version = _get_catalog_version()
+
+    with _catalog_lock:
+        if _catalog["version"] != version:
+            _catalog["models"] = _load_models()
+            _catalog["version"] = version
+        models = _catalog["models"]
+
+    return [
+        dict(model)
+        for model in models
+        if (task is None or model.get("task") == task)
+        and (installed is None or model.get("installed", False) == installed)
+    ]
+
+
+def file_sha256(path, chunk_size=DOWNLOAD_CHUNK_SIZE):
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def _get_hash_path(path):
+    name = hashlib.sha256(os.path.abspath(path).encode("utf-8")).hexdigest()
+    return os.path.join(settings.NN_MODEL_FILE_HASH_DIR, name + ".json")
+
+
+@lru_cache(maxsize=FILE_HASH_MEMO_SIZE)
+def _get_file_hash(path, version):
+    hash_path = _get_hash_path(path)
+    try:
+        with open(hash_path) as f:
+            stored = json.load(f)
+    except (OSError, ValueError):
+        stored = {}
+
+    if stored.get("version") != list(version):
+        stored = {"version": list(version), "sha256": file_sha256(path)}
+        try:
+            os.makedirs(os.path.dirname(hash_path), exist_ok=True)
+            with open(hash_path, "w") as f:
+                json.dump(stored, f)
+        except OSError:
+            logger.warning(f"Could not store content hash of {path}")
+
+    return stored["sha256"]
 
-    if config is None:
-        return False
 
+def get_file_hash(path):
+    """Return the sha256 of `path`.
+
+    Hashes are stored in NN_MODEL_FILE_HASH_DIR, outside the served model
+    files, and reused while the file's size and mtime are unchanged. The most
+    recent ones are also memoized in-process, so a hash is computed once per
+    file version.
+    """
+    stat = os.stat(path)
+    return _get_file_hash(path, (stat.st_size, stat.st_mtime_ns))
+
+
+def download_file(url, destination, sha256=None):
+    """Stream `url` to `destination` in chunks.
+
+    Data goes to a `.part` file first; an existing one is resumed with a
+    Range request. The file is moved into place only once it matches the
+    optional `sha256` checksum.
+    """
+    part_path = destination + ".part"
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+    with requests.get(url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT) as r:
+        # 416: the part file already holds the whole content
+        if r.status_code != 416:
+            r.raise_for_status()
+            mode = "ab" if offset and r.status_code == 206 else "wb"
+            with open(part_path, mode) as f:
+                for chunk in r.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+
+    if sha256 is not None and file_sha256(part_path) != sha256.lower():
+        os.remove(part_path)
+        raise ValueError(f"Checksum mismatch for {url}")
+
+    os.replace(part_path, destination)
+    return destination
+
+
+def _link_static_files(model_name, config):
     for download in config.get("downloads", []):
         destination = get_download_destination(model_name, download)
 
-        if os.path.exists(destination):
+        if not download.get("static", False) or os.path.lexists(destination):
             continue
 
         os.makedirs(os.path.dirname(destination), exist_ok=True)
+        source = os.path.join(MODEL_DIR, model_name, download["filename"])
+        os.symlink(source, destination)
 
-        if not download.get("local", False):
-            url = download["url"]
-            r = requests.get(url)
-            with open(destination, "wb") as f:
-                f.write(r.content)
 
-        if download.get("static", False):
-            source = os.path.join(MODEL_DIR, model_name, download["filename"])
-            os.symlink(source, destination)
+def install_models(model_names, workers=None):
+    """Install several models, downloading their files in a thread pool.
 
-    return True
+    Returns `{model name: installed}`; a model whose config is missing or
+    whose download failed is reported as not installed.
+    """
+    results = {}
+    pending = {}
+
+    with ThreadPoolExecutor(
+        max_workers=workers or settings.NN_MODEL_DOWNLOAD_WORKERS
+    ) as executor:
+        for model_name in model_names:
+            config = load_model_config(model_name)
+
+            if config is None:
+                results[model_name] = False
+                continue
+
+            futures = []
+            for download in config.get("downloads", []):
+                destination = get_download_destination(model_name, download)
+
+                if download.get("local", False) or os.path.exists(destination):
+                    continue
+
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+                futures.append(
+                    executor.submit(
+                        download_file,
+                        download["url"],
+                        destination,
+                        download.get("sha256"),
+                    )
+                )
+            pending[model_name] = (config, futures)
+
+        for model_name, (config, futures) in pending.items():
+            errors = [f.exception() for f in futures if f.exception() is not None]
+
+            if errors:
+                for error in errors:
+                    logger.error(f"Failed to install model {model_name}: {error}")
+                results[model_name] = False
+                continue
+
+            _link_static_files(model_name, config)
+            results[model_name] = True
+
+    invalidate_models_cache()
+    return results
+
+
+def install_model(model_name):
+    return install_models([model_name], workers=1)[model_name]
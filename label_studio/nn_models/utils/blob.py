@@ -0,0 +1,120 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from nn_models.utils.base import file_sha256
+
+logger = logging.getLogger(__name__)
+
+# temporary files older than this are leftovers of crashed conversions
+BLOB_CACHE_TMP_MAX_AGE = 24 * 60 * 60
+
+
+def get_blob_cache_key(onnx_path, *args, **kwargs):
+    """Key a conversion by the ONNX graph content and the conversion arguments."""
+    arguments = json.dumps([args, kwargs], sort_keys=True, default=str)
+    return hashlib.sha256(
+        f"{file_sha256(onnx_path)}:{arguments}".encode("utf-8")
+    ).hexdigest()
+
+
+def _temp_path(path):
+    """Reserve a unique temporary file next to `path`, so `os.replace` is atomic."""
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path), prefix=os.path.basename(path), suffix=".tmp"
+    )
+    os.close(fd)
+    return tmp_path
+
+
+def _replace(source, destination, move=False):
+    tmp_destination = _temp_path(destination)
+    try:
+        if move:
+            shutil.move(source, tmp_destination)
+        else:
+            try:
+                # os.link doesn't overwrite, the reserved name is free to take again
+                os.remove(tmp_destination)
+                os.link(source, tmp_destination)
+            except OSError:
+                shutil.copyfile(source, tmp_destination)
+        os.replace(tmp_destination, destination)
+    except BaseException:
+        if os.path.exists(tmp_destination):
+            os.remove(tmp_destination)
+        raise
+
+
+def prune_blob_cache(cache_dir, max_size, keep=None):
+    """Remove least recently used blobs until the cache fits `max_size` bytes.
+
+    Hits touch their blob, so modification times order the entries by last
+    use. `keep`, the blob being used right now, is never removed.
+    """
+    entries = []
+    for entry in os.scandir(cache_dir):
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        if entry.name.endswith(".tmp"):
+            if stat.st_mtime < time.time() - BLOB_CACHE_TMP_MAX_AGE:
+                _remove(entry.path)
+            continue
+        entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    size = sum(entry_size for _, entry_size, _ in entries)
+    for _, entry_size, path in sorted(entries):
+        if size <= max_size:
+            break
+        if path == keep:
+            continue
+        logger.debug(f"Removing {path} from the blob cache")
+        _remove(path)
+        size -= entry_size
+
+
+def _remove(path):
+    # another process may have removed it already
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def onnx_to_blob(onnx_path, destination, *args, **kwargs):
+    """Convert an ONNX model to a MyriadX blob stored at `destination`.
+
+    Conversions are deterministic, so results are kept in a content-addressed
+    cache and a repeated conversion of the same graph with the same arguments
+    only links the cached blob. The cache is kept under
+    NN_MODEL_BLOB_CACHE_MAX_SIZE bytes. Extra arguments go to
+    `blobconverter.from_onnx`.
+    """
+    import blobconverter as bc
+
+    cache_dir = settings.NN_MODEL_BLOB_CACHE_DIR
+    os.makedirs(cache_dir, exist_ok=True)
+    cached_path = os.path.join(
+        cache_dir, get_blob_cache_key(onnx_path, *args, **kwargs) + ".blob"
+    )
+
+    try:
+        # mark the blob as recently used
+        os.utime(cached_path)
+    except FileNotFoundError:
+        blob_path = bc.from_onnx(onnx_path, *args, **kwargs)
+        _replace(blob_path, cached_path, move=True)
+
+    _replace(cached_path, destination)
+    if settings.NN_MODEL_BLOB_CACHE_MAX_SIZE:
+        prune_blob_cache(
+            cache_dir, settings.NN_MODEL_BLOB_CACHE_MAX_SIZE, keep=cached_path
+        )
+    return destination
@@ -0,0 +1,475 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from urllib.parse import unquote, urlparse
+
+from data_import.models import FileUpload
+from django.conf import settings
+from label_studio_sdk.converter import Converter
+from tasks.models import Annotation, Task
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+_cache_lock = threading.Lock()
+
+# bumped when the layout or content of the label cache changes, older caches are rebuilt
+MANIFEST_VERSION = 3
+
+# control tags the SDK YOLO converter exports
+YOLO_CONTROL_TYPES = ("RectangleLabels", "PolygonLabels", "KeyPointLabels")
+
+
+def get_upload_dir(project_id):
+    return os.path.join(settings.MEDIA_ROOT, settings.UPLOAD_DIR, str(project_id))
+
+
+def index_uploads(project_id):
+    """Map upload file stems to their file names in a single pass.
+
+    Names come from the project's FileUpload rows, so the upload directory
+    is never listed. Label files produced by the YOLO converter are named
+    after the task image, which makes the stem an exact lookup key.
+    """
+    index = {}
+
+    for file in (
+        FileUpload.objects.filter(project_id=project_id)
+        .order_by("id")
+        .values_list("file", flat=True)
+        .iterator()
+    ):
+        name = os.path.basename(file)
+        index.setdefault(os.path.splitext(name)[0], name)
+
+    return index
+
+
+def link_images(base_dir, project_id, index=None):
+    """Symlink the upload matching every label file into `base_dir/images`."""
+    upload_dir = get_upload_dir(project_id)
+    labels_dir = os.path.join(base_dir, "labels")
+    images_dir = os.path.join(base_dir, "images")
+
+    if index is None:
+        index = index_uploads(project_id)
+
+    linked = 0
+    with os.scandir(labels_dir) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                continue
+
+            image_name = index.get(os.path.splitext(entry.name)[0])
+            if image_name is None:
+                continue
+
+            source = os.path.join(upload_dir, image_name)
+            if not os.path.exists(source):
+                continue
+
+            os.symlink(source, os.path.join(images_dir, image_name))
+            linked += 1
+
+    return linked
+
+
+def get_yolo_classes(parsed_config):
+    """Return `{label: class id}` numbered the way the SDK YOLO converter does.
+
+    Labels carrying an explicit `category` attribute keep it, the rest are
+    sorted and take the lowest free ids.
+    """
+    labels = set()
+    label_to_id = {}
+
+    for info in parsed_config.values():
+        labels |= set(info.get("labels", []))
+        for label, attrs in info.get("labels_attrs", {}).items():
+            if attrs.get("category"):
+                label_to_id[label] = int(attrs["category"])
+
+    idx = 0
+    for label in sorted(labels - set(label_to_id)):
+        while idx in label_to_id.values():
+            idx += 1
+        label_to_id[label] = idx
+
+    return label_to_id
+
+
+def get_image_key(parsed_config):
+    for info in parsed_config.values():
+        if info.get("type") not in YOLO_CONTROL_TYPES:
+            continue
+
+        for data_input in info.get("inputs", []):
+            if data_input.get("type") == "Image":
+                return data_input["value"]
+
+    return None
+
+
+def get_label_name(image_url):
+    return os.path.splitext(os.path.basename(unquote(urlparse(image_url).path)))[0]
+
+
+def is_plain_rectangle(region):
+    value = region.get("value", {})
+    return region.get("type") == "rectanglelabels" and not value.get("rotation")
+
+
+def needs_converter(result):
+    """Whether `result` has regions only the SDK converter turns into YOLO labels.
+
+    Plain rectangles are converted in-process; rotated rectangles, polygons
+    and keypoints go through the converter, which built every label file
+    before the cache existed.
+    """
+    return any(
+        region.get("type", "").endswith("labels") and not is_plain_rectangle(region)
+        for region in result or []
+    )
+
+
+def make_converter(parsed_config):
+    return Converter(
+        parsed_config,
+        project_dir=None,
+        upload_dir=os.path.join(settings.MEDIA_ROOT, settings.UPLOAD_DIR),
+        download_resources=False,
+    )
+
+
+def convert_task(converter, task_id, data, result):
+    """Return the YOLO label file the SDK converter writes for one task."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        input_json = os.path.join(tmp_dir, "tasks.json")
+        with open(input_json, "w") as f:
+            task = {"id": task_id, "data": data, "annotations": [{"result": result}]}
+            json.dump([task], f, ensure_ascii=False)
+
+        output_dir = os.path.join(tmp_dir, "yolo")
+        converter.convert(input_json, output_dir, "YOLO", is_dir=False)
+
+        # the converter writes no label file for a task without regions
+        labels_dir = os.path.join(output_dir, "labels")
+        if os.path.isdir(labels_dir):
+            for name in os.listdir(labels_dir):
+                with open(os.path.join(labels_dir, name)) as f:
+                    return f.read()
+
+    return ""
+
+
+def result_to_yolo_lines(result, label_to_id):
+    lines = []
+
+    for region in result or []:
+        if region.get("type") != "rectanglelabels":
+            continue
+
+        value = region.get("value", {})
+        labels = value.get("rectanglelabels") or []
+        if not labels or labels[0] not in label_to_id:
+            continue
+
+        x, y = value["x"] / 100, value["y"] / 100
+        w, h = value["width"] / 100, value["height"] / 100
+        lines.append(f"{label_to_id[labels[0]]} {x + w / 2} {y + h / 2} {w} {h}")
+
+    return lines
+
+
+def _read_batch(tasks):
+    results = {}
+    for task_id, result in (
+        Annotation.objects.filter(
+            task_id__in=[task_id for task_id, _ in tasks], was_cancelled=False
+        )
+        .order_by("task_id", "updated_at", "id")
+        .values_list("task_id", "result")
+    ):
+        results[task_id] = result
+
+    return [(task_id, data, results.get(task_id)) for task_id, data in tasks]
+
+
+def iter_annotated_tasks(project_id, batch_size, task_ids=None):
+    """Yield batches of `(task id, task data, annotation result)`.
+
+    Tasks are read with keyset pagination on id (or in chunks of `task_ids`
+    when given), and only the most recently updated non-cancelled annotation
+    of each task is kept, so no more than `batch_size` tasks are held in
+    memory at once.
+    """
+    if task_ids is not None:
+        task_ids = sorted(task_ids)
+        for i in range(0, len(task_ids), batch_size):
+            tasks = list(
+                Task.objects.filter(
+                    project_id=project_id, id__in=task_ids[i : i + batch_size]
+                )
+                .order_by("id")
+                .values_list("id", "data")
+            )
+            if tasks:
+                yield _read_batch(tasks)
+        return
+
+    last_id = 0
+    while True:
+        tasks = list(
+            Task.objects.filter(
+                project_id=project_id,
+                id__gt=last_id,
+                annotations__was_cancelled=False,
+            )
+            .distinct()
+            .order_by("id")
+            .values_list("id", "data")[:batch_size]
+        )
+        if not tasks:
+            return
+
+        yield _read_batch(tasks)
+        last_id = tasks[-1][0]
+
+
+def iter_annotation_versions(project_id, batch_size):
+    """Yield batches of `(task id, version)` of annotated tasks ordered by id.
+
+    The version is that of the annotation the task is labelled from, it
+    changes whenever the annotation is edited, replaced by a newer one or
+    removed. Tasks are walked with keyset pagination on id like
+    `iter_annotated_tasks` does.
+    """
+    last_id = 0
+    while True:
+        task_ids = list(
+            Task.objects.filter(
+                project_id=project_id,
+                id__gt=last_id,
+                annotations__was_cancelled=False,
+            )
+            .distinct()
+            .order_by("id")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not task_ids:
+            return
+
+        versions = {}
+        for task_id, annotation_id, updated_at in (
+            Annotation.objects.filter(task_id__in=task_ids, was_cancelled=False)
+            .order_by("task_id", "updated_at", "id")
+            .values_list("task_id", "id", "updated_at")
+        ):
+            versions[task_id] = f"{annotation_id}:{updated_at.timestamp()}"
+
+        yield [(task_id, versions[task_id]) for task_id in task_ids]
+        last_id = task_ids[-1]
+
+
+def get_dataset_cache_dir(project_id):
+    # never under MODEL_ROOT, which is served without authentication
+    return os.path.join(settings.NN_MODEL_DATASET_CACHE_DIR, str(project_id))
+
+
+@contextmanager
+def dataset_cache_lock(project_id):
+    """Hold the label cache of a project exclusively.
+
+    The lock file is shared by all worker processes; without `fcntl` the
+    lock only covers threads of the current process.
+    """
+    os.makedirs(settings.NN_MODEL_DATASET_CACHE_DIR, exist_ok=True)
+    lock_path = os.path.join(settings.NN_MODEL_DATASET_CACHE_DIR, f"{project_id}.lock")
+
+    if fcntl is None:
+        with _cache_lock:
+            yield
+        return
+
+    with open(lock_path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _load_manifest(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_file(path, content):
+    """Replace `path` atomically, hard links to the old file keep its content."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _iter_manifest_tasks(path):
+    """Yield the `[task id, label name, version]` rows of a tasks manifest."""
+    try:
+        f = open(path)
+    except FileNotFoundError:
+        return
+
+    with f:
+        for line in f:
+            yield json.loads(line)
+
+
+def _remove_label(labels_dir, label_name):
+    if label_name is None:
+        return
+
+    try:
+        os.remove(os.path.join(labels_dir, label_name))
+    except FileNotFoundError:
+        pass
+
+
+def update_yolo_labels(project, batch_size):
+    """Bring the project's cached YOLO label files up to date.
+
+    Only tasks whose annotation version differs from the previous build are
+    rewritten, and labels of tasks that lost their annotations are removed.
+    A label config change invalidates the whole cache. The tasks manifest is
+    kept sorted by task id and merged with the annotated tasks batch by
+    batch, so memory doesn't grow with the project. This is a generator
+    yielding the number of written tasks after each batch; `(labels dir,
+    class names)` is its return value. Callers hold `dataset_cache_lock`.
+    """
+    cache_dir = get_dataset_cache_dir(project.id)
+    labels_dir = os.path.join(cache_dir, "labels")
+    manifest_path = os.path.join(cache_dir, "manifest.json")
+    tasks_path = os.path.join(cache_dir, "tasks.jsonl")
+
+    parsed_config = project.get_parsed_config()
+    label_to_id = get_yolo_classes(parsed_config)
+    image_key = get_image_key(parsed_config)
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "classes": label_to_id,
+        "image_key": image_key,
+    }
+    if _load_manifest(manifest_path) != manifest:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    os.makedirs(labels_dir, exist_ok=True)
+
+    cached = _iter_manifest_tasks(tasks_path)
+    entry = next(cached, None)
+    converter = None
+    written = 0
+
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir)
+    try:
+        with os.fdopen(fd, "w") as tasks_manifest:
+            for batch in iter_annotation_versions(project.id, batch_size):
+                rows = {}
+                changed = {}
+                replaced = {}
+
+                for task_id, version in batch:
+                    # cached tasks missing from the walk lost their annotations
+                    while entry is not None and entry[0] < task_id:
+                        _remove_label(labels_dir, entry[1])
+                        entry = next(cached, None)
+
+                    if entry is not None and entry[0] == task_id:
+                        if entry[2] == version:
+                            rows[task_id] = entry
+                        else:
+                            changed[task_id] = version
+                            replaced[task_id] = entry[1]
+                        entry = next(cached, None)
+                    else:
+                        changed[task_id] = version
+
+                for tasks in iter_annotated_tasks(
+                    project.id, batch_size, task_ids=list(changed)
+                ):
+                    for task_id, data, result in tasks:
+                        image_url = data.get(image_key) if image_key else None
+                        label_name = None
+
+                        if isinstance(image_url, str):
+                            label_name = get_label_name(image_url) + ".txt"
+                            if needs_converter(result):
+                                if converter is None:
+                                    converter = make_converter(parsed_config)
+                                content = convert_task(converter, task_id, data, result)
+                            else:
+                                lines = result_to_yolo_lines(result, label_to_id)
+                                content = "\n".join(lines)
+                            _write_file(os.path.join(labels_dir, label_name), content)
+
+                        rows[task_id] = [task_id, label_name, changed[task_id]]
+
+                for task_id, label_name in replaced.items():
+                    if rows.get(task_id, [None, None])[1] != label_name:
+                        _remove_label(labels_dir, label_name)
+
+                for task_id, _ in batch:
+                    if task_id in rows:
+                        tasks_manifest.write(json.dumps(rows[task_id]) + "\n")
+
+                if changed:
+                    written += len(changed)
+                    yield written
+
+        while entry is not None:
+            _remove_label(labels_dir, entry[1])
+            entry = next(cached, None)
+
+        os.replace(tmp_path, tasks_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+    classes = [
+        label for label, _ in sorted(label_to_id.items(), key=lambda item: item[1])
+    ]
+    _write_file(os.path.join(cache_dir, "classes.txt"), "\n".join(classes))
+    _write_file(manifest_path, json.dumps(manifest))
+
+    return labels_dir, classes
+
+
+def link_labels(source_dir, base_dir):
+    """Hard link every cached label file into `base_dir/labels`.
+
+    The dataset keeps its labels when a later build rewrites or clears the
+    cache. Files are copied when `base_dir` is on another filesystem.
+    """
+    labels_dir = os.path.join(base_dir, "labels")
+    os.makedirs(labels_dir, exist_ok=True)
+
+    with os.scandir(source_dir) as entries:
+        for entry in entries:
+            if not entry.is_file():
+                continue
+
+            target = os.path.join(labels_dir, entry.name)
+            try:
+                os.link(entry.path, target)
+            except OSError:
+                shutil.copyfile(entry.path, target)
@@ -1,8 +1,7 @@
-import onnx
-from onnx import helper, TensorProto
-
-
 def onnx_add_resize(model_path: str, imgsz: tuple[int, int]):
+    import onnx
+    from onnx import helper, TensorProto
+
     model = onnx.load(model_path)
     h, w = imgsz
 
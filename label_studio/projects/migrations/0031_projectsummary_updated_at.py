@@ -0,0 +1,23 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("projects", "0030_alter_project_robopipe_api_url"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="projectsummary",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True,
+                default=django.utils.timezone.now,
+                help_text="Last update time",
+                verbose_name="updated at",
+            ),
+            preserve_default=False,
+        ),
+    ]
@@ -1156,6 +1156,8 @@ class ProjectSummary(models.Model):
 
     project = AutoOneToOneField(Project, primary_key=True, on_delete=models.CASCADE, related_name='summary')
     created_at = models.DateTimeField(_('created at'), auto_now_add=True, help_text='Creation time')
+    # bumped on every save, Data Manager caches are keyed by it
+    updated_at = models.DateTimeField(_('updated at'), auto_now=True, help_text='Last update time')
 
     # { col1: task_count_with_col1, col2: task_count_with_col2 }
     all_data_columns = JSONField(
@@ -1182,6 +1184,11 @@ class ProjectSummary(models.Model):
         user.project = self.project  # link for activity log
         return self.project.has_permission(user)
 
+    def save(self, *args, update_fields=None, **kwargs):
+        if update_fields is not None:
+            update_fields = {'updated_at', *update_fields}
+        super().save(*args, update_fields=update_fields, **kwargs)
+
     def reset(self, tasks_data_based=True):
         if tasks_data_based:
             self.all_data_columns = {}
@@ -1307,6 +1314,27 @@ class ProjectSummary(models.Model):
         self.created_labels = labels
         self.save(update_fields=['created_annotations', 'created_labels'])
 
+    def rename_created_label(self, from_name, old_label, new_label, count):
+        """Move `count` occurrences of a label to a new name without recounting all annotations"""
+        if not count:
+            return
+        with transaction.atomic():
+            summary = ProjectSummary.objects.select_for_update().get(pk=self.pk)
+            labels = dict(summary.created_labels or {})
+            control_labels = dict(labels.get(from_name, {}))
+            remaining = control_labels.get(old_label, 0) - count
+            if remaining > 0:
+                control_labels[old_label] = remaining
+            else:
+                control_labels.pop(old_label, None)
+            control_labels[new_label] = control_labels.get(new_label, 0) + count
+            labels[from_name] = control_labels
+
+            summary.created_labels = labels
+            summary.save(update_fields=['created_labels'])
+        self.created_labels = labels
+        logger.debug(f'summary.created_labels = {labels}')
+
     def remove_created_annotations_and_labels(self, annotations):
         # we are going to remove all annotations, so we'll reset the corresponding fields on the summary
         remove_all_annotations = self.project.annotations.count() == len(annotations)
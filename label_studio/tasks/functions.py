@@ -17,7 +17,7 @@ from django.db import transaction
 from django.db.models import Count, Q
 from organizations.models import Organization
 from projects.models import Project
-from tasks.models import Annotation, Prediction, Task
+from tasks.models import Annotation, Prediction, Task, update_task_aggregates
 
 logger = logging.getLogger(__name__)
 
@@ -193,6 +193,10 @@ def update_tasks_counters(queryset, from_scratch=True):
     if isinstance(queryset, TaskQuerySet) and queryset.exists() and isinstance(queryset[0], int):
         queryset = Task.objects.filter(id__in=queryset)
 
+    # bulk created annotations and predictions don't send signals
+    if settings.DATA_MANAGER_TASK_AGGREGATES:
+        update_task_aggregates(queryset.values_list('id', flat=True))
+
     if not from_scratch:
         queryset = queryset.exclude(
             Q(total_annotations__gt=0) | Q(cancelled_annotations__gt=0) | Q(total_predictions__gt=0)
@@ -0,0 +1,28 @@
+import logging
+
+from django.core.management.base import BaseCommand
+from projects.models import Project
+from tasks.models import Task, update_task_aggregates
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Backfill Data Manager task aggregates (annotators, annotations_results, completed_at, avg_lead_time, predictions_score)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, action='append', help='project id, all projects by default')
+        parser.add_argument('--batch-size', type=int, default=None, help='tasks processed per batch')
+
+    def handle(self, *args, **options):
+        projects = Project.objects.order_by('id')
+        if options['project']:
+            projects = projects.filter(id__in=options['project'])
+
+        for project_id in projects.values_list('id', flat=True):
+            logger.debug(f'Start processing project {project_id}.')
+            updated = update_task_aggregates(
+                Task.objects.filter(project_id=project_id).values_list('id', flat=True),
+                batch_size=options['batch_size'],
+            )
+            self.stdout.write(f'Project {project_id}: {updated} task aggregates updated')
@@ -0,0 +1,82 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("projects", "0030_alter_project_robopipe_api_url"),
+        ("tasks", "0053_annotation_bulk_created"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TaskAggregate",
+            fields=[
+                (
+                    "task",
+                    models.OneToOneField(
+                        help_text="Task",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="aggregate",
+                        serialize=False,
+                        to="tasks.task",
+                    ),
+                ),
+                (
+                    "completed_at",
+                    models.DateTimeField(
+                        default=None,
+                        help_text="Creation time of the newest annotation",
+                        null=True,
+                        verbose_name="completed at",
+                    ),
+                ),
+                (
+                    "avg_lead_time",
+                    models.FloatField(
+                        default=None,
+                        help_text="Average lead time of annotations",
+                        null=True,
+                        verbose_name="average lead time",
+                    ),
+                ),
+                (
+                    "predictions_score",
+                    models.FloatField(
+                        default=None,
+                        help_text="Average score of predictions",
+                        null=True,
+                        verbose_name="predictions score",
+                    ),
+                ),
+                (
+                    "annotators",
+                    models.JSONField(
+                        default=list,
+                        help_text="Sorted ids of users who annotated the task",
+                        verbose_name="annotators",
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True, verbose_name="updated at")),
+                (
+                    "project",
+                    models.ForeignKey(
+                        help_text="Project of the task",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="task_aggregates",
+                        to="projects.project",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "task_aggregate",
+                "indexes": [
+                    models.Index(fields=["project", "completed_at"], name="task_aggr_completed_at_idx"),
+                    models.Index(fields=["project", "avg_lead_time"], name="task_aggr_avg_lead_time_idx"),
+                    models.Index(fields=["project", "predictions_score"], name="task_aggr_pred_score_idx"),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tasks", "0054_taskaggregate"),
+    ]
+
+    operations = [
+        # annotators changes type, rows are refilled by the update_task_aggregates command
+        migrations.RemoveField(
+            model_name="taskaggregate",
+            name="annotators",
+        ),
+        migrations.AddField(
+            model_name="taskaggregate",
+            name="annotators",
+            field=models.TextField(
+                default="",
+                help_text="Comma-separated sorted ids of users who annotated the task, the form GROUP_CONCAT gives on SQLite",
+                verbose_name="annotators",
+            ),
+        ),
+        migrations.AddField(
+            model_name="taskaggregate",
+            name="annotations_results",
+            field=models.TextField(
+                default="",
+                help_text="Comma-separated results of all annotations, each as the database casts it to text",
+                verbose_name="annotations results",
+            ),
+        ),
+    ]
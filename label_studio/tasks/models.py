@@ -26,10 +26,11 @@ from core.utils.common import (
 from core.utils.db import fast_first
 from core.utils.params import get_env
 from data_import.models import FileUpload
-from data_manager.managers import PreparedTaskManager, TaskManager
+from data_manager.managers import GroupConcat, PreparedTaskManager, TaskManager
 from django.conf import settings
 from django.db import OperationalError, models, transaction
-from django.db.models import CheckConstraint, F, JSONField, Q
+from django.db.models import Avg, CheckConstraint, F, JSONField, Max, Q, TextField
+from django.db.models.functions import Cast
 from django.db.models.lookups import GreaterThanOrEqual
 from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import Signal, receiver
@@ -1218,6 +1219,49 @@ class PredictionMeta(models.Model):
         ]
 
 
+class TaskAggregate(models.Model):
+    """Denormalized per-task aggregates of annotations and predictions used by the Data Manager.
+
+    Rows are maintained only when DATA_MANAGER_TASK_AGGREGATES is enabled, see update_task_aggregates()
+    and the `update_task_aggregates` management command for backfilling.
+    """
+
+    task = models.OneToOneField(
+        'tasks.Task', on_delete=models.CASCADE, primary_key=True, related_name='aggregate', help_text='Task'
+    )
+    project = models.ForeignKey(
+        'projects.Project', on_delete=models.CASCADE, related_name='task_aggregates', help_text='Project of the task'
+    )
+    completed_at = models.DateTimeField(
+        _('completed at'), null=True, default=None, help_text='Creation time of the newest annotation'
+    )
+    avg_lead_time = models.FloatField(
+        _('average lead time'), null=True, default=None, help_text='Average lead time of annotations'
+    )
+    predictions_score = models.FloatField(
+        _('predictions score'), null=True, default=None, help_text='Average score of predictions'
+    )
+    annotators = models.TextField(
+        _('annotators'),
+        default='',
+        help_text='Comma-separated sorted ids of users who annotated the task, the form GROUP_CONCAT gives on SQLite',
+    )
+    annotations_results = models.TextField(
+        _('annotations results'),
+        default='',
+        help_text='Comma-separated results of all annotations, each as the database casts it to text',
+    )
+    updated_at = models.DateTimeField(_('updated at'), auto_now=True)
+
+    class Meta:
+        db_table = 'task_aggregate'
+        indexes = [
+            models.Index(fields=['project', 'completed_at'], name='task_aggr_completed_at_idx'),
+            models.Index(fields=['project', 'avg_lead_time'], name='task_aggr_avg_lead_time_idx'),
+            models.Index(fields=['project', 'predictions_score'], name='task_aggr_pred_score_idx'),
+        ]
+
+
 @receiver(post_delete, sender=Task)
 def update_all_task_states_after_deleting_task(sender, instance, **kwargs):
     """after deleting_task
@@ -1334,6 +1378,37 @@ def save_predictions_to_project(sender, instance, **kwargs):
 # =========== END OF PROJECT SUMMARY UPDATES ===========
 
 
+# =========== TASK AGGREGATES ===========
+
+
+def schedule_task_aggregates_update(task_id):
+    """Recalculate aggregates after commit: the task may be deleted in the same transaction"""
+    if settings.DATA_MANAGER_TASK_AGGREGATES and task_id is not None:
+        transaction.on_commit(lambda: update_task_aggregates([task_id]))
+
+
+@receiver(post_save, sender=Annotation)
+@receiver(post_delete, sender=Annotation)
+def update_task_aggregates_after_annotation(sender, instance, **kwargs):
+    schedule_task_aggregates_update(instance.task_id)
+
+
+@receiver(post_save, sender=Prediction)
+@receiver(post_delete, sender=Prediction)
+def update_task_aggregates_after_prediction(sender, instance, **kwargs):
+    schedule_task_aggregates_update(instance.task_id)
+
+
+@receiver(post_bulk_create, sender=Annotation)
+def update_task_aggregates_after_bulk_annotations(sender, objs, **kwargs):
+    if settings.DATA_MANAGER_TASK_AGGREGATES:
+        task_ids = {obj.task_id for obj in objs}
+        transaction.on_commit(lambda: update_task_aggregates(task_ids))
+
+
+# =========== END OF TASK AGGREGATES ===========
+
+
 @receiver(post_save, sender=Annotation)
 def delete_draft(sender, instance, **kwargs):
     task = instance.task
@@ -1438,3 +1513,79 @@ def bulk_update_stats_project_tasks(tasks, project=None):
 
 Q_finished_annotations = Q(was_cancelled=False) & Q(result__isnull=False)
 Q_task_finished_annotations = Q(annotations__was_cancelled=False) & Q(annotations__result__isnull=False)
+
+
+TASK_AGGREGATE_FIELDS = [
+    'project',
+    'completed_at',
+    'avg_lead_time',
+    'predictions_score',
+    'annotators',
+    'annotations_results',
+    'updated_at',
+]
+
+
+def results_text_aggregate():
+    """Concatenate annotation results cast to text, the same text the Data Manager results filters search in"""
+    if settings.DJANGO_DB == settings.DJANGO_DB_SQLITE:
+        return GroupConcat('result', output_field=TextField())
+
+    from django.contrib.postgres.aggregates import StringAgg
+
+    return StringAgg(Cast('result', TextField()), delimiter=',', ordering='id')
+
+
+def update_task_aggregates(task_ids, batch_size=None):
+    """Recalculate TaskAggregate rows for the given task ids
+
+    :param task_ids: iterable of task ids, deleted tasks are skipped
+    :param batch_size: number of tasks processed by one set of queries
+    :return: number of updated rows
+    """
+    task_ids = sorted(set(task_ids))
+    batch_size = batch_size or settings.BATCH_SIZE
+    updated = 0
+
+    for i in range(0, len(task_ids), batch_size):
+        tasks = dict(Task.objects.filter(id__in=task_ids[i : i + batch_size]).values_list('id', 'project_id'))
+        if not tasks:
+            continue
+
+        aggregates = {
+            task_id: TaskAggregate(task_id=task_id, project_id=project_id) for task_id, project_id in tasks.items()
+        }
+        annotators = {task_id: [] for task_id in tasks}
+
+        annotations = Annotation.objects.filter(task_id__in=tasks).order_by()
+        newest_ids = []
+        for row in annotations.values('task_id').annotate(avg_lead_time=Avg('lead_time'), newest_id=Max('id')):
+            aggregates[row['task_id']].avg_lead_time = row['avg_lead_time']
+            newest_ids.append(row['newest_id'])
+        for task_id, created_at in Annotation.objects.filter(id__in=newest_ids).values_list('task_id', 'created_at'):
+            aggregates[task_id].completed_at = created_at
+        for task_id, user_id in (
+            annotations.filter(completed_by__isnull=False)
+            .values_list('task_id', 'completed_by')
+            .distinct()
+            .order_by('task_id', 'completed_by')
+        ):
+            annotators[task_id].append(user_id)
+        for task_id, user_ids in annotators.items():
+            aggregates[task_id].annotators = ','.join(str(user_id) for user_id in user_ids)
+        for row in annotations.values('task_id').annotate(results=results_text_aggregate()):
+            aggregates[row['task_id']].annotations_results = row['results'] or ''
+
+        predictions = Prediction.objects.filter(task_id__in=tasks).order_by()
+        for row in predictions.values('task_id').annotate(score=Avg('score')):
+            aggregates[row['task_id']].predictions_score = row['score']
+
+        TaskAggregate.objects.bulk_create(
+            aggregates.values(),
+            update_conflicts=True,
+            unique_fields=['task'],
+            update_fields=TASK_AGGREGATE_FIELDS,
+        )
+        updated += len(aggregates)
+
+    return updated
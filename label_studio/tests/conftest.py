@@ -19,6 +19,7 @@ import requests_mock
 import ujson as json
 from botocore.exceptions import ClientError
 from django.conf import settings
+from django.core.cache import cache
 from freezegun import freeze_time
 from moto import mock_s3
 from organizations.models import Organization
@@ -50,6 +51,13 @@ from .utils import (
 boto3.set_stream_logger("botocore.credentials", logging.DEBUG)
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # object ids are reused between tests, so cached payloads keyed by them must not leak
+    cache.clear()
+    yield
+
+
 @pytest.fixture(autouse=False)
 def enable_csrf():
     settings.USE_ENFORCE_CSRF_CHECKS = True
@@ -0,0 +1,57 @@
+from unittest import mock
+
+import pytest
+from data_import.functions import async_import_background
+from data_import.serializers import ImportApiSerializer
+from data_import.uploader import create_file_upload
+from django.core.files.uploadedfile import SimpleUploadedFile
+from projects.models import ProjectImport
+from tasks.models import Task
+from tests.conftest import project_choices
+from tests.utils import make_project
+
+pytestmark = pytest.mark.django_db
+
+
+def test_async_import_streaming_commits_chunks(business_client, settings):
+    settings.IMPORT_STREAMING_CHUNK_SIZE = 2
+    user = business_client.user
+    project = make_project(project_choices(), user, use_ml_backend=False)
+    body = 'image,meta\n' + ''.join(f'{i}.jpg,{i}\n' for i in range(5))
+    file_upload = create_file_upload(user, project, SimpleUploadedFile('tasks.csv', body.encode()))
+    project_import = ProjectImport.objects.create(
+        project=project, commit_to_project=True, return_task_ids=True, file_upload_ids=[file_upload.id]
+    )
+
+    with mock.patch('data_import.functions.ImportApiSerializer', wraps=ImportApiSerializer) as serializer_mock:
+        async_import_background(project_import.id, user.id)
+
+    # 5 tasks are validated and committed in chunks of 2, 2 and 1
+    assert [len(call.kwargs['data']) for call in serializer_mock.call_args_list] == [2, 2, 1]
+
+    project_import.refresh_from_db()
+    assert project_import.status == ProjectImport.Status.COMPLETED
+    assert project_import.task_count == 5
+    assert project_import.found_formats == {'.csv': 1}
+    assert sorted(project_import.data_columns) == ['image', 'meta']
+    assert sorted(project_import.task_ids) == sorted(Task.objects.filter(project=project).values_list('id', flat=True))
+    assert set(project.summary.all_data_columns) == {'image', 'meta'}
+
+
+def test_async_import_streaming_covers_url_imports(business_client, settings):
+    settings.IMPORT_STREAMING_CHUNK_SIZE = 2
+    user = business_client.user
+    project = make_project(project_choices(), user, use_ml_backend=False)
+    # json in the URL field is imported through an inline file upload, like downloaded files are
+    url = '[' + ', '.join(f'{{"image": "{i}.jpg"}}' for i in range(3)) + ']'
+    project_import = ProjectImport.objects.create(project=project, commit_to_project=True, url=url)
+
+    with mock.patch('data_import.functions.ImportApiSerializer', wraps=ImportApiSerializer) as serializer_mock:
+        async_import_background(project_import.id, user.id)
+
+    assert [len(call.kwargs['data']) for call in serializer_mock.call_args_list] == [2, 1]
+    project_import.refresh_from_db()
+    assert project_import.status == ProjectImport.Status.COMPLETED
+    assert project_import.task_count == 3
+    assert len(project_import.file_upload_ids) == 1
+    assert Task.objects.filter(project=project).count() == 3
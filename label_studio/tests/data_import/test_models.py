@@ -0,0 +1,83 @@
+import io
+import json
+
+import pandas as pd
+import pytest
+from data_import.models import FileUpload, iter_json_items, iter_lines
+from data_import.uploader import create_file_upload
+from django.core.files.uploadedfile import SimpleUploadedFile
+from tests.conftest import project_choices
+from tests.utils import make_project
+
+
+def split(text, size):
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 1000])
+@pytest.mark.parametrize(
+    'document',
+    [
+        '[]',
+        ' [ {"data": {"text": "a, ]"}} , {"text": "b \\" c"} ] ',
+        '[1, 22, -3.5e+10, "x", {"a": [1, 2]}]',
+        '{"data": {"text": "single task"}}',
+    ],
+)
+def test_iter_json_items_matches_json_loads(document, size):
+    expected = json.loads(document)
+    expected = expected if isinstance(expected, list) else [expected]
+
+    assert list(iter_json_items(split(document, size))) == expected
+
+
+@pytest.mark.parametrize('document', ['', '[1, 2', '[1 2]', '[,]'])
+def test_iter_json_items_raises_for_invalid_json(document):
+    with pytest.raises(ValueError):
+        list(iter_json_items(split(document, 2)))
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 1000])
+@pytest.mark.parametrize('text', ['', 'a', 'a\nb\r\nc\rd\n\n', '\r\n\r\n'])
+def test_iter_lines_matches_splitlines(text, size):
+    assert list(iter_lines(split(text, size))) == text.splitlines()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'name, body',
+    [
+        ('tasks.csv', 'image,meta\n1.jpg,1\n2.jpg,\n3.jpg,3\n'),
+        ('tasks.json', json.dumps([{'image': '1.jpg', 'meta': 1}, {'data': {'image': '2.jpg', 'meta': ''}}])),
+    ],
+)
+def test_load_tasks_from_uploaded_files_reads_lazily(business_client, settings, name, body):
+    settings.TASKS_READ_CHUNK_SIZE = 1
+    project = make_project(project_choices(), business_client.user, use_ml_backend=False)
+    file_upload = create_file_upload(business_client.user, project, SimpleUploadedFile(name, body.encode()))
+
+    tasks, found_formats, data_keys = FileUpload.load_tasks_from_uploaded_files(project)
+
+    assert tasks[0] == {'data': {'image': '1.jpg', 'meta': 1}, 'file_upload_id': file_upload.id}
+    assert tasks[1]['data'] == {'image': '2.jpg', 'meta': ''}
+    assert found_formats == {name[name.index('.') :]: 1}
+    assert data_keys == {'image', 'meta'}
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('size', [1, 2, 1000])
+def test_csv_values_match_pandas_for_any_chunk_size(business_client, settings, size):
+    project = make_project(project_choices(), business_client.user, use_ml_backend=False)
+    body = 'text,score,count,flag,code\na,0.5,007,True,x1\nb,nan,2,false,2\nc,1e5,,TRUE,003\n'
+    file_upload = create_file_upload(business_client.user, project, SimpleUploadedFile('tasks.csv', body.encode()))
+    expected = pd.read_csv(io.StringIO(body)).fillna('').to_dict('records')
+
+    settings.TASKS_READ_CHUNK_SIZE = size
+    tasks = [task['data'] for task in file_upload.read_tasks_list_from_csv()]
+
+    assert tasks == expected
+    assert tasks == [
+        {'text': 'a', 'score': 0.5, 'count': 7, 'flag': True, 'code': 'x1'},
+        {'text': 'b', 'score': '', 'count': 2, 'flag': False, 'code': '2'},
+        {'text': 'c', 'score': 100000.0, 'count': '', 'flag': True, 'code': '003'},
+    ]
@@ -89,3 +89,30 @@ def test_cache_labels_job(source, control_tag, with_counters, expected_cache_col
             expected_cache = ', '.join(sorted(list(set(all_labels))))
 
         assert cached_labels == expected_cache
+
+
+@pytest.mark.django_db
+def test_cache_labels_job_query_count_does_not_grow_with_tasks():
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    User = get_user_model()
+    test_user = User.objects.create(username='test_user')
+    request_data = {'source': 'annotations', 'control_tag': 'ALL', 'with_counters': 'Yes'}
+    query_counts = []
+
+    for tasks_count in (3, 30):
+        project = Project.objects.create(title=f'Test Project {tasks_count}', created_by=test_user)
+        for i in range(tasks_count):
+            task = Task.objects.create(project=project, data={'text': f'This is task {i}'})
+            for label in ('A', 'B', 'A'):
+                result = [{'from_name': 'label', 'to_name': 'text', 'type': 'labels', 'value': {'labels': [label]}}]
+                Annotation.objects.create(task=task, project=project, completed_by=test_user, result=result)
+
+        with CaptureQueriesContext(connection) as queries:
+            cache_labels_job(project, Task.objects.filter(project=project), request_data=request_data)
+        query_counts.append(len(queries))
+
+        assert {task.data['cache_all'] for task in Task.objects.filter(project=project)} == {'A: 2, B: 1'}
+
+    assert query_counts[0] == query_counts[1]
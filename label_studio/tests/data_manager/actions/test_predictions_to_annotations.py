@@ -1,6 +1,11 @@
 import mock
-from data_manager.actions.predictions_to_annotations import predictions_to_annotations_form
+import pytest
+from data_manager.actions.predictions_to_annotations import (
+    predictions_to_annotations_form,
+    predictions_to_annotations_job,
+)
 from projects.models import Project
+from tasks.models import Annotation, Prediction, Task
 from users.models import User
 
 
@@ -32,3 +37,30 @@ def test_predictions_to_annotations_form():
         project.model_version = 'undefined'
         mock_get_model_versions.return_value = []
         assert predictions_to_annotations_form(user, project)[0]['fields'][0]['options'] == ['undefined']
+
+
+@pytest.mark.django_db
+def test_predictions_to_annotations_job_in_chunks(settings):
+    settings.WEBHOOK_BATCH_SIZE = 2
+    user = User.objects.create(username='test_user')
+    project = Project.objects.create(title='Test Project', created_by=user)
+    result = [{'from_name': 'label', 'to_name': 'text', 'type': 'choices', 'value': {'choices': ['pos']}}]
+    for i in range(5):
+        task = Task.objects.create(project=project, data={'text': f'task {i}'})
+        Prediction.objects.create(task=task, project=project, result=result, model_version='v1')
+        Prediction.objects.create(task=task, project=project, result=result, model_version='v2')
+    Task.objects.create(project=project, data={'text': 'no predictions'})
+
+    with mock.patch('data_manager.actions.predictions_to_annotations.emit_webhooks_for_instance') as emit:
+        response = predictions_to_annotations_job(project, project.tasks.all(), user, 'v1', batch_size=2)
+
+    assert response['detail'] == 'Created 5 annotations'
+    # 3 chunks of tasks: 2 + 2 + 1 annotations, sent in webhook batches of 2
+    assert [len(call.args[3]) for call in emit.call_args_list] == [2, 2, 1]
+    assert Annotation.objects.filter(project=project).count() == 5
+    assert set(Task.objects.filter(project=project).values_list('total_annotations', flat=True)) == {0, 1}
+
+    # predictions that already have annotations are skipped
+    with mock.patch('data_manager.actions.predictions_to_annotations.emit_webhooks_for_instance'):
+        response = predictions_to_annotations_job(project, project.tasks.all(), user, 'v1', batch_size=2)
+    assert response['detail'] == 'Created 0 annotations'
@@ -0,0 +1,42 @@
+"""Tests for the rename_labels action."""
+
+import pytest
+from data_manager.actions.experimental import rename_labels_job
+from django.contrib.auth import get_user_model
+from projects.models import Project
+from tasks.models import Annotation, Task
+
+
+@pytest.mark.django_db
+def test_rename_labels_job(mocker):
+    User = get_user_model()
+    test_user = User.objects.create(username='test_user')
+    project = Project.objects.create(title='Test Project', created_by=test_user)
+
+    for labels in (['A'], ['A', 'B'], ['B']):
+        task = Task.objects.create(project=project, data={'text': 'text'})
+        result = [{'from_name': 'label', 'to_name': 'text', 'type': 'labels', 'value': {'labels': labels}}]
+        Annotation.objects.create(task=task, project=project, completed_by=test_user, result=result)
+    project.summary.refresh_from_db()
+    assert project.summary.created_labels['label'] == {'A': 2, 'B': 2}
+
+    updated_at = dict(Annotation.objects.filter(project=project).values_list('id', 'updated_at'))
+
+    # results are written in bulk without annotation signals
+    save = mocker.spy(Annotation, 'save')
+    response = rename_labels_job(project, 'label', 'labels', 'A', 'C', batch_size=1)
+
+    assert response['detail'] == 'Updated 2 labels in 2'
+    save.assert_not_called()
+    assert sorted(
+        sorted(annotation.result[0]['value']['labels']) for annotation in Annotation.objects.filter(project=project)
+    ) == [['B'], ['B', 'C'], ['C']]
+    # renamed annotations look changed to anything tracking updated_at
+    bumped = {
+        annotation.id: annotation.updated_at > updated_at[annotation.id]
+        for annotation in Annotation.objects.filter(project=project)
+    }
+    assert sorted(bumped.values()) == [False, True, True]
+
+    project.summary.refresh_from_db()
+    assert project.summary.created_labels['label'] == {'B': 2, 'C': 2}
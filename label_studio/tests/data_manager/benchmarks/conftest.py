@@ -0,0 +1,130 @@
+"""Data Manager benchmarks: query count budgets, with wall time and peak memory reported.
+
+The suite is opt-in and runs against the database selected by DJANGO_DB (sqlite or postgresql):
+
+    DM_BENCHMARK=1 DJANGO_DB=sqlite pytest tests/data_manager/benchmarks
+    DM_BENCHMARK=1 DM_BENCHMARK_SIZES=10000 DJANGO_DB=postgresql pytest tests/data_manager/benchmarks
+
+Every scenario has an explicit query budget that doesn't depend on the machine. Wall time and peak
+memory depend on it, so they are only recorded as junit properties (--junitxml) to compare runs on
+the same machine, not asserted.
+"""
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from organizations.models import Organization
+from projects.models import Project
+from tasks.models import Annotation, Prediction, Task
+from users.models import User
+
+from label_studio.core.utils.params import get_bool_env, get_env_list_int
+
+BENCHMARK_ENABLED = get_bool_env('DM_BENCHMARK', False)
+BENCHMARK_SIZES = get_env_list_int('DM_BENCHMARK_SIZES', default=[10000, 100000, 1000000])
+SEED_BATCH_SIZE = 10000
+
+LABEL_CONFIG = """
+<View>
+  <Text name="text" value="$text"/>
+  <Choices name="label" toName="text">
+    <Choice value="pos"/>
+    <Choice value="neg"/>
+  </Choices>
+</View>
+"""
+
+
+def seed_tasks(project, user, size):
+    """Bulk create `size` tasks: every 2nd task is annotated, every 3rd has a prediction"""
+    result = [{'from_name': 'label', 'to_name': 'text', 'type': 'choices', 'value': {'choices': ['pos']}}]
+
+    for start in range(0, size, SEED_BATCH_SIZE):
+        tasks = Task.objects.bulk_create(
+            [
+                Task(
+                    project=project,
+                    data={'text': f'task {i}'},
+                    inner_id=i + 1,
+                    is_labeled=i % 2 == 0,
+                    total_annotations=int(i % 2 == 0),
+                    total_predictions=int(i % 3 == 0),
+                )
+                for i in range(start, min(start + SEED_BATCH_SIZE, size))
+            ]
+        )
+        Annotation.objects.bulk_create(
+            [
+                Annotation(project=project, task=task, result=result, completed_by=user, lead_time=task.inner_id % 60)
+                for task in tasks
+                if task.is_labeled
+            ]
+        )
+        Prediction.objects.bulk_create(
+            [
+                Prediction(project=project, task=task, result=result, score=(task.inner_id % 100) / 100)
+                for task in tasks
+                if task.total_predictions
+            ]
+        )
+        project.summary.update_data_columns(tasks)
+
+    project.summary.save()
+
+
+@pytest.fixture(scope='module', params=BENCHMARK_SIZES, ids=lambda size: f'{size}-tasks')
+def benchmark_project(request, django_db_setup, django_db_blocker):
+    with django_db_blocker.unblock():
+        user = User.objects.create(email=f'benchmark-{request.param}@pytest.net')
+        organization = Organization.create_organization(created_by=user, title='benchmark')
+        project = Project.objects.create(
+            title=f'benchmark {request.param}',
+            created_by=user,
+            organization=organization,
+            label_config=LABEL_CONFIG,
+        )
+        seed_tasks(project, user, request.param)
+
+    project.size = request.param
+    yield project
+
+    with django_db_blocker.unblock():
+        project.delete()
+        organization.delete()
+        user.delete()
+
+
+@pytest.fixture
+def benchmark_client(client, benchmark_project):
+    client.force_login(benchmark_project.created_by)
+    return client
+
+
+@contextmanager
+def measure():
+    """Collect query count, wall time (seconds) and Python peak memory (bytes) of the block"""
+    stats = {}
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        with CaptureQueriesContext(connection) as queries:
+            yield stats
+    finally:
+        stats['time'] = time.perf_counter() - started
+        stats['memory'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    stats['queries'] = len(queries)
+
+
+@pytest.fixture
+def check_budget(benchmark_project, record_property):
+    def check(name, stats, max_queries):
+        for metric, value in stats.items():
+            record_property(metric, value)
+        key = f'{connection.vendor}/{benchmark_project.size}/{name}'
+        assert stats['queries'] <= max_queries, f'{key}: {stats["queries"]} queries > budget of {max_queries}'
+
+    return check
@@ -0,0 +1,125 @@
+import json
+
+import pytest
+from django.conf import settings
+
+from .conftest import BENCHMARK_ENABLED, measure
+
+pytestmark = [
+    pytest.mark.django_db,
+    pytest.mark.skipif(not BENCHMARK_ENABLED, reason='Data Manager benchmarks are enabled with DM_BENCHMARK=1'),
+]
+
+
+def _filters(*items, conjunction='and'):
+    return {'conjunction': conjunction, 'items': list(items)}
+
+
+TEXT_FILTER = {'filter': 'filter:tasks:data.text', 'operator': 'contains', 'type': 'String', 'value': 'task 1'}
+ANNOTATED_FILTER = {'filter': 'filter:tasks:total_annotations', 'operator': 'greater', 'type': 'Number', 'value': 0}
+COMPLETED_FILTER = {'filter': 'filter:tasks:completed_at', 'operator': 'empty', 'type': 'Datetime', 'value': False}
+SCORE_FILTER = {
+    'filter': 'filter:tasks:predictions_score',
+    'operator': 'in',
+    'type': 'Number',
+    'value': {'min': 0.1, 'max': 0.9},
+}
+
+# queries of one task list request, a page of 100 tasks loaded one by one would take hundreds
+TASKS_QUERY_BUDGET = 30
+# queries of an action over the whole project, it may take a few queries per batch of tasks
+ACTION_QUERY_BUDGET = 50
+ACTION_BATCH_QUERY_BUDGET = 10
+
+# name: (view data, view ordering, query string)
+TASKS_SCENARIOS = {
+    'default': ({}, [], ''),
+    'fields-all': ({}, [], '&fields=all'),
+    'filter-text': ({'filters': _filters(TEXT_FILTER)}, [], ''),
+    'filter-annotated': ({'filters': _filters(ANNOTATED_FILTER)}, [], ''),
+    'filter-completed-at': ({'filters': _filters(COMPLETED_FILTER)}, [], ''),
+    'filter-combined': (
+        {'filters': _filters(TEXT_FILTER, ANNOTATED_FILTER, COMPLETED_FILTER, SCORE_FILTER)},
+        [],
+        '&fields=all',
+    ),
+    'filter-combined-or': (
+        {'filters': _filters(TEXT_FILTER, ANNOTATED_FILTER, SCORE_FILTER, conjunction='or')},
+        [],
+        '',
+    ),
+    'order-completed-at': ({}, ['-tasks:completed_at'], ''),
+    'order-avg-lead-time': ({}, ['tasks:avg_lead_time'], ''),
+    'order-predictions-score': ({}, ['-tasks:predictions_score'], ''),
+    'order-data': ({}, ['tasks:data.text'], '&fields=all'),
+    'cursor-first-page': ({}, ['-tasks:completed_at'], '&cursor='),
+}
+
+
+def create_view(client, project, data, ordering):
+    payload = dict(project=project.id, data=data, ordering=ordering)
+    response = client.post('/api/dm/views/', data=json.dumps(payload), content_type='application/json')
+    assert response.status_code == 201, response.content
+    return response.json()['id']
+
+
+@pytest.mark.parametrize('scenario', TASKS_SCENARIOS)
+def test_tasks_api_budget(scenario, benchmark_client, benchmark_project, check_budget):
+    data, ordering, query = TASKS_SCENARIOS[scenario]
+    view_id = create_view(benchmark_client, benchmark_project, data, ordering)
+
+    with measure() as stats:
+        response = benchmark_client.get(f'/api/tasks?view={view_id}&page_size=100{query}')
+    assert response.status_code == 200, response.content
+
+    check_budget(f'tasks/{scenario}', stats, TASKS_QUERY_BUDGET)
+
+
+def test_tasks_api_deep_page_budget(benchmark_client, benchmark_project, check_budget):
+    view_id = create_view(benchmark_client, benchmark_project, {}, ['-tasks:completed_at'])
+    last_page = benchmark_project.size // 100
+
+    with measure() as stats:
+        response = benchmark_client.get(f'/api/tasks?view={view_id}&page_size=100&page={last_page}')
+    assert response.status_code == 200, response.content
+
+    check_budget('tasks/deep-page', stats, TASKS_QUERY_BUDGET)
+
+
+def test_tasks_api_cursor_scroll_budget(benchmark_client, benchmark_project, check_budget):
+    view_id = create_view(benchmark_client, benchmark_project, {}, ['-tasks:completed_at'])
+    cursor = benchmark_client.get(f'/api/tasks?view={view_id}&page_size=100&cursor=').json()['next']
+
+    # the following pages must not depend on the project size
+    with measure() as stats:
+        for _ in range(5):
+            response = benchmark_client.get(f'/api/tasks?view={view_id}&page_size=100&cursor={cursor}')
+            assert response.status_code == 200, response.content
+            cursor = response.json()['next']
+
+    check_budget('tasks/cursor-scroll', stats, 5 * TASKS_QUERY_BUDGET)
+
+
+def test_actions_api_budget(benchmark_client, benchmark_project, check_budget):
+    with measure() as stats:
+        response = benchmark_client.get(f'/api/dm/actions/?project={benchmark_project.id}')
+    assert response.status_code == 200, response.content
+
+    check_budget('actions/list', stats, TASKS_QUERY_BUDGET)
+
+
+def test_remove_duplicates_action_budget(benchmark_client, benchmark_project, check_budget):
+    # seeded tasks are all distinct, so the action scans and recounts the project without changing it
+    payload = {'selectedItems': {'all': True, 'excluded': []}}
+
+    with measure() as stats:
+        response = benchmark_client.post(
+            f'/api/dm/actions?project={benchmark_project.id}&id=remove_duplicates',
+            data=json.dumps(payload),
+            content_type='application/json',
+        )
+    assert response.status_code == 200, response.content
+    assert benchmark_project.tasks.count() == benchmark_project.size
+
+    batches = -(-benchmark_project.size // settings.BATCH_SIZE)
+    check_budget('actions/remove-duplicates', stats, ACTION_QUERY_BUDGET + batches * ACTION_BATCH_QUERY_BUDGET)
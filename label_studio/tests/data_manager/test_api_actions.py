@@ -297,3 +297,22 @@ def test_action_cache_labels(business_client, project_id):
     assert status.status_code == 200, 'status code wrong'
     assert tasks.get(id=task1.id).data.get('cache_label1') == 'Car', 'cache_label1 wrong for task 1'
     assert tasks.get(id=task2.id).data.get('cache_label1') == 'Airplane, Car', 'cache_label1 wrong for task 2'
+
+
+@pytest.mark.django_db
+def test_find_duplicated_tasks_by_data_hash(business_client, project_id, mocker):
+    from data_manager.actions import remove_duplicates
+
+    project = Project.objects.get(pk=project_id)
+    first = make_task({'data': {'image': 'a.jpg', 'meta': 1}}, project)
+    # the same data with another key order is a duplicate
+    second = make_task({'data': {'meta': 1, 'image': 'a.jpg'}}, project)
+    make_task({'data': {'image': 'b.jpg', 'meta': 1}}, project)
+
+    duplicates = remove_duplicates.find_duplicated_tasks_by_data(project, project.tasks.all())
+    assert [[task['id'] for task in group] for group in duplicates.values()] == [[first.id, second.id]]
+
+    # hash collisions are resolved by comparing the data
+    mocker.patch.object(remove_duplicates, 'get_task_data_hash', return_value=0)
+    duplicates = remove_duplicates.find_duplicated_tasks_by_data(project, project.tasks.all())
+    assert [[task['id'] for task in group] for group in duplicates.values()] == [[first.id, second.id]]
@@ -128,3 +128,137 @@ def test_views_total_counters(tasks_count, annotations_count, predictions_count,
     assert response_data['total'] == tasks_count, response_data
     assert response_data['total_annotations'] == tasks_count * annotations_count, response_data
     assert response_data['total_predictions'] == tasks_count * predictions_count, response_data
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('ordering', [[], ['tasks:total_annotations'], ['-tasks:total_annotations']])
+def test_views_tasks_api_cursor_pagination(ordering, business_client, project_id):
+    payload = dict(project=project_id, data={'test': 1}, ordering=ordering)
+    response = business_client.post('/api/dm/views/', data=json.dumps(payload), content_type='application/json')
+    assert response.status_code == 201, response.content
+    view_id = response.json()['id']
+
+    project = Project.objects.get(pk=project_id)
+    task_ids = []
+    for i in range(7):
+        task = make_task({'data': {'text': f'text {i}'}}, project)
+        # ties in the ordering key must not skip or repeat tasks
+        for _ in range(i % 2):
+            make_annotation({'result': []}, task.id)
+        task_ids.append(task.id)
+
+    expected = [task['id'] for task in business_client.get(f'/api/tasks?view={view_id}').json()['tasks']]
+    assert sorted(expected) == sorted(task_ids)
+
+    seen, cursor = [], ''
+    while cursor is not None:
+        response = business_client.get(f'/api/tasks?view={view_id}&page_size=3&cursor={cursor}')
+        assert response.status_code == 200, response.content
+        response_data = response.json()
+        assert response_data['total'] == 7
+        assert response_data['total_annotations'] == 3
+        seen += [task['id'] for task in response_data['tasks']]
+        cursor = response_data['next']
+
+    assert sorted(seen) == sorted(task_ids)
+    if not ordering:
+        assert seen == expected
+
+    response = business_client.get(f'/api/tasks?view={view_id}&cursor=broken')
+    assert response.status_code == 404
+
+
+def test_cursor_pagination_rejects_unsupported_ordering():
+    from data_manager.api import TaskCursorPagination
+    from django.db.models.functions import Length
+    from rest_framework.exceptions import ValidationError
+    from tasks.models import Task
+
+    with pytest.raises(ValidationError):
+        TaskCursorPagination.get_seek_key(Task.objects.order_by(Length('data')))
+
+
+@pytest.mark.django_db
+def test_cursor_pagination_counts_joined_tasks_once(business_client, project_id):
+    from data_manager.api import TaskCursorPagination
+    from tasks.models import Task
+
+    project = Project.objects.get(pk=project_id)
+    task = make_task({'data': {'text': 'aaa'}}, project)
+    make_task({'data': {'text': 'bbb'}}, project)
+    for _ in range(2):
+        make_annotation({'result': []}, task.id)
+    task.refresh_from_db()
+
+    # the filter join yields the annotated task once per annotation
+    queryset = Task.objects.filter(project=project, annotations__was_cancelled=False)
+    assert queryset.count() == 2
+
+    totals = TaskCursorPagination.count_totals(queryset)
+    assert totals['total'] == 1
+    assert totals['total_annotations'] == task.total_annotations
+
+
+@pytest.mark.django_db
+def test_views_tasks_api_queues_predictions(business_client, project_id, mocker):
+    from types import SimpleNamespace
+
+    from django.core.cache import cache
+
+    project = Project.objects.get(pk=project_id)
+    project.evaluate_predictions_automatically = True
+    project.save()
+    mocker.patch.object(
+        Project, 'ml_backend', new_callable=mocker.PropertyMock, return_value=SimpleNamespace(id=1, model_version='v1')
+    )
+    mocker.patch('data_manager.functions.redis_connected', return_value=True)
+    start_job = mocker.patch('data_manager.functions.start_job_async_or_sync')
+    evaluate = mocker.patch('data_manager.functions.evaluate_predictions')
+    cache.clear()
+
+    predicted = make_task({'data': {'text': 'aaa'}}, project)
+    make_prediction({'result': []}, predicted.id)
+    task_ids = [make_task({'data': {'text': 'bbb'}}, project).id for _ in range(2)]
+
+    for _ in range(2):
+        response = business_client.get(f'/api/tasks?project={project_id}')
+        assert response.status_code == 200, response.content
+        assert len(response.json()['tasks']) == 3
+
+    # one batched job for tasks without predictions, scrolling back doesn't queue them again
+    start_job.assert_called_once()
+    assert sorted(start_job.call_args.args[1]) == sorted(task_ids)
+    evaluate.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_filtered_predictions_job_lists_tasks_itself(business_client, project_id, mocker):
+    from types import SimpleNamespace
+
+    from data_manager.functions import queue_filtered_predictions, retrieve_filtered_predictions_job
+    from data_manager.prepare_params import PrepareParams
+    from django.core.cache import cache
+
+    project = Project.objects.get(pk=project_id)
+    mocker.patch.object(
+        Project, 'ml_backend', new_callable=mocker.PropertyMock, return_value=SimpleNamespace(id=1, model_version='v1')
+    )
+    mocker.patch('data_manager.functions.redis_connected', return_value=True)
+    start_job = mocker.patch('data_manager.functions.start_job_async_or_sync')
+    retrieve = mocker.patch('data_manager.functions.retrieve_predictions_job')
+    cache.clear()
+
+    predicted = make_task({'data': {'text': 'aaa'}}, project)
+    make_prediction({'result': []}, predicted.id)
+    task_ids = [make_task({'data': {'text': 'bbb'}}, project).id for _ in range(2)]
+    prepare_params = PrepareParams(project=project.id, request=object())
+
+    # the request only passes the view on, the same view isn't queued twice
+    assert queue_filtered_predictions(project, prepare_params)
+    assert not queue_filtered_predictions(project, prepare_params)
+    start_job.assert_called_once()
+    job, job_project_id, job_prepare_params = start_job.call_args.args
+    assert job is retrieve_filtered_predictions_job
+
+    job(job_project_id, job_prepare_params)
+    retrieve.assert_called_once_with(task_ids)
@@ -73,3 +73,54 @@ def test_columns_api_annotates_config_defined_columns_with_project_defined_true(
     for c in columns:
         assert 'project_defined' in c
         assert c['project_defined'] == (c['id'] == 'text')
+
+
+def test_columns_and_state_are_cached_until_project_changes(business_client, django_assert_max_num_queries):
+    r = business_client.post(
+        '/api/projects/',
+        data=json.dumps(dict(title='test_project1', label_config='<View><Text value="$text" name="text"/></View>')),
+        content_type='application/json',
+    )
+    project_id = r.json()['id']
+
+    for url in (f'/api/dm/columns/?project={project_id}', f'/api/dm/project/?project={project_id}'):
+        assert business_client.get(url).status_code == 200
+        # the second call reads the payload from cache
+        with django_assert_max_num_queries(6):
+            assert business_client.get(url).status_code == 200
+
+    # label config changes invalidate the cached payloads
+    r = business_client.patch(
+        f'/api/projects/{project_id}/',
+        data=json.dumps({'label_config': '<View><Text value="$body" name="text"/></View>'}),
+        content_type='application/json',
+    )
+    assert r.status_code == 200, r.content
+    columns = business_client.get(f'/api/dm/columns/?project={project_id}').json()['columns']
+    assert 'body' in [c['id'] for c in columns if c.get('parent') == 'data']
+
+    # new data keys update the project summary and invalidate the columns
+    r = business_client.post(
+        f'/api/projects/{project_id}/import',
+        data=json.dumps([{'text': 'hello', 'body': 'world', 'extra': 1}]),
+        content_type='application/json',
+    )
+    assert r.status_code == 201, r.content
+    columns = business_client.get(f'/api/dm/columns/?project={project_id}').json()['columns']
+    assert 'extra' in [c['id'] for c in columns if c.get('parent') == 'data']
+    assert business_client.get(f'/api/dm/project/?project={project_id}').json()['task_count'] == 1
+
+
+def test_custom_columns_are_not_cached(business_client, mocker):
+    r = business_client.post('/api/projects/', data=json.dumps(dict(title='test_project1')), content_type='application/json')
+    project_id = r.json()['id']
+    cached = mocker.patch('data_manager.api.get_cached_project_payload')
+    custom = mocker.Mock(return_value={'columns': []})
+    mocker.patch('data_manager.api.load_func', return_value=custom)
+
+    for _ in range(2):
+        assert business_client.get(f'/api/dm/columns/?project={project_id}').status_code == 200
+
+    # a custom GET_ALL_COLUMNS may depend on the user, so it runs on every request
+    assert custom.call_count == 2
+    cached.assert_not_called()
@@ -0,0 +1,124 @@
+from unittest import mock
+
+import pytest
+from data_manager.managers import apply_filters, compile_filters, get_filter_plan, get_filter_value_type
+from data_manager.prepare_params import Filters, PrepareParams
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from projects.models import Project
+from tasks.models import Task
+
+from ..utils import make_annotation, make_task, project_id  # noqa
+
+pytestmark = pytest.mark.django_db
+
+
+def _filters(count):
+    items = [
+        {'filter': 'filter:tasks:data.text', 'operator': 'empty', 'type': 'String', 'value': False},
+        {'filter': 'filter:tasks:total_annotations', 'operator': 'equal', 'type': 'Number', 'value': 1},
+        {'filter': 'filter:tasks:completed_at', 'operator': 'empty', 'type': 'Datetime', 'value': False},
+        {'filter': 'filter:tasks:annotators', 'operator': 'empty', 'type': 'List', 'value': False},
+        {'filter': 'filter:tasks:file_upload', 'operator': 'empty', 'type': 'String', 'value': True},
+        {'filter': 'filter:tasks:inner_id', 'operator': 'greater', 'type': 'Number', 'value': 0},
+    ]
+    return Filters(conjunction='and', items=items[:count])
+
+
+@pytest.mark.parametrize('count', [1, 6])
+def test_filters_compile_without_queries(business_client, project_id, count):
+    project = Project.objects.select_related('summary').get(pk=project_id)
+    task = make_task({'data': {'text': 'aaa'}}, project)
+    make_annotation({'result': []}, task.id)
+    queryset = Task.objects.filter(project=project)
+
+    # column types are inferred from metadata, so compiling doesn't scale with the filters count
+    with CaptureQueriesContext(connection) as queries:
+        get_filter_plan(queryset, _filters(count), project, None)
+    assert len(queries) == 0
+
+
+def test_filter_plan_is_reused_per_project_config(business_client, project_id):
+    project = Project.objects.get(pk=project_id)
+    queryset = Task.objects.filter(project=project)
+    filters = _filters(2)
+
+    with mock.patch('data_manager.managers.compile_filters', wraps=compile_filters) as compile_plan:
+        plan = get_filter_plan(queryset, filters, project, None)
+        cached_plan = get_filter_plan(queryset, _filters(2), project, None)
+        assert compile_plan.call_count == 1
+        # compiling works on a copy, the view's filters are untouched
+        assert filters == _filters(2)
+        # requests don't share Q objects of the cached plan
+        assert cached_plan is not plan
+        assert cached_plan.expressions[0] is not plan.expressions[0]
+        assert str(cached_plan.expressions) == str(plan.expressions)
+
+        project.label_config_hash = (project.label_config_hash or 0) + 1
+        get_filter_plan(queryset, filters, project, None)
+        assert compile_plan.call_count == 2
+
+
+def test_filter_plan_is_cached_per_view(business_client, project_id):
+    project = Project.objects.get(pk=project_id)
+    queryset = Task.objects.filter(project=project)
+    filters = _filters(2)
+
+    def prepare_params(**kwargs):
+        return PrepareParams(project=project.id, filters=filters, **kwargs)
+
+    with mock.patch('data_manager.managers.compile_filters', wraps=compile_filters) as compile_plan:
+        get_filter_plan(queryset, filters, project, None, prepare_params(ordering=['tasks:id']))
+        get_filter_plan(queryset, filters, project, None, prepare_params(ordering=['tasks:id']))
+        assert compile_plan.call_count == 1
+
+        get_filter_plan(queryset, filters, project, None, prepare_params(ordering=['-tasks:id']))
+        get_filter_plan(
+            queryset, filters, project, None, prepare_params(ordering=['tasks:id'], selectedItems={'all': True})
+        )
+        assert compile_plan.call_count == 3
+
+
+def test_filter_plan_follows_common_data_columns(business_client, project_id):
+    project = Project.objects.get(pk=project_id)
+    project.label_config = '<View><Text name="text" value="$text"/></View>'
+    project.save()
+    queryset = Task.objects.filter(project=project)
+    filters = Filters(
+        conjunction='and',
+        items=[{'filter': 'filter:tasks:data.text', 'operator': 'equal', 'type': 'String', 'value': 'aaa'}],
+    )
+
+    plan = get_filter_plan(queryset, filters, project, None)
+    assert f'data__{settings.DATA_UNDEFINED_NAME}' not in str(plan.expressions)
+
+    # an import of plain text tasks stores them under $undefined$, the same filter must target that key
+    project.summary.common_data_columns = [settings.DATA_UNDEFINED_NAME]
+    project.summary.save()
+    undefined_plan = get_filter_plan(queryset, filters, project, None)
+    assert f'data__{settings.DATA_UNDEFINED_NAME}' in str(undefined_plan.expressions)
+
+
+def test_filter_value_type_of_unknown_columns_comes_from_metadata(business_client, project_id):
+    queryset = Task.objects.filter(project_id=project_id).annotate(annotations_count=Count('annotations'))
+
+    with CaptureQueriesContext(connection) as queries:
+        assert get_filter_value_type('annotations_count', queryset) == 'int'
+        assert get_filter_value_type('annotations__lead_time', queryset) == 'float'
+        assert get_filter_value_type('annotations__result', queryset) == 'str'
+        assert get_filter_value_type('not_a_column', queryset) == 'str'
+    assert len(queries) == 0
+
+
+def test_apply_filters_with_cached_plan(business_client, project_id):
+    project = Project.objects.get(pk=project_id)
+    labeled = make_task({'data': {'text': 'aaa'}}, project)
+    make_task({'data': {'text': 'bbb'}}, project)
+    make_annotation({'result': []}, labeled.id)
+    queryset = Task.objects.filter(project=project)
+
+    for _ in range(2):
+        filtered = apply_filters(queryset, _filters(2), project, None)
+        assert list(filtered.values_list('id', flat=True)) == [labeled.id]
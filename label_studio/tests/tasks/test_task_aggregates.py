@@ -0,0 +1,136 @@
+import json
+
+import pytest
+from django.core.management import call_command
+from projects.models import Project
+from tasks.models import Annotation, TaskAggregate
+
+from ..utils import make_annotation, make_prediction, make_task, project_id  # noqa
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def task_aggregates(settings):
+    settings.DATA_MANAGER_TASK_AGGREGATES = True
+
+
+def test_aggregates_follow_annotations_and_predictions(
+    task_aggregates, business_client, project_id, django_capture_on_commit_callbacks
+):
+    project = Project.objects.get(pk=project_id)
+    user = project.created_by
+    with django_capture_on_commit_callbacks(execute=True):
+        task = make_task({'data': {'text': 'aaa'}}, project)
+        make_annotation({'result': [], 'lead_time': 2, 'completed_by': user}, task.id)
+        newest = make_annotation({'result': [], 'lead_time': 4, 'completed_by': user}, task.id)
+        make_prediction({'result': [], 'score': 0.5}, task.id)
+        make_prediction({'result': [], 'score': 0.7}, task.id)
+
+    aggregate = TaskAggregate.objects.get(task=task)
+    assert aggregate.project_id == project.id
+    assert aggregate.avg_lead_time == 3
+    assert aggregate.completed_at == newest.created_at
+    assert aggregate.predictions_score == pytest.approx(0.6)
+    assert aggregate.annotators == str(user.id)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        newest.delete()
+    aggregate.refresh_from_db()
+    assert aggregate.avg_lead_time == 2
+
+    with django_capture_on_commit_callbacks(execute=True):
+        task.delete()
+    assert not TaskAggregate.objects.filter(task_id=task.id).exists()
+
+
+def test_ordering_by_aggregates(task_aggregates, business_client, project_id, django_capture_on_commit_callbacks):
+    project = Project.objects.get(pk=project_id)
+    with django_capture_on_commit_callbacks(execute=True):
+        tasks = [make_task({'data': {'text': str(i)}}, project) for i in range(3)]
+        for lead_time, task in zip([5, 1, 3], tasks):
+            make_annotation({'result': [], 'lead_time': lead_time}, task.id)
+
+    payload = dict(project=project_id, data={'test': 1}, ordering=['tasks:avg_lead_time'])
+    response = business_client.post('/api/dm/views/', data=json.dumps(payload), content_type='application/json')
+    view_id = response.json()['id']
+
+    response = business_client.get(f'/api/tasks?view={view_id}&fields=all')
+    assert response.status_code == 200, response.content
+    assert [task['id'] for task in response.json()['tasks']] == [tasks[1].id, tasks[2].id, tasks[0].id]
+
+
+def test_annotations_results_filter_uses_aggregates(
+    task_aggregates, business_client, project_id, django_capture_on_commit_callbacks
+):
+    project = Project.objects.get(pk=project_id)
+    with django_capture_on_commit_callbacks(execute=True):
+        tasks = [make_task({'data': {'text': str(i)}}, project) for i in range(2)]
+        make_annotation({'result': [{'value': {'choices': ['needle']}}]}, tasks[0].id)
+        make_annotation({'result': [{'value': {'choices': ['hay']}}]}, tasks[1].id)
+
+    assert 'needle' in TaskAggregate.objects.get(task=tasks[0]).annotations_results
+
+    payload = dict(
+        project=project_id,
+        data={
+            'filters': {
+                'conjunction': 'and',
+                'items': [
+                    {
+                        'filter': 'filter:tasks:annotations_results',
+                        'operator': 'contains',
+                        'type': 'String',
+                        'value': 'needle',
+                    }
+                ],
+            }
+        },
+    )
+    response = business_client.post('/api/dm/views/', data=json.dumps(payload), content_type='application/json')
+    view_id = response.json()['id']
+
+    response = business_client.get(f'/api/tasks?view={view_id}')
+    assert response.status_code == 200, response.content
+    assert [task['id'] for task in response.json()['tasks']] == [tasks[0].id]
+
+
+def test_annotators_filter_uses_aggregates(
+    task_aggregates, business_client, project_id, django_capture_on_commit_callbacks
+):
+    project = Project.objects.get(pk=project_id)
+    user = project.created_by
+    with django_capture_on_commit_callbacks(execute=True):
+        tasks = [make_task({'data': {'text': str(i)}}, project) for i in range(2)]
+        make_annotation({'result': [], 'completed_by': user}, tasks[0].id)
+
+    payload = dict(
+        project=project_id,
+        data={
+            'filters': {
+                'conjunction': 'and',
+                'items': [
+                    {'filter': 'filter:tasks:annotators', 'operator': 'contains', 'type': 'List', 'value': user.id}
+                ],
+            }
+        },
+    )
+    response = business_client.post('/api/dm/views/', data=json.dumps(payload), content_type='application/json')
+    view_id = response.json()['id']
+
+    response = business_client.get(f'/api/tasks?view={view_id}')
+    assert response.status_code == 200, response.content
+    assert [task['id'] for task in response.json()['tasks']] == [tasks[0].id]
+
+
+def test_backfill_command(business_client, project_id):
+    project = Project.objects.get(pk=project_id)
+    task = make_task({'data': {'text': 'aaa'}}, project)
+    Annotation.objects.bulk_create([Annotation(task=task, project=project, result=[], lead_time=7)])
+    assert not TaskAggregate.objects.filter(task=task).exists()
+
+    call_command('update_task_aggregates', project=[project.id])
+
+    aggregate = TaskAggregate.objects.get(task=task)
+    assert aggregate.avg_lead_time == 7
+    assert aggregate.annotations_results == '[]'
@@ -0,0 +1,121 @@
+import threading
+from datetime import timedelta
+from unittest import mock
+
+import pytest
+from core import local_queue
+from core.local_queue import LocalJob, LocalQueue, LocalQueueFull, fetch_local_job, get_current_local_job
+from core.redis import start_job_async_or_sync
+from rq.job import JobStatus
+
+
+@pytest.fixture
+def queue():
+    queue = LocalQueue('default', workers=1, max_jobs=10)
+    yield queue
+    queue.executor.shutdown(wait=True, cancel_futures=True)
+
+
+def test_enqueue_runs_job_in_worker_thread(queue):
+    job = queue.enqueue(lambda x: (x * 2, threading.current_thread().name, get_current_local_job()), 21)
+    job.wait(5)
+
+    result, thread_name, current_job = job.result
+    assert job.get_status() == JobStatus.FINISHED
+    assert result == 42
+    assert thread_name.startswith('default-jobs')
+    assert current_job is job
+    assert fetch_local_job(job.id) is job
+
+
+def test_failed_job_calls_on_failure(queue):
+    on_failure = mock.Mock()
+
+    def fail(import_id):
+        raise ValueError('broken')
+
+    job = queue.enqueue(fail, 1, on_failure=on_failure)
+    job.wait(5)
+
+    assert job.is_failed
+    assert 'broken' in job.exc_info
+    failed_job, connection, exc_type, exc_value, _ = on_failure.call_args.args
+    assert (failed_job, connection, exc_type, str(exc_value)) == (job, None, ValueError, 'broken')
+    assert failed_job.args == (1,)
+
+
+def test_queued_job_can_be_cancelled(queue):
+    release = threading.Event()
+    blocking = queue.enqueue(release.wait, 5)
+    calls = []
+    queued = queue.enqueue(calls.append, 'called')
+
+    assert queued.cancel()
+    release.set()
+    blocking.wait(5)
+
+    assert queued.is_canceled
+    assert calls == []
+    # a finished job can't be cancelled
+    assert not blocking.cancel()
+    assert blocking.is_finished
+
+
+def test_full_queue_rejects_job():
+    queue = LocalQueue('low', workers=1, max_jobs=1)
+    release = threading.Event()
+    blocking = queue.enqueue(release.wait, 5)
+    on_failure = mock.Mock()
+    calls = []
+
+    job = queue.enqueue(calls.append, 'called', on_failure=on_failure)
+
+    # the job is never run in the caller's thread
+    assert job.is_failed
+    assert calls == []
+    failed_job, connection, exc_type, exc_value, _ = on_failure.call_args.args
+    assert (failed_job, connection, exc_type) == (job, None, LocalQueueFull)
+    release.set()
+    blocking.wait(5)
+    queue.executor.shutdown()
+
+
+def test_enqueue_in_delays_job(queue):
+    job = queue.enqueue_in(timedelta(seconds=60), print)
+
+    assert job.is_scheduled
+    assert job.cancel()
+    assert job.is_canceled
+
+
+def test_start_job_async_or_sync_uses_local_queue(settings):
+    settings.LOCAL_JOB_QUEUE_ENABLED = True
+
+    def func(x, project_id=None):
+        return x, project_id
+
+    with mock.patch('core.redis.redis_connected', return_value=False):
+        job = start_job_async_or_sync(func, 1, queue_name='high', project_id=2)
+    job.wait(5)
+
+    assert isinstance(job, LocalJob)
+    assert job.origin == 'high'
+    assert job.result == (1, 2)
+    assert local_queue.get_local_queue('high') is local_queue.get_local_queue('high')
+
+
+def test_start_job_async_or_sync_passes_job_to_on_failure_inline(settings):
+    settings.LOCAL_JOB_QUEUE_ENABLED = False
+    on_failure = mock.Mock()
+
+    def fail(import_id, project_id=None):
+        raise ValueError('broken')
+
+    with mock.patch('core.redis.redis_connected', return_value=False), pytest.raises(ValueError):
+        start_job_async_or_sync(fail, 1, project_id=2, on_failure=on_failure)
+
+    # same arguments as RQ and the in-process queue pass
+    failed_job, connection, exc_type, exc_value, _ = on_failure.call_args.args
+    assert (connection, exc_type, str(exc_value)) == (None, ValueError, 'broken')
+    assert failed_job.args == (1,)
+    assert failed_job.kwargs == {'project_id': 2}
@@ -0,0 +1,613 @@
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import mock
+import pytest
+from core import local_queue
+from data_import.models import FileUpload
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from nn_models.functions import (
+    _claim_training_slot,
+    run_conversion_job,
+    run_training_job,
+    start_training_job,
+    stream_training_events,
+)
+from nn_models.models import NNModel, TrainingJob
+from nn_models.utils import base
+from nn_models.utils.blob import onnx_to_blob
+from nn_models.utils.dataset import (
+    get_yolo_classes,
+    index_uploads,
+    iter_annotated_tasks,
+    link_images,
+    link_labels,
+    make_converter,
+    update_yolo_labels,
+)
+from tasks.models import Annotation, Task
+from tests.conftest import project_choices
+from tests.utils import make_project
+
+pytestmark = pytest.mark.django_db
+
+DETECTION_CONFIG = '''
+<View>
+  <Image name="image" value="$image"/>
+  <RectangleLabels name="label" toName="image">
+    <Label value="Dog"/>
+    <Label value="Cat"/>
+  </RectangleLabels>
+</View>
+'''
+
+
+def _seed_uploads(project, user, media_root, count):
+    upload_dir = os.path.join(media_root, 'upload', str(project.id))
+    os.makedirs(upload_dir, exist_ok=True)
+    uploads = []
+    for i in range(count):
+        name = f'{i:08x}-image_{i}.jpg'
+        open(os.path.join(upload_dir, name), 'wb').close()
+        uploads.append(FileUpload(user=user, project=project, file=f'upload/{project.id}/{name}'))
+    FileUpload.objects.bulk_create(uploads)
+    return [os.path.splitext(upload.file.name.split('/')[-1])[0] for upload in uploads]
+
+
+def _make_dataset_dir(base_dir, stems):
+    os.makedirs(os.path.join(base_dir, 'labels'))
+    os.makedirs(os.path.join(base_dir, 'images'))
+    for stem in stems:
+        open(os.path.join(base_dir, 'labels', f'{stem}.txt'), 'w').close()
+
+
+def test_link_images_matches_labels_to_uploads(business_client, settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path / 'media')
+    project = make_project(project_choices(), business_client.user, use_ml_backend=False)
+    stems = _seed_uploads(project, business_client.user, settings.MEDIA_ROOT, 10)
+    base_dir = str(tmp_path / 'dataset')
+    _make_dataset_dir(base_dir, stems[:5] + ['missing'])
+
+    assert set(index_uploads(project.id)) == set(stems)
+    assert link_images(base_dir, project.id) == 5
+    assert sorted(os.listdir(os.path.join(base_dir, 'images'))) == sorted(f'{stem}.jpg' for stem in stems[:5])
+
+
+def test_link_images_scales_linearly(business_client, settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path / 'media')
+    for size in (500, 4000):
+        project = make_project(project_choices(), business_client.user, use_ml_backend=False)
+        stems = _seed_uploads(project, business_client.user, settings.MEDIA_ROOT, size)
+        base_dir = str(tmp_path / f'dataset_{size}')
+        _make_dataset_dir(base_dir, stems)
+
+        with CaptureQueriesContext(connection) as queries, mock.patch(
+            'nn_models.utils.dataset.os.listdir', wraps=os.listdir
+        ) as listdir, mock.patch('nn_models.utils.dataset.os.path.exists', wraps=os.path.exists) as exists:
+            assert link_images(base_dir, project.id) == size
+
+        # one uploads query and one lookup per label, a labels x uploads scan would list the upload dir per label
+        assert len(queries) == 1
+        assert listdir.call_count == 0
+        assert exists.call_count == size
+
+
+def _rectangle(label, x=10, y=20, width=30, height=40):
+    return {
+        'from_name': 'label',
+        'to_name': 'image',
+        'type': 'rectanglelabels',
+        'value': {'x': x, 'y': y, 'width': width, 'height': height, 'rectanglelabels': [label]},
+    }
+
+
+def _make_detection_project(user, count):
+    project = make_project({'title': 'detection', 'label_config': DETECTION_CONFIG}, user, use_ml_backend=False)
+    tasks = Task.objects.bulk_create(
+        [Task(project=project, data={'image': f'/data/upload/{project.id}/{i:08x}-image_{i}.jpg'}) for i in range(count)]
+    )
+    Annotation.objects.bulk_create(
+        [Annotation(task=task, project=project, completed_by=user, result=[_rectangle('Cat')]) for task in tasks]
+    )
+    return project, tasks
+
+
+def test_get_yolo_classes_matches_converter_order(business_client):
+    project = make_project({'title': 'detection', 'label_config': DETECTION_CONFIG}, business_client.user)
+
+    assert get_yolo_classes(project.get_parsed_config()) == {'Cat': 0, 'Dog': 1}
+
+
+def test_iter_annotated_tasks_uses_bounded_batches(business_client):
+    project, tasks = _make_detection_project(business_client.user, 25)
+    Annotation.objects.create(
+        task=tasks[0], project=project, completed_by=business_client.user, result=[], was_cancelled=True
+    )
+
+    batches = list(iter_annotated_tasks(project.id, 10))
+
+    assert [len(batch) for batch in batches] == [10, 10, 5]
+    assert [task_id for batch in batches for task_id, _, _ in batch] == [task.id for task in tasks]
+    assert all(result == [_rectangle('Cat')] for batch in batches for _, _, result in batch)
+
+
+def test_update_yolo_labels(business_client, settings, tmp_path):
+    settings.NN_MODEL_DATASET_CACHE_DIR = str(tmp_path)
+    project, tasks = _make_detection_project(business_client.user, 3)
+    writer = update_yolo_labels(project, 2)
+
+    assert list(writer) == [2, 3]
+    cache_dir = tmp_path / str(project.id)
+    assert (cache_dir / 'classes.txt').read_text() == 'Cat\nDog'
+    label = (cache_dir / 'labels' / '00000000-image_0.txt').read_text()
+    assert label == '0 0.25 0.4 0.3 0.4'
+
+
+def test_update_yolo_labels_only_rewrites_changed_tasks(business_client, settings, tmp_path):
+    settings.NN_MODEL_DATASET_CACHE_DIR = str(tmp_path / 'cache')
+    project, tasks = _make_detection_project(business_client.user, 5)
+    assert list(update_yolo_labels(project, 10)) == [5]
+    labels_dir = tmp_path / 'cache' / str(project.id) / 'labels'
+    link_labels(str(labels_dir), str(tmp_path / 'dataset'))
+
+    # nothing changed
+    assert list(update_yolo_labels(project, 10)) == []
+
+    annotation = tasks[1].annotations.first()
+    annotation.result = [_rectangle('Dog')]
+    annotation.save()
+    tasks[2].annotations.all().delete()
+    Annotation.objects.create(task=tasks[3], project=project, completed_by=business_client.user, result=[])
+
+    assert list(update_yolo_labels(project, 10)) == [2]
+    assert (labels_dir / '00000001-image_1.txt').read_text().startswith('1 ')
+    assert not (labels_dir / '00000002-image_2.txt').exists()
+    assert (labels_dir / '00000003-image_3.txt').read_text() == ''
+
+    # a dataset linked earlier keeps the labels it was built with
+    dataset_labels_dir = tmp_path / 'dataset' / 'labels'
+    assert (dataset_labels_dir / '00000001-image_1.txt').read_text().startswith('0 ')
+    assert (dataset_labels_dir / '00000002-image_2.txt').exists()
+
+
+def test_update_yolo_labels_merges_cache_batch_by_batch(business_client, settings, tmp_path):
+    settings.NN_MODEL_DATASET_CACHE_DIR = str(tmp_path)
+    project, tasks = _make_detection_project(business_client.user, 7)
+    assert list(update_yolo_labels(project, 2)) == [2, 4, 6, 7]
+
+    # deleted tasks at the start, across a batch boundary and at the end of the walk
+    for i in (0, 3, 4, 6):
+        tasks[i].annotations.all().delete()
+
+    assert list(update_yolo_labels(project, 2)) == []
+
+    labels_dir = tmp_path / str(project.id) / 'labels'
+    assert sorted(os.listdir(labels_dir)) == [f'{i:08x}-image_{i}.txt' for i in (1, 2, 5)]
+    manifest = (tmp_path / str(project.id) / 'tasks.jsonl').read_text().splitlines()
+    assert [json.loads(row)[0] for row in manifest] == [tasks[i].id for i in (1, 2, 5)]
+
+
+MIXED_CONFIG = '''
+<View>
+  <Image name="image" value="$image"/>
+  <RectangleLabels name="label" toName="image">
+    <Label value="Cat"/>
+  </RectangleLabels>
+  <PolygonLabels name="polygon" toName="image">
+    <Label value="Cat"/>
+  </PolygonLabels>
+</View>
+'''
+
+
+def test_update_yolo_labels_converts_other_shapes_with_sdk_converter(business_client, settings, tmp_path):
+    settings.NN_MODEL_DATASET_CACHE_DIR = str(tmp_path)
+    user = business_client.user
+    project = make_project({'title': 'mixed', 'label_config': MIXED_CONFIG}, user, use_ml_backend=False)
+    rectangle, polygon = Task.objects.bulk_create(
+        [Task(project=project, data={'image': f'/data/upload/{project.id}/image_{i}.jpg'}) for i in range(2)]
+    )
+    points = [[10, 10], [50, 10], [30, 40]]
+    Annotation.objects.bulk_create(
+        [
+            Annotation(task=rectangle, project=project, completed_by=user, result=[_rectangle('Cat')]),
+            Annotation(
+                task=polygon,
+                project=project,
+                completed_by=user,
+                result=[
+                    {
+                        'from_name': 'polygon',
+                        'to_name': 'image',
+                        'type': 'polygonlabels',
+                        'value': {'points': points, 'polygonlabels': ['Cat']},
+                    }
+                ],
+            ),
+        ]
+    )
+
+    with mock.patch('nn_models.utils.dataset.make_converter', wraps=make_converter) as converter:
+        assert list(update_yolo_labels(project, 10)) == [2]
+
+    # plain rectangles don't need the converter
+    converter.assert_called_once()
+    labels_dir = tmp_path / str(project.id) / 'labels'
+    assert (labels_dir / 'image_0.txt').read_text() == '0 0.25 0.4 0.3 0.4'
+    polygon_label = (labels_dir / 'image_1.txt').read_text().split()
+    assert polygon_label[0] == '0'
+    assert len(polygon_label) > 5
+
+
+def _make_training_job(project, user, **kwargs):
+    return TrainingJob.objects.create(
+        project=project,
+        created_by=user,
+        model_name='model',
+        base_model='yolo_11n',
+        config={'epochs': 1, 'imgsz': [640, 640]},
+        **kwargs,
+    )
+
+
+def test_claim_training_slot_respects_concurrency_limit(business_client, settings):
+    settings.NN_MODEL_MAX_CONCURRENT_TRAININGS = 1
+    project = make_project(project_choices(), business_client.user, use_ml_backend=False)
+    first = _make_training_job(project, business_client.user)
+    second = _make_training_job(project, business_client.user)
+
+    assert not _claim_training_slot(second.id)
+    assert _claim_training_slot(first.id)
+    assert not _claim_training_slot(second.id)
+
+    TrainingJob.objects.filter(id=first.id).update(status=TrainingJob.Status.COMPLETED)
+    assert _claim_training_slot(second.id)
+
+
+def test_claim_training_slot_fails_jobs_without_heartbeat(business_client, settings):
+    settings.NN_MODEL_MAX_CONCURRENT_TRAININGS = 1
+    project = make_project(project_choices(), business_client.user, use_ml_backend=False)
+    crashed = _make_training_job(project, business_client.user, status=TrainingJob.Status.IN_PROGRESS)
+    lost = _make_training_job(project, business_client.user)
+    waiting = _make_training_job(project, business_client.user)
+    silent_since = timezone.now() - timedelta(seconds=settings.NN_MODEL_TRAINING_HEARTBEAT_TIMEOUT + 1)
+    TrainingJob.objects.filter(id__in=[crashed.id, lost.id]).update(updated_at=silent_since)
+
+    assert _claim_training_slot(waiting.id)
+
+    crashed.refresh_from_db()
+    assert crashed.status == TrainingJob.Status.FAILED
+    assert crashed.events[-1]['status_type'] == 'error'
+    # a queued job that never ran keeps its status but doesn't hold up others
+    lost.refresh_from_db()
+    assert lost.status == TrainingJob.Status.CREATED
+
+
+def test_run_training_job_requeues_while_waiting(business_client, settings):
+    settings.NN_MODEL_MAX_CONCURRENT_TRAININGS = 0
+    project = make_project(project_choices(), business_client.user, use_ml_backend=False)
+    training_job = _make_training_job(project, business_client.user)
+
+    with mock.patch('nn_models.functions.start_training_job') as start_training_job:
+        run_training_job(training_job.id)
+        run_training_job(training_job.id, waiting=True)
+
+    assert start_training_job.call_count == 2
+    assert start_training_job.call_args.kwargs == {
+        'waiting': True,
+        'in_seconds': settings.NN_MODEL_TRAINING_RETRY_DELAY,
+    }
+    training_job.refresh_from_db()
+    assert training_job.status == TrainingJob.Status.CREATED
+    assert [event['log'] for event in training_job.events] == ['waiting for a free training slot']
+
+
+def test_start_training_job_runs_on_its_own_local_queue(
+    business_client, settings, django_capture_on_commit_callbacks
+):
+    settings.LOCAL_JOB_QUEUE_ENABLED = True
+    settings.LOCAL_JOB_QUEUE_MAX_JOBS = 1
+    project = make_project(project_choices(), business_client.user, use_ml_backend=False)
+    training_jobs = [_make_training_job(project, business_client.user) for _ in range(3)]
+    release = threading.Event()
+    threads = []
+
+    def run_training_job(job_id, waiting=False):
+        threads.append(threading.current_thread().name)
+        release.wait(5)
+
+    with mock.patch('nn_models.functions.redis_connected', return_value=False), mock.patch(
+        'nn_models.functions.run_training_job', run_training_job
+    ):
+        with django_capture_on_commit_callbacks(execute=True) as callbacks:
+            for training_job in training_jobs:
+                start_training_job(training_job)
+            # nothing starts before the transaction commits
+            assert callbacks and not threads
+        release.set()
+        for job in list(local_queue._jobs.values())[-len(training_jobs):]:
+            job.wait(5)
+
+    # trainings are neither run inline nor rejected past LOCAL_JOB_QUEUE_MAX_JOBS
+    assert threading.current_thread().name not in threads
+    assert len(threads) == len(training_jobs)
+    assert all(name.startswith(settings.NN_MODEL_TRAINING_LOCAL_QUEUE) for name in threads)
+
+
+def test_run_training_job_persists_events(business_client):
+    project = make_project(project_choices(), business_client.user, use_ml_backend=False)
+    training_job = _make_training_job(project, business_client.user)
+
+    def train_yolo(project, model_name, base_model, imgsz, epochs, emit):
+        emit({'data': {'epoch': 1, 'metrics': {}}, 'log': 'epoch 1: {}'})
+        raise RuntimeError('out of memory')
+
+    with mock.patch('nn_models.utils.yolo.train_yolo', train_yolo):
+        run_training_job(training_job.id)
+
+    training_job.refresh_from_db()
+    assert training_job.status == TrainingJob.Status.FAILED
+    assert training_job.error == 'out of memory'
+
+    events = [json.loads(event) for event in stream_training_events(training_job.id)]
+    assert events[0]['data']['epoch'] == 1
+    assert events[-1]['status_type'] == 'error'
+    # reattaching with an offset only replays what was missed
+    assert len(list(stream_training_events(training_job.id, offset=1))) == len(events) - 1
+
+
+def test_training_job_events_api(business_client):
+    project = make_project(project_choices(), business_client.user, use_ml_backend=False)
+    training_job = _make_training_job(
+        project, business_client.user, status=TrainingJob.Status.COMPLETED, events=[{'log': 'model trained'}]
+    )
+
+    r = business_client.get(f'/api/nn-models/training-jobs/{training_job.id}')
+    assert r.status_code == 200
+    assert r.json()['status'] == TrainingJob.Status.COMPLETED
+
+    r = business_client.get(f'/api/nn-models/training-jobs/{training_job.id}/events')
+    assert r.status_code == 200
+    assert b''.join(r.streaming_content) == b'{"log": "model trained"}'
+
+
+def test_onnx_to_blob_reuses_cached_conversion(settings, tmp_path):
+    settings.NN_MODEL_BLOB_CACHE_DIR = str(tmp_path / 'cache')
+    onnx_path = tmp_path / 'model.onnx'
+    onnx_path.write_bytes(b'graph')
+
+    def from_onnx(model, *args, **kwargs):
+        blob_path = tmp_path / 'converted.blob'
+        blob_path.write_bytes(b'blob:' + open(model, 'rb').read())
+        return str(blob_path)
+
+    with mock.patch('blobconverter.from_onnx', side_effect=from_onnx) as converter:
+        onnx_to_blob(str(onnx_path), str(tmp_path / 'first.blob'), shaves=6)
+        onnx_to_blob(str(onnx_path), str(tmp_path / 'second.blob'), shaves=6)
+        assert converter.call_count == 1
+
+        # different arguments are a different conversion
+        onnx_to_blob(str(onnx_path), str(tmp_path / 'third.blob'), shaves=8)
+        assert converter.call_count == 2
+
+    assert (tmp_path / 'first.blob').read_bytes() == b'blob:graph'
+    assert (tmp_path / 'second.blob').read_bytes() == b'blob:graph'
+    assert not list(tmp_path.glob('**/*.tmp'))
+
+
+def test_blob_cache_evicts_least_recently_used_blobs(settings, tmp_path):
+    settings.NN_MODEL_BLOB_CACHE_DIR = str(tmp_path / 'cache')
+    settings.NN_MODEL_BLOB_CACHE_MAX_SIZE = 25
+    onnx_path = tmp_path / 'model.onnx'
+    onnx_path.write_bytes(b'graph')
+
+    def from_onnx(model, *args, **kwargs):
+        blob_path = tmp_path / 'converted.blob'
+        blob_path.write_bytes(b'x' * 10)
+        return str(blob_path)
+
+    with mock.patch('blobconverter.from_onnx', side_effect=from_onnx) as converter:
+        for shaves, mtime in [(1, 100), (2, 200), (3, 300)]:
+            onnx_to_blob(str(onnx_path), str(tmp_path / 'model.blob'), shaves=shaves)
+            # pin modification times, the filesystem may not tell them apart
+            for blob in (tmp_path / 'cache').glob('*.blob'):
+                if blob.stat().st_mtime > 1000:
+                    os.utime(blob, (mtime, mtime))
+        assert converter.call_count == 3
+
+        # the first conversion was used least recently and made room for the third
+        assert len(list((tmp_path / 'cache').glob('*.blob'))) == 2
+        onnx_to_blob(str(onnx_path), str(tmp_path / 'model.blob'), shaves=2)
+        assert converter.call_count == 3
+        onnx_to_blob(str(onnx_path), str(tmp_path / 'model.blob'), shaves=1)
+        assert converter.call_count == 4
+
+
+def test_list_models_is_cached_until_model_dir_changes(settings, tmp_path):
+    settings.NN_MODEL_CATALOG_STAMP = str(tmp_path / 'data' / 'catalog.stamp')
+    model_dir = tmp_path / 'models'
+    for name, task in [('detector', 'detection'), ('classifier', 'classification')]:
+        (model_dir / name).mkdir(parents=True)
+        (model_dir / name / 'config.json').write_text(json.dumps({'task': task, 'downloads': []}))
+
+    with mock.patch.object(base, 'MODEL_DIR', str(model_dir)), mock.patch.object(
+        base, 'load_model_config', wraps=base.load_model_config
+    ) as load_model_config:
+        base.invalidate_models_cache()
+        assert [model['name'] for model in base.list_models(task='detection')] == ['detector']
+        assert len(base.list_models(installed=True)) == 2
+        assert load_model_config.call_count == 2
+
+        (model_dir / 'segmenter').mkdir()
+        (model_dir / 'segmenter' / 'config.json').write_text(json.dumps({'task': 'segmentation'}))
+        os.utime(model_dir, ns=(0, 0))
+        assert [model['name'] for model in base.list_models(task='segmentation')] == ['segmenter']
+        assert load_model_config.call_count == 5
+
+        # installs invalidate through the stamp, MODEL_DIR may be read-only
+        base.invalidate_models_cache()
+        base.list_models()
+        assert load_model_config.call_count == 8
+        assert os.stat(model_dir).st_mtime_ns == 0
+
+
+class _WeightsHandler(BaseHTTPRequestHandler):
+    content = os.urandom(3 * 1024 * 1024 + 17)
+    range_requests = []
+
+    def do_GET(self):
+        start = 0
+        if (range_header := self.headers.get('Range')) is not None:
+            start = int(range_header.split('=')[1].rstrip('-'))
+            self.range_requests.append(start)
+            self.send_response(206)
+        else:
+            self.send_response(200)
+        body = self.content[start:]
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def weights_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _WeightsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_port}/weights.pt'
+    server.shutdown()
+
+
+def test_download_file_resumes_and_verifies_checksum(weights_server, tmp_path):
+    destination = str(tmp_path / 'weights.pt')
+    (tmp_path / 'weights.pt.part').write_bytes(_WeightsHandler.content[:1000])
+
+    sha256 = hashlib.sha256(_WeightsHandler.content).hexdigest()
+    base.download_file(weights_server, destination, sha256)
+
+    assert _WeightsHandler.range_requests[-1] == 1000
+    assert open(destination, 'rb').read() == _WeightsHandler.content
+    assert not os.path.exists(destination + '.part')
+
+    with pytest.raises(ValueError):
+        base.download_file(weights_server, str(tmp_path / 'corrupted.pt'), '0' * 64)
+    assert not os.path.exists(tmp_path / 'corrupted.pt')
+
+
+def test_install_models_downloads_in_parallel(weights_server, tmp_path):
+    sha256 = hashlib.sha256(_WeightsHandler.content).hexdigest()
+    for name, checksum in [('good', sha256), ('other', None), ('bad', '0' * 64)]:
+        (tmp_path / name).mkdir()
+        downloads = [{'url': weights_server, 'filename': 'model.pt'}]
+        if checksum:
+            downloads[0]['sha256'] = checksum
+        (tmp_path / name / 'config.json').write_text(json.dumps({'task': 'detection', 'downloads': downloads}))
+
+    with mock.patch.object(base, 'MODEL_DIR', str(tmp_path)):
+        results = base.install_models(['good', 'other', 'bad', 'missing'], workers=3)
+        assert results == {'good': True, 'other': True, 'bad': False, 'missing': False}
+        installed = {model['name'] for model in base.list_models(installed=True)}
+
+    assert installed == {'good', 'other'}
+    assert (tmp_path / 'good' / 'model.pt').read_bytes() == _WeightsHandler.content
+
+
+def test_upload_api_stages_files_and_converts_in_background(business_client, settings, tmp_path):
+    settings.NN_MODEL_UPLOAD_DIR = str(tmp_path)
+    project = make_project(project_choices(), business_client.user, use_ml_backend=False)
+    nn_model = NNModel.objects.create(project=project, name='uploaded', base_model='mobilenet_v3', model_path='')
+
+    with mock.patch('nn_models.api.start_conversion_job') as start_conversion_job:
+        r = business_client.post(
+            f'/api/nn-models/{nn_model.id}/upload',
+            data={
+                'model.json': SimpleUploadedFile('model.json', b'{}'),
+                'model.weights.bin': SimpleUploadedFile('model.weights.bin', b'weights'),
+            },
+            HTTP_X_IMGSZ='320x240',
+        )
+    assert r.status_code == 202
+
+    staging_dir = start_conversion_job.call_args[0][1]
+    assert open(os.path.join(staging_dir, 'model.weights.bin'), 'rb').read() == b'weights'
+    assert start_conversion_job.call_args[0][2] == '320x240'
+
+    with mock.patch('nn_models.converter.convert_nn_model', return_value='uploaded.blob'):
+        run_conversion_job(nn_model.id, staging_dir, '320x240')
+
+    r = business_client.get(f'/api/nn-models/{nn_model.id}/upload')
+    assert r.json()['conversion_status'] == NNModel.ConversionStatus.COMPLETED
+    assert r.json()['model_path'] == 'uploaded.blob'
+    assert not os.path.exists(staging_dir)
+
+
+HEAVY_ML_MODULES = ['tensorflow', 'tensorflow_hub', 'tensorflowjs', 'tf_keras', 'tf2onnx', 'torch', 'ultralytics']
+
+SERVER_BOOT_SCRIPT = """
+import json, resource, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+import core.urls
+print(json.dumps({
+    'boot_time': time.perf_counter() - start,
+    'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'loaded': sorted(name for name in %r if name in sys.modules),
+}))
+"""
+
+
+def test_server_boot_does_not_import_ml_stacks(record_property):
+    """Boot a fresh interpreter like a web worker does and benchmark it"""
+    result = subprocess.run(
+        [sys.executable, '-c', SERVER_BOOT_SCRIPT % HEAVY_ML_MODULES],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'core.settings.label_studio'},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    stats = json.loads(result.stdout.strip().splitlines()[-1])
+    record_property('boot_time', stats['boot_time'])
+    record_property('max_rss_kb', stats['max_rss_kb'])
+
+    assert stats['loaded'] == []
+
+
+def test_model_file_response_supports_conditional_requests(client, settings, tmp_path):
+    settings.MODEL_ROOT = str(tmp_path / 'models')
+    settings.NN_MODEL_FILE_HASH_DIR = str(tmp_path / 'hashes')
+    (tmp_path / 'models').mkdir()
+    (tmp_path / 'models' / 'detector.blob').write_bytes(b'blob')
+
+    r = client.get('/data/model/detector.blob')
+    assert r.status_code == 200
+    assert b''.join(r.streaming_content) == b'blob'
+    etag = r['ETag']
+    assert etag == '"%s"' % hashlib.sha256(b'blob').hexdigest()
+    # the stored hash isn't served along with the model
+    assert os.listdir(tmp_path / 'models') == ['detector.blob']
+    assert len(os.listdir(tmp_path / 'hashes')) == 1
+
+    r = client.get('/data/model/detector.blob', HTTP_IF_NONE_MATCH=etag)
+    assert r.status_code == 304
+
+    r = client.get('/data/model/detector.blob', HTTP_IF_MODIFIED_SINCE=r['Last-Modified'])
+    assert r.status_code == 304
+
+    settings.USE_NGINX_FOR_MODEL_DOWNLOADS = True
+    r = client.get('/data/model/detector.blob')
+    assert r['X-Accel-Redirect'] == '/internal/models/detector.blob'
+
+    assert client.get('/data/model/../secret').status_code == 404
@@ -0,0 +1,69 @@
+from unittest import mock
+
+import pytest
+from core import redis as core_redis
+from fakeredis import FakeRedis, FakeServer
+
+
+@pytest.fixture
+def fake_redis():
+    server = FakeServer()
+    connection = FakeRedis(server=server)
+    health = core_redis.RedisHealth(min_delay=10, max_delay=40)
+    with mock.patch.object(core_redis, '_redis', connection), mock.patch.object(core_redis, '_health', health):
+        yield server, connection
+
+
+def test_commands_do_not_ping(fake_redis):
+    _, connection = fake_redis
+
+    with mock.patch.object(connection, 'ping') as ping:
+        core_redis.redis_set('key', 'value')
+        assert core_redis.redis_get('key') == b'value'
+        assert core_redis.redis_connected()
+
+    ping.assert_not_called()
+
+
+def test_many_keys_helpers(fake_redis):
+    core_redis.redis_set_many({'a': 1, 'b': 2}, ttl=60)
+
+    assert core_redis.redis_get_many(['a', 'b', 'c']) == {'a': b'1', 'b': b'2'}
+    assert core_redis.redis_get_many([]) == {}
+
+
+def test_redis_marked_down_and_probed_with_backoff(fake_redis):
+    server, connection = fake_redis
+    health = core_redis._health
+    server.connected = False
+
+    with mock.patch('core.redis.time.monotonic', return_value=100):
+        assert core_redis.redis_get('key') is None
+        assert not health.is_up
+        assert health.retry_at == 110
+        # no round-trips while the retry delay lasts
+        with mock.patch.object(connection, 'ping') as ping:
+            assert not core_redis.redis_connected()
+        ping.assert_not_called()
+
+    # the probe fails and the delay doubles
+    with mock.patch('core.redis.time.monotonic', return_value=110):
+        assert not core_redis.redis_connected()
+        assert health.retry_at == 130
+
+    server.connected = True
+    with mock.patch('core.redis.time.monotonic', return_value=130):
+        assert core_redis.redis_connected()
+        assert health.is_up
+        assert health.delay == 10
+
+
+def test_job_runs_without_redis_when_enqueue_fails(fake_redis, settings):
+    settings.LOCAL_JOB_QUEUE_ENABLED = False
+    queue = mock.Mock()
+    queue.enqueue.side_effect = core_redis.redis.exceptions.ConnectionError('connection lost')
+
+    with mock.patch('core.redis.django_rq.get_queue', return_value=queue):
+        assert core_redis.start_job_async_or_sync(sum, [1, 2]) == 3
+
+    assert not core_redis._health.is_up
@@ -0,0 +1,102 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from webhooks import dispatcher as dispatcher_module
+from webhooks.dispatcher import WebhookDispatcher, get_webhook_dispatcher
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.received.append({'body': json.loads(body), 'port': self.client_address[1]})
+        self.send_response(self.server.statuses.pop(0) if self.server.statuses else 200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stand_in():
+    """Local HTTP endpoint recording received webhooks and answering with queued statuses"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    server.received = []
+    server.statuses = []
+    server.url = f'http://127.0.0.1:{server.server_address[1]}/hook'
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_post_reuses_connection(stand_in):
+    dispatcher = WebhookDispatcher(retries=0)
+
+    for i in range(3):
+        response = dispatcher.post(stand_in.url, {}, {'action': 'TASKS_CREATED', 'i': i})
+        assert response.status_code == 200
+
+    assert [r['body']['i'] for r in stand_in.received] == [0, 1, 2]
+    assert len({r['port'] for r in stand_in.received}) == 1
+    assert dispatcher.get_metrics()[stand_in.url]['sent'] == 3
+
+
+def test_post_retries_unavailable_endpoint(stand_in):
+    stand_in.statuses = [503, 503]
+    dispatcher = WebhookDispatcher(retries=2, backoff=0)
+
+    response = dispatcher.post(stand_in.url, {}, {'action': 'TASKS_CREATED'})
+
+    assert response.status_code == 200
+    assert len(stand_in.received) == 3
+
+
+def test_post_failure_is_counted(stand_in):
+    url = stand_in.url
+    stand_in.shutdown()
+    stand_in.server_close()
+    dispatcher = WebhookDispatcher(retries=0)
+
+    assert dispatcher.post(url, {}, {'action': 'TASKS_CREATED'}) is None
+    metrics = dispatcher.get_metrics()[url]
+    assert (metrics['sent'], metrics['failed']) == (0, 1)
+
+
+def test_enqueue_coalesces_and_deduplicates(stand_in):
+    dispatcher = WebhookDispatcher(batch_window=60, retries=0)
+
+    dispatcher.enqueue(stand_in.url, {}, {'action': 'ANNOTATION_UPDATED', 'annotation': {'id': 1}})
+    dispatcher.enqueue(stand_in.url, {}, {'action': 'ANNOTATION_UPDATED', 'annotation': {'id': 2}})
+    dispatcher.enqueue(stand_in.url, {}, {'action': 'ANNOTATION_UPDATED', 'annotation': {'id': 1}})
+    dispatcher.enqueue(stand_in.url, {}, {'action': 'TASKS_DELETED', 'tasks': [{'id': 3}]})
+    assert stand_in.received == []
+
+    dispatcher.flush()
+
+    bodies = sorted((r['body'] for r in stand_in.received), key=lambda body: body['action'])
+    assert bodies == [
+        {
+            'action': 'ANNOTATION_UPDATED',
+            'batch': [
+                {'action': 'ANNOTATION_UPDATED', 'annotation': {'id': 1}},
+                {'action': 'ANNOTATION_UPDATED', 'annotation': {'id': 2}},
+            ],
+        },
+        {'action': 'TASKS_DELETED', 'tasks': [{'id': 3}]},
+    ]
+
+
+def test_pending_events_are_sent_at_exit(stand_in, settings):
+    settings.WEBHOOK_BATCH_WINDOW = 60
+    dispatcher = get_webhook_dispatcher()
+
+    dispatcher.enqueue(stand_in.url, {}, {'action': 'TASKS_CREATED', 'tasks': [{'id': 1}]})
+    dispatcher_module._flush_at_exit()
+
+    assert [r['body'] for r in stand_in.received] == [{'action': 'TASKS_CREATED', 'tasks': [{'id': 1}]}]
@@ -6,8 +6,9 @@ import requests
 import requests_mock
 from django.urls import reverse
 from projects.models import Project
+from webhooks.dispatcher import get_webhook_dispatcher
 from webhooks.models import Webhook, WebhookAction
-from webhooks.utils import emit_webhooks, emit_webhooks_for_instance, run_webhook
+from webhooks.utils import emit_webhooks, emit_webhooks_for_instance, get_active_webhooks_cached, run_webhook
 
 
 @pytest.fixture
@@ -98,6 +99,57 @@ def test_exception_catch(organization_webhook):
     assert result is None
 
 
+@pytest.mark.django_db
+def test_active_webhooks_are_cached(configured_project, organization_webhook, django_assert_num_queries):
+    organization = configured_project.organization
+    action = WebhookAction.TASKS_CREATED
+    assert get_active_webhooks_cached(organization, configured_project, action) == [organization_webhook]
+
+    # nothing is read from the database
+    with django_assert_num_queries(0):
+        assert get_active_webhooks_cached(organization, configured_project, action) == [organization_webhook]
+
+    # webhook and action changes bump the cache version of the organization
+    organization_webhook.is_active = False
+    organization_webhook.save()
+    assert get_active_webhooks_cached(organization, configured_project, action) == []
+
+    organization_webhook.is_active = True
+    organization_webhook.send_for_all_actions = False
+    organization_webhook.save()
+    assert get_active_webhooks_cached(organization, configured_project, action) == []
+    WebhookAction.objects.create(webhook=organization_webhook, action=action)
+    assert get_active_webhooks_cached(organization, configured_project, action) == [organization_webhook]
+
+
+@pytest.mark.django_db
+def test_emit_webhooks_batched(configured_project, organization_webhook, settings):
+    settings.WEBHOOK_BATCH_WINDOW = 60
+    # webhooks that didn't opt in keep their payload format
+    with requests_mock.Mocker(real_http=True) as m:
+        m.register_uri('POST', organization_webhook.url)
+        emit_webhooks(organization_webhook.organization, None, WebhookAction.PROJECT_CREATED, {'data': 1})
+    assert m.request_history[0].json() == {'action': WebhookAction.PROJECT_CREATED, 'data': 1}
+
+    organization_webhook.batch_payloads = True
+    organization_webhook.save()
+    with requests_mock.Mocker(real_http=True) as m:
+        m.register_uri('POST', organization_webhook.url)
+        emit_webhooks(organization_webhook.organization, None, WebhookAction.PROJECT_CREATED, {'data': 1})
+        emit_webhooks(organization_webhook.organization, None, WebhookAction.PROJECT_CREATED, {'data': 2})
+        assert len(m.request_history) == 0
+        get_webhook_dispatcher().flush()
+
+    assert len(m.request_history) == 1
+    assert m.request_history[0].json() == {
+        'action': WebhookAction.PROJECT_CREATED,
+        'batch': [
+            {'action': WebhookAction.PROJECT_CREATED, 'data': 1},
+            {'action': WebhookAction.PROJECT_CREATED, 'data': 2},
+        ],
+    }
+
+
 # PROJECT CREATE/UPDATE/DELETE API
 @pytest.mark.django_db
 def test_webhooks_for_projects(configured_project, business_client, organization_webhook):
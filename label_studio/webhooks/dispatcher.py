@@ -0,0 +1,157 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+
+class WebhookDispatcher:
+    """Deliver webhook requests over a shared keep-alive session.
+
+    Connections are pooled per endpoint and `pool_size` caps concurrent requests to one endpoint.
+    Connection errors and 429/502/503/504 responses are retried `retries` times with exponential backoff.
+
+    `post()` sends a request right away. `enqueue()` holds it for `batch_window` seconds: identical
+    bodies for the same endpoint and action are dropped and the rest go out as one
+    `{"action": ..., "batch": [...]}` request from a pool of `max_workers` threads.
+    """
+
+    def __init__(self, batch_window=0, max_workers=4, pool_size=10, retries=2, backoff=0.5, timeout=1.0):
+        self.batch_window = batch_window
+        self.timeout = timeout
+        self.session = self.make_session(pool_size, retries, backoff)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='webhooks')
+        self.metrics = defaultdict(lambda: {'sent': 0, 'failed': 0, 'duration': 0.0})
+        self._pending = {}
+        self._timer = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_session(pool_size, retries, backoff):
+        retry = Retry(
+            total=retries,
+            read=0,
+            backoff_factor=backoff,
+            status_forcelist=(429, 502, 503, 504),
+            allowed_methods=frozenset({'POST'}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, pool_block=True, max_retries=retry)
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def post(self, url, headers, data):
+        """Send one request now, return the response or None if delivery failed"""
+        return self.send(url, headers, json.dumps(data, cls=DjangoJSONEncoder))
+
+    def send(self, url, headers, body):
+        start = time.monotonic()
+        response = None
+        try:
+            response = self.session.post(
+                url,
+                data=body,
+                headers={'Content-Type': 'application/json', **(headers or {})},
+                timeout=self.timeout,
+            )
+        except requests.RequestException as exc:
+            logger.error(exc, exc_info=True)
+
+        with self._lock:
+            metrics = self.metrics[url]
+            metrics['sent' if response is not None and response.ok else 'failed'] += 1
+            metrics['duration'] += time.monotonic() - start
+        return response
+
+    def enqueue(self, url, headers, data):
+        """Add a request to the batch sent when the batch window closes"""
+        key = (url, json.dumps(headers or {}, sort_keys=True), data['action'])
+        body = json.dumps(data, cls=DjangoJSONEncoder)
+        with self._lock:
+            # dict keeps the order of bodies and drops duplicates
+            self._pending.setdefault(key, {})[body] = None
+            if self._timer is None:
+                self._timer = threading.Timer(self.batch_window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self, inline=False):
+        """Send all pending batches and wait until they are delivered.
+
+        `inline` sends them from the calling thread, the executor doesn't take new work at interpreter exit.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+        batches = [
+            (url, json.loads(headers), self.get_batch_body(action, list(bodies)))
+            for (url, headers, action), bodies in pending.items()
+        ]
+        if inline:
+            for batch in batches:
+                self.send(*batch)
+            return
+
+        futures = [self.executor.submit(self.send, *batch) for batch in batches]
+        for future in futures:
+            future.result()
+
+    @staticmethod
+    def get_batch_body(action, bodies):
+        if len(bodies) == 1:
+            return bodies[0]
+        return '{"action": %s, "batch": [%s]}' % (json.dumps(action), ', '.join(bodies))
+
+    def get_metrics(self):
+        """Return `{url: {'sent': ..., 'failed': ..., 'duration': ...}}` of delivered requests"""
+        with self._lock:
+            return {url: dict(metrics) for url, metrics in self.metrics.items()}
+
+
+_dispatcher = None
+_dispatcher_key = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_webhook_dispatcher():
+    """Return the dispatcher of the current process, a forked worker gets its own one"""
+    global _dispatcher, _dispatcher_key
+
+    options = {
+        'batch_window': settings.WEBHOOK_BATCH_WINDOW,
+        'max_workers': settings.WEBHOOK_MAX_WORKERS,
+        'pool_size': settings.WEBHOOK_POOL_SIZE,
+        'retries': settings.WEBHOOK_RETRIES,
+        'backoff': settings.WEBHOOK_RETRY_BACKOFF,
+        'timeout': settings.WEBHOOK_TIMEOUT,
+    }
+    key = (os.getpid(), *options.values())
+    with _dispatcher_lock:
+        if _dispatcher_key != key:
+            _dispatcher = WebhookDispatcher(**options)
+            _dispatcher_key = key
+        return _dispatcher
+
+
+@atexit.register
+def _flush_at_exit():
+    # events still waiting for their batch window would be lost with the process,
+    # a forked worker inherits this handler but only flushes a dispatcher it created itself
+    if _dispatcher is not None and _dispatcher_key[0] == os.getpid():
+        _dispatcher.flush(inline=True)
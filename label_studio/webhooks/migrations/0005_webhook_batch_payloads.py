@@ -0,0 +1,20 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("webhooks", "0004_auto_20221221_1101"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="webhook",
+            name="batch_payloads",
+            field=models.BooleanField(
+                default=False,
+                help_text='If value is True and WEBHOOK_BATCH_WINDOW is set, requests of the window are sent together as {"action": ..., "batch": [...]}',
+                verbose_name="does webhook batch payloads",
+            ),
+        ),
+    ]
@@ -1,8 +1,13 @@
+import uuid
+
 from core.utils.common import load_func
 from core.validators import JSONSchemaValidator
 from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as _
 from labels_manager.models import LabelLink
 from projects.models import Project
@@ -62,6 +67,15 @@ class Webhook(models.Model):
         help_text=('If value is False the webhook is disabled'),
     )
 
+    batch_payloads = models.BooleanField(
+        _('does webhook batch payloads'),
+        default=False,
+        help_text=(
+            'If value is True and WEBHOOK_BATCH_WINDOW is set, requests of the window are sent together '
+            'as {"action": ..., "batch": [...]}'
+        ),
+    )
+
     created_at = models.DateTimeField(_('created at'), auto_now_add=True, help_text=_('Creation time'), db_index=True)
     updated_at = models.DateTimeField(_('updated at'), auto_now=True, help_text=_('Last update time'), db_index=True)
 
@@ -262,3 +276,36 @@ class WebhookAction(models.Model):
     class Meta:
         db_table = 'webhook_action'
         unique_together = [['webhook', 'action']]
+
+
+def get_webhooks_cache_version_key(organization_id):
+    return f'webhooks-version:{organization_id}'
+
+
+def get_webhooks_cache_version(organization_id):
+    """Version of the organization's cached webhook lists, see bump_webhooks_cache_version()"""
+    return cache.get_or_set(get_webhooks_cache_version_key(organization_id), lambda: uuid.uuid4().hex, None)
+
+
+def bump_webhooks_cache_version(organization_id):
+    """Invalidate cached webhook lists of the organization.
+
+    A random version is used, so an evicted version key can't bring back old lists. With the default
+    per-process cache other processes pick up changes after WEBHOOK_CACHE_TIMEOUT.
+    """
+    cache.set(get_webhooks_cache_version_key(organization_id), uuid.uuid4().hex, None)
+
+
+@receiver(post_save, sender=Webhook)
+@receiver(post_delete, sender=Webhook)
+def webhook_changed(sender, instance, **kwargs):
+    bump_webhooks_cache_version(instance.organization_id)
+
+
+@receiver(post_save, sender=WebhookAction)
+@receiver(post_delete, sender=WebhookAction)
+def webhook_action_changed(sender, instance, **kwargs):
+    # actions change which lists the webhook is in
+    organization_id = Webhook.objects.filter(id=instance.webhook_id).values_list('organization_id', flat=True).first()
+    if organization_id is not None:
+        bump_webhooks_cache_version(organization_id)
@@ -20,6 +20,7 @@ class WebhookSerializer(serializers.ModelSerializer):
             'send_for_all_actions',
             'headers',
             'is_active',
+            'batch_payloads',
             'actions',
             'created_at',
             'updated_at',
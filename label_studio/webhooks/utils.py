@@ -1,14 +1,17 @@
 import logging
 from functools import wraps
 
-import requests
 from core.feature_flags import flag_set
 from core.redis import start_job_async_or_sync
 from core.utils.common import load_func
 from django.conf import settings
+from django.core.cache import cache
+from django.db import models
 from django.db.models import Q
+from rq import get_current_job
 
-from .models import Webhook, WebhookAction
+from .dispatcher import get_webhook_dispatcher
+from .models import Webhook, WebhookAction, get_webhooks_cache_version
 
 
 def get_active_webhooks(organization, project, action):
@@ -37,38 +40,61 @@ def get_active_webhooks(organization, project, action):
     ).distinct()
 
 
-def run_webhook_sync(webhook, action, payload=None):
-    """Run one webhook for action.
+def get_active_webhooks_cached(organization, project, action):
+    """Return a list of active webhooks for organization or project by action.
 
-    This function must not raise any exceptions.
+    Lists are cached per (organization, project, action) until any webhook of the organization changes.
     """
+    if project is not None and not isinstance(project, models.Model):
+        return list(get_active_webhooks(organization, project, action))
+
+    version = get_webhooks_cache_version(organization.id)
+    key = f'webhooks:{organization.id}:{project.id if project else None}:{action}:{version}'
+    webhooks = cache.get(key)
+    if webhooks is None:
+        webhooks = list(get_active_webhooks(organization, project, action))
+        cache.set(key, webhooks, settings.WEBHOOK_CACHE_TIMEOUT)
+    return webhooks
+
+
+def get_webhook_data(webhook, action, payload=None):
     data = {
         'action': action,
     }
     if webhook.send_payload and payload:
         data.update(payload)
-    try:
-        logging.debug('Run webhook %s for action %s', webhook.id, action)
-        return requests.post(
-            webhook.url,
-            headers=webhook.headers,
-            json=data,
-            timeout=settings.WEBHOOK_TIMEOUT,
-        )
-    except requests.RequestException as exc:
-        logging.error(exc, exc_info=True)
-        return
+    return data
+
+
+def run_webhook_sync(webhook, action, payload=None):
+    """Run one webhook for action.
+
+    This function must not raise any exceptions.
+    """
+    logging.debug('Run webhook %s for action %s', webhook.id, action)
+    return get_webhook_dispatcher().post(webhook.url, webhook.headers, get_webhook_data(webhook, action, payload))
+
+
+def send_webhook(webhook, action, payload=None):
+    """Run one webhook for action, batched when WEBHOOK_BATCH_WINDOW is set and the webhook opted in.
+
+    RQ jobs deliver right away, a work horse exits before the batch window closes.
+    """
+    if not (settings.WEBHOOK_BATCH_WINDOW and webhook.batch_payloads) or get_current_job() is not None:
+        run_webhook_sync(webhook, action, payload)
+    else:
+        get_webhook_dispatcher().enqueue(webhook.url, webhook.headers, get_webhook_data(webhook, action, payload))
 
 
 def emit_webhooks_sync(organization, project, action, payload):
     """
     Run all active webhooks for the action.
     """
-    webhooks = get_active_webhooks(organization, project, action)
-    if project and payload and webhooks.filter(send_payload=True).exists():
+    webhooks = get_active_webhooks_cached(organization, project, action)
+    if project and payload and any(wh.send_payload for wh in webhooks):
         payload['project'] = load_func(settings.WEBHOOK_SERIALIZERS['project'])(instance=project).data
     for wh in webhooks:
-        run_webhook_sync(wh, action, payload)
+        send_webhook(wh, action, payload)
 
 
 def emit_webhooks_for_instance_sync(organization, project, action, instance=None):
@@ -76,14 +102,14 @@ def emit_webhooks_for_instance_sync(organization, project, action, instance=None
 
     Be sure WebhookAction.ACTIONS contains all required fields.
     """
-    webhooks = get_active_webhooks(organization, project, action)
-    if not webhooks.exists():
+    webhooks = get_active_webhooks_cached(organization, project, action)
+    if not webhooks:
         return
     payload = {}
     # if instances and there is a webhook that sends payload
     # get serialized payload
     action_meta = WebhookAction.ACTIONS[action]
-    if instance and webhooks.filter(send_payload=True).exists():
+    if instance and any(wh.send_payload for wh in webhooks):
         serializer_class = action_meta.get('serializer')
         if serializer_class:
             payload[action_meta['key']] = serializer_class(instance=instance, many=action_meta['many']).data
@@ -95,7 +121,7 @@ def emit_webhooks_for_instance_sync(organization, project, action, instance=None
                     instance=get_nested_field(instance, value['field']), many=value['many']
                 ).data
     for wh in webhooks:
-        run_webhook_sync(wh, action, payload)
+        send_webhook(wh, action, payload)
 
 
 def run_webhook(webhook, action, payload=None):